@@ -0,0 +1,74 @@
+import argparse
+import logging
+from main import get_engine
+from services.backfill import Backfill, format_duration
+from services.parallel_parse import ParallelParser
+
+logging.basicConfig(
+    filename="classroom_to_notion.log",
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sync all matching Classroom mail, not just the latest messages"
+    )
+    parser.add_argument("--after", help="Only messages after this date (YYYY/MM/DD)")
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--max-pages", type=int, help="Stop after this many pages")
+    parser.add_argument(
+        "--quota-wait",
+        type=float,
+        default=0,
+        help="Seconds to wait out quota errors instead of stopping",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Parse on this many worker processes (0: in-process)",
+    )
+    parser.add_argument(
+        "--restart", action="store_true", help="Discard the saved checkpoint"
+    )
+    args = parser.parse_args()
+
+    # Overrides PARSE_WORKERS; passed in so the engine never starts a pool
+    # of its own that would be left running
+    kwargs = {"parallel_parser": ParallelParser(args.workers)} if args.workers else {}
+    engine = get_engine(**kwargs)
+    query = engine.cdm.build_query(dict(engine.filter_criteria, after=args.after))
+    backfill = Backfill(
+        engine,
+        query=query,
+        page_size=args.page_size,
+        quota_wait=args.quota_wait,
+        on_progress=lambda progress: print(Backfill.describe(progress)),
+    )
+    if args.restart:
+        backfill.reset()
+
+    print(f"Backfilling {query or 'all messages'}")
+    try:
+        result = backfill.run(max_pages=args.max_pages)
+    except KeyboardInterrupt:
+        print("Interrupted; run again to resume from the last completed page")
+        return
+    finally:
+        engine.close()
+        if engine.parallel_parser is not None:
+            engine.parallel_parser.close()
+
+    print(
+        f"Backfill {result['status']}: {result['listed']} messages in "
+        f"{result['pages']} pages, {result['created']} pages created, "
+        f"{result['updated']} updated, {format_duration(result['elapsed'])} in total"
+    )
+    if result["status"] != "complete":
+        print(f"{result.get('error') or ''} Run again to resume.".strip())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,55 @@
-from fastapi import FastAPI, BackgroundTasks
-from main import main
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from main import main, get_engine
+from services.sync_coordinator import SyncCoordinator
+from services.adaptive_scheduler import AdaptiveScheduler, parse_quiet_hours
+from services.metrics import metrics
+from services.gmail_push import PushDeduplicator, PushError, decode_notification
 import uvicorn
 import asyncio
-import aiohttp
+import logging
+import os
 
+load_dotenv()
 app = FastAPI()
 
+coordinator = SyncCoordinator(main)
+push_dedup = PushDeduplicator()
+
+# With Gmail push notifications set up, polling is only a safety net for
+# notifications that were lost
+PUBSUB_TOPIC = os.environ.get("GMAIL_PUBSUB_TOPIC")
+PUSH_TOKEN = os.environ.get("PUSH_VERIFICATION_TOKEN")
+if PUBSUB_TOPIC:
+    poll_interval = float(os.environ.get("PUSH_POLL_INTERVAL", 3600))
+    scheduler = AdaptiveScheduler(
+        base_interval=poll_interval,
+        burst_interval=poll_interval,
+        burst_polls=0,
+        max_interval=max(poll_interval, 6 * 3600),
+        quiet_hours=parse_quiet_hours(os.environ.get("QUIET_HOURS")),
+    )
+else:
+    scheduler = AdaptiveScheduler(
+        quiet_hours=parse_quiet_hours(os.environ.get("QUIET_HOURS"))
+    )
+
 
 async def run_sync():
     print("Running Classroom to Notion sync...")
-    try:
-        result = await asyncio.to_thread(main)
-        print(result)
-        return result
-    except Exception as e:
-        print(f"Error during sync: {str(e)}")
-        return {"error": str(e)}
+    result = await coordinator.run()
+    print(result)
+    return result
 
 
 @app.post("/trigger-sync")
-async def trigger_sync(background_tasks: BackgroundTasks):
-    background_tasks.add_task(run_sync)
-    return {
-        "message": "Sync task has been triggered and is running in the background. Check your Notion workspace for updates."
-    }
+async def trigger_sync():
+    if coordinator.trigger():
+        message = "Sync task has been triggered and is running in the background."
+    else:
+        message = "A sync is already running; another will run once it finishes."
+    return {"message": f"{message} Check your Notion workspace for updates."}
 
 
 @app.post("/run-sync")
@@ -37,30 +63,96 @@ async def root():
     return {"message": "Classroom to Notion Sync Server is running"}
 
 
+@app.get("/sync-status")
+async def sync_status():
+    return coordinator.status()
+
+
+@app.post("/gmail/push")
+async def gmail_push(request: Request, token: str = None):
+    """
+    Pub/Sub push endpoint for Gmail watch notifications. Always acknowledges
+    valid requests quickly; the sync itself runs in the background.
+    """
+    if PUSH_TOKEN and token != PUSH_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid verification token")
+    try:
+        notification = decode_notification(await request.json())
+    except (PushError, ValueError) as e:
+        # Acknowledge anyway: Pub/Sub would redeliver a bad message forever
+        logging.warning(f"Ignoring push request: {e}")
+        return {"status": "ignored", "reason": str(e)}
+
+    if notification["historyId"] <= get_engine().synced_history_id():
+        return {"status": "ignored", "reason": "already synced"}
+    if not push_dedup.accept(notification):
+        return {"status": "ignored", "reason": "duplicate notification"}
+
+    started = coordinator.trigger()
+    print(
+        f"Push notification for history ID {notification['historyId']}: "
+        f"sync {'started' if started else 'queued'}"
+    )
+    return {"status": "accepted", "started": started}
+
+
+@app.get("/push-status")
+async def push_status():
+    return {"topic": PUBSUB_TOPIC, **push_dedup.status()}
+
+
+@app.get("/scheduler")
+async def scheduler_status():
+    return scheduler.status()
+
+
 async def schedule_sync():
-    async with aiohttp.ClientSession() as session:
-        while True:
-            await asyncio.sleep(180)  # Wait for 3 minutes
-            try:
-                async with session.post(
-                    "http://localhost:8888/trigger-sync"
-                ) as response:
-                    print(f"Scheduled sync triggered. Response: {response.status}")
-            except Exception as e:
-                print(f"Error triggering scheduled sync: {e}")
+    interval = scheduler.base_interval
+    while True:
+        await asyncio.sleep(interval)
+        if PUBSUB_TOPIC:
+            await renew_watch()
+        # Joins a sync that is already running instead of starting another
+        result = await coordinator.run()
+        interval = scheduler.next_interval(result)
+        print(f"Next scheduled sync in {interval:.0f}s")
+
+
+async def renew_watch():
+    try:
+        await asyncio.to_thread(get_engine().ensure_watch, PUBSUB_TOPIC)
+    except Exception as e:
+        logging.error(f"Failed to set up Gmail watch: {e}", exc_info=True)
 
 
 @app.on_event("startup")
 async def startup_event():
+    # Authenticate and build clients once; every sync reuses them
+    await asyncio.to_thread(get_engine)
+    if PUBSUB_TOPIC:
+        await renew_watch()
     asyncio.create_task(schedule_sync())
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await asyncio.to_thread(get_engine().close)
+
+
 @app.post("/test")
 async def test():
     result = await run_sync()
     return result
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    # Prometheus text exposition format
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.get("/health")
 async def health():
     return {"status": "ok"}
@@ -0,0 +1,36 @@
+import os
+import time
+import logging
+from dotenv import load_dotenv
+from services.tenants import TenantRegistry, load_tenants
+
+logging.basicConfig(
+    filename="classroom_to_notion.log",
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(threadName)s - %(message)s",
+)
+
+
+def main():
+    load_dotenv()
+    tenants = load_tenants(os.environ.get("TENANTS_FILE", "tenants.json"))
+    registry = TenantRegistry(
+        tenants,
+        max_workers=int(os.environ.get("TENANT_WORKERS", 4)),
+        max_active=int(os.environ.get("MAX_ACTIVE_TENANTS", 32)),
+        parse_workers=int(os.environ.get("PARSE_WORKERS", 0)),
+    )
+    print(f"Syncing {len(tenants)} tenants")
+    try:
+        while True:
+            for tenant_id in registry.poll_due():
+                print(f"Queued sync for tenant {tenant_id}")
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        registry.close()
+
+
+if __name__ == "__main__":
+    main()
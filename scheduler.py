@@ -1,15 +1,22 @@
-import schedule
+import os
 import time
+from dotenv import load_dotenv
 from main import main
+from services.adaptive_scheduler import AdaptiveScheduler, parse_quiet_hours
+
+load_dotenv()
 
 
 def job():
     print("Running Classroom to Notion sync...")
-    main()
+    return main()
 
 
-schedule.every(10).seconds.do(job)
+scheduler = AdaptiveScheduler(
+    quiet_hours=parse_quiet_hours(os.environ.get("QUIET_HOURS"))
+)
 
 while True:
-    schedule.run_pending()
-    time.sleep(1)
+    interval = scheduler.next_interval(job())
+    print(f"Next sync in {interval:.0f}s ({scheduler.history[-1]['reason']})")
+    time.sleep(interval)
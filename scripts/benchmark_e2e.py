@@ -0,0 +1,212 @@
+"""
+End-to-end benchmark of main() against the fake Gmail and Notion servers.
+
+For each scale the mailbox starts with that many messages: one full sync
+reads them all, then a number of incremental syncs each pick up a few newly
+delivered messages. Reports throughput, sync latency percentiles, API call
+counts and server-side latency per endpoint.
+
+    python -m scripts.benchmark_e2e --scales 10,1000,100000
+    python -m scripts.benchmark_e2e --scales 1000 --latency 50 --rate-limit 0.02
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import main as main_module
+from services.classroom import MeteredHttp
+from services.metrics import metrics
+from services.notion_client import AsyncNotionClient
+from services.parallel_parse import ParallelParser
+from services.rate_limiter import get_bucket
+from services.sync_engine import SyncEngine
+from scripts.fake_servers import (
+    FakeGmailServer,
+    FakeNotionServer,
+    FaultConfig,
+    GeneratedMailbox,
+    make_courses,
+    percentiles,
+)
+
+NOTION_TOKEN = "fake-notion-token"
+TASKS_DATABASE_ID = "tasks-db"
+ACTIVITIES_DATABASE_ID = "activities-db"
+
+
+def make_faults(args, seed):
+    return FaultConfig(
+        latency=args.latency / 1000,
+        jitter=args.jitter / 1000,
+        rate_limit_rate=args.rate_limit,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+        seed=seed,
+    )
+
+
+def run_scale(scale, args):
+    courses = make_courses(args.courses, args.seed)
+    notion = FakeNotionServer(make_faults(args, args.seed + 1)).start()
+    notion.add_database(TASKS_DATABASE_ID, "Tasks")
+    notion.add_database(ACTIVITIES_DATABASE_ID, "Activities")
+    notion.add_activities(ACTIVITIES_DATABASE_ID, courses)
+    mailbox = GeneratedMailbox(scale, courses, seed=args.seed)
+    gmail = FakeGmailServer(mailbox, make_faults(args, args.seed + 2)).start()
+
+    # Everything the pipeline writes (cache/, constants/, outputs/) goes to a
+    # scratch directory
+    workdir = tempfile.mkdtemp(prefix="c2n-bench-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    os.environ["NOTION_DATABASE_ID"] = TASKS_DATABASE_ID
+    try:
+        os.makedirs("constants")
+        with open("constants/activities_with_teachers.json", "w") as f:
+            json.dump(courses, f)
+
+        # The real limit is 3 requests/s; by default the benchmark measures
+        # the pipeline itself
+        get_bucket(NOTION_TOKEN, args.notion_rate, args.notion_rate)
+        engine = SyncEngine(
+            notion_database_id=TASKS_DATABASE_ID,
+            activities_database_id=ACTIVITIES_DATABASE_ID,
+            notion_token=NOTION_TOKEN,
+            max_results=scale,
+            notion_client=AsyncNotionClient(NOTION_TOKEN, base_url=notion.url + "/v1"),
+            import_legacy=False,
+            parallel_parser=(
+                ParallelParser(args.parse_workers) if args.parse_workers else None
+            ),
+        )
+        engine.cdm.service = gmail.build_service(MeteredHttp())
+        engine.start(background_refresh=False)
+        main_module._engine = engine
+
+        def sync():
+            output = sys.stdout if args.verbose else io.StringIO()
+            with contextlib.redirect_stdout(output):
+                started = time.perf_counter()
+                result = main_module.main()
+                return time.perf_counter() - started, result
+
+        full_seconds, full_result = sync()
+        full_calls = {"gmail": gmail.stats.to_dict(), "notion": notion.stats.to_dict()}
+        full_pages = len(notion.databases[TASKS_DATABASE_ID]["page_ids"])
+
+        gmail.stats.reset()
+        notion.stats.reset()
+        incremental = []
+        stages = {}
+        for _ in range(args.rounds):
+            mailbox.add(args.delta)
+            seconds, result = sync()
+            incremental.append(seconds)
+            for stage, value in result.get("timings", {}).items():
+                stages[stage] = stages.get(stage, 0.0) + value / args.rounds
+
+        report = {
+            "scale": scale,
+            "full_sync": {
+                "seconds": round(full_seconds, 3),
+                "messages_per_second": round(scale / full_seconds, 1),
+                "result": full_result,
+                "pages_created": full_pages,
+                "api": full_calls,
+            },
+            "incremental_sync": {
+                "rounds": args.rounds,
+                "new_messages_per_round": args.delta,
+                "latency_ms": percentiles(incremental),
+                "mean_stage_seconds": {k: round(v, 6) for k, v in stages.items()},
+                "api": {
+                    "gmail": gmail.stats.to_dict(),
+                    "notion": notion.stats.to_dict(),
+                },
+            },
+            "notion_client": engine.ndm.rate_limit_stats(),
+        }
+        engine.close()
+        if engine.parallel_parser is not None:
+            engine.parallel_parser.close()
+        return report
+    finally:
+        main_module._engine = None
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+        gmail.close()
+        notion.close()
+
+
+def print_report(report):
+    full = report["full_sync"]
+    inc = report["incremental_sync"]
+    print(f"\n== {report['scale']} messages ==")
+    print(
+        f"full sync: {full['seconds']:.2f}s, {full['messages_per_second']:.0f} "
+        f"messages/s, {full['pages_created']} pages created "
+        f"({full['result'].get('message')})"
+    )
+    first_write = full["result"].get("first_write_seconds")
+    print(
+        "  first page written after "
+        + ("n/a (no page written)" if first_write is None else f"{first_write}s")
+    )
+    print(f"  stages: {full['result'].get('timings')}")
+    for service in ("gmail", "notion"):
+        api = full["api"][service]
+        print(f"  {service} calls: {api['calls']} statuses: {api['statuses']}")
+    print(
+        f"incremental sync (+{inc['new_messages_per_round']} messages, "
+        f"{inc['rounds']} rounds): {inc['latency_ms']}"
+    )
+    print(f"  mean stages: {inc['mean_stage_seconds']}")
+    for service in ("gmail", "notion"):
+        print(f"  {service} calls: {inc['api'][service]['calls']}")
+    print(f"notion client: {report['notion_client']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", default="10,1000,100000")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--delta", type=int, default=5)
+    parser.add_argument("--courses", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.0, help="milliseconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="milliseconds")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="429 share")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="500 share")
+    parser.add_argument("--retry-after", type=float, default=0.1)
+    parser.add_argument("--notion-rate", type=float, default=10000.0)
+    parser.add_argument(
+        "--parse-workers", type=int, default=0, help="Parse on a process pool"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the reports to this file")
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument(
+        "--metrics", action="store_true", help="Print the Prometheus metrics"
+    )
+    args = parser.parse_args()
+
+    reports = []
+    for scale in (int(value) for value in args.scales.split(",")):
+        report = run_scale(scale, args)
+        print_report(report)
+        reports.append(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+    if args.metrics:
+        print(metrics.render())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark the precompiled assignment extractor against the original
+per-field regex implementation on generated Classroom notification emails.
+
+    python -m scripts.benchmark_extractor --messages 2000
+"""
+
+import argparse
+import random
+import re
+import time
+
+from services.assignment_extractor import extract_assignment
+
+TEACHERS = ["Jane Smith", "Mr. Alvarez", "Dr. Priya Natarajan", "Ms. O'Brien"]
+CLASSES = ["AP Biology", "Calculus BC", "World History", "English 11 Honors"]
+
+
+def make_classroom_html(index, rng):
+    course = rng.randrange(10**11, 10**12)
+    work = rng.randrange(10**11, 10**12)
+    chooser = "https://accounts.google.com/AccountChooser?continue="
+    class_url = f"https://classroom.google.com/c/{course}"
+    items = "".join(f"<li>Step {n}: read section {n}.{index}</li>" for n in range(3))
+    # Rough shape of a real notification: nested layout tables, a header
+    # block, the assignment card and a long footer
+    filler = '<tr><td style="padding:0 24px">&nbsp;</td></tr>' * rng.randint(20, 60)
+    return (
+        "<html><head><style>td{font-family:Roboto,Arial}</style></head><body>"
+        f"<table role=presentation width=100%>{filler}"
+        f"<tr><td><a href={chooser}{class_url}&amp;authuser=0>"
+        "<table><tr><td><img src=https://www.gstatic.com/classroom/logo.png></td>"
+        f"<td>{rng.choice(CLASSES)}</td></tr></table></a></td></tr>"
+        f"<tr><td><div>Assignment {index}: Problem set</div></td></tr>"
+        f"<tr><td>Due {rng.choice(['Sep', 'Oct', 'Nov'])} {rng.randint(1, 28)}</td></tr>"
+        f"<tr><td><ul>\n{items}\n</ul></td></tr>"
+        f"<tr><td><a href={chooser}{class_url}/a/{work}/details&amp;authuser=0>Open</a>"
+        "</td></tr>"
+        f"<tr><td>Posted on Sep {rng.randint(1, 28)} by {rng.choice(TEACHERS)}</td></tr>"
+        f"{filler}</table>"
+        "<p>Google LLC 1600 Amphitheatre Parkway, Mountain View, CA 94043 USA</p>"
+        "</body></html>"
+    )
+
+
+def legacy_extract(html_content):
+    """The per-field implementation extract_assignment_info used before."""
+    assignment_name_match = re.search(r"<div>(.*?)</div>", html_content)
+    assignment_name = (
+        assignment_name_match.group(1) if assignment_name_match else "Not found"
+    )
+    link_pattern = "https://accounts\\.google\\.com/AccountChooser\\?continue="
+    link_match = re.search(
+        r"href=(https://accounts\.google\.com/AccountChooser\?continue=https://classroom\.google\.com/c/[^&]+)",
+        html_content,
+    )
+    class_link = link_match.group(1) if link_match else "Not found"
+    class_link = re.sub(link_pattern, "", class_link)
+    assignment_match = re.search(
+        r"href=(https://accounts\.google\.com/AccountChooser\?continue=https://classroom\.google\.com/c/[^&]+/a/[^&]+)",
+        html_content,
+    )
+    assignment_link = assignment_match.group(1) if assignment_match else "Not found"
+    assignment_link = re.sub(link_pattern, "", assignment_link)
+    description_match = re.search(r"<ul>(.*?)</ul>", html_content, re.DOTALL)
+    if description_match:
+        description_items = re.findall(r"<li>(.*?)</li>", description_match.group(1))
+        assignment_description = "\n".join(description_items)
+    else:
+        assignment_description = "Not found"
+    class_match = re.search(r">([^<]+)</td></tr></table></a></td>", html_content)
+    class_name = class_match.group(1) if class_match else "Not found"
+    due_date_match = re.search(r"Due ([^<]+)", html_content)
+    due_date = due_date_match.group(1) if due_date_match else "Not found"
+    posted_info_match = re.search(r"Posted on ([^<]+) by ([^<]+)", html_content)
+    if posted_info_match:
+        posted_date = posted_info_match.group(1)
+        posted_by = posted_info_match.group(2)
+    else:
+        posted_date = "Not found"
+        posted_by = "Not found"
+    return {
+        "assignment_name": assignment_name,
+        "assignment_link": assignment_link,
+        "class_link": class_link,
+        "assignment_description": assignment_description,
+        "class_name": class_name,
+        "due_date": due_date,
+        "posted_date": posted_date,
+        "posted_by": posted_by,
+    }
+
+
+def time_it(func, corpus, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for html in corpus:
+            func(html)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = [make_classroom_html(i, rng) for i in range(args.messages)]
+
+    mismatches = sum(legacy_extract(h) != extract_assignment(h) for h in corpus)
+    if mismatches:
+        print(f"WARNING: {mismatches} messages extracted differently")
+
+    legacy = time_it(legacy_extract, corpus, args.repeat)
+    current = time_it(extract_assignment, corpus, args.repeat)
+    size = sum(len(h) for h in corpus) / len(corpus)
+    print(f"{args.messages} messages, {size / 1024:.1f} KiB average body")
+    print(f"legacy:      {legacy * 1e6 / args.messages:8.1f} us/message")
+    print(f"extractor:   {current * 1e6 / args.messages:8.1f} us/message")
+    print(f"speedup:     {legacy / current:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark the indexed teacher matcher against the original three-pass linear
+scan over all activities, reporting speed and how often each picks the
+intended activity.
+
+    python -m scripts.benchmark_matcher --activities 5000 --assignments 20000
+"""
+
+import argparse
+import random
+import time
+
+from services.activity_index import ActivityIndex
+
+FIRST = ["jane", "john", "priya", "wei", "maria", "ahmed", "olga", "kwame", "lena"]
+FIRST += ["david", "sofia", "hiroshi", "fatima", "lucas", "amara", "noah", "ines"]
+SYLLABLES = ["ka", "ro", "lin", "son", "ber", "mo", "ta", "vi", "ch", "ez", "ley"]
+SYLLABLES += ["ng", "ra", "do", "wski", "tt", "man", "el", "na", "ric", "ov"]
+# Teachers who are not in the catalog get surnames built from other syllables
+UNKNOWN_SYLLABLES = ["pu", "gh", "zi", "qua", "yo", "fe", "bu", "xa", "hu", "jo"]
+TITLES = ["", "Mr.", "Ms.", "Dr.", "Mrs."]
+
+
+def make_name(rng, syllables=SYLLABLES):
+    surname = "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+    return f"{rng.choice(FIRST)} {surname}"
+
+
+def make_catalog(rng, size):
+    """Activities whose teachers have distinct surnames, as within one school."""
+    activities = []
+    surnames = set()
+    while len(activities) < size:
+        teacher = make_name(rng)
+        surname = teacher.split()[-1]
+        if surname in surnames:
+            continue
+        surnames.add(surname)
+        index = len(activities)
+        activities.append(
+            {
+                "id": f"activity-{index}",
+                "title": f"Activity {index}",
+                "teacher": teacher,
+            }
+        )
+    return activities
+
+
+def legacy_match(activities, assignment):
+    """The linear matcher AssignmentParser used before."""
+    posted_by = assignment.get("posted_by", "").lower()
+    for activity in activities:
+        if activity["teacher"].lower() == posted_by:
+            return activity["id"]
+    for activity in activities:
+        if (
+            activity["teacher"].lower() in posted_by
+            or posted_by in activity["teacher"].lower()
+        ):
+            return activity["id"]
+    teacher_words = posted_by.split()
+    for activity in activities:
+        activity_teacher_words = activity["teacher"].lower().split()
+        if any(word in activity_teacher_words for word in teacher_words):
+            return activity["id"]
+    return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--activities", type=int, default=5000)
+    parser.add_argument("--assignments", type=int, default=20000)
+    parser.add_argument("--teachers", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    activities = make_catalog(rng, args.activities)
+    activity_ids = {activity["teacher"]: activity["id"] for activity in activities}
+    # Assignments come from a smaller set of teachers, as in a real inbox,
+    # written the way Classroom shows them. Unknown teachers should not match
+    names = []
+    for _ in range(args.teachers):
+        teacher = rng.choice(activities)["teacher"]
+        expected = activity_ids[teacher]
+        style = rng.random()
+        if style < 0.5:
+            names.append((teacher.title(), expected))
+        elif style < 0.8:
+            surname = teacher.split()[-1].title()
+            names.append((f"{rng.choice(TITLES)} {surname}".strip(), expected))
+        else:
+            names.append((make_name(rng, UNKNOWN_SYLLABLES).title(), ""))
+    assignments = [rng.choice(names) for _ in range(args.assignments)]
+
+    start = time.perf_counter()
+    index = ActivityIndex(activities)
+    build = time.perf_counter() - start
+
+    # Cold lookups: every distinct name scored once, nothing memoized
+    start = time.perf_counter()
+    for name, _ in names:
+        index.fuzzy.best(name, index.threshold)
+    cold = (time.perf_counter() - start) / len(names)
+
+    start = time.perf_counter()
+    indexed = index.match_many([name for name, _ in assignments])
+    batched = time.perf_counter() - start
+
+    # The linear scan is slow, so time it on a sample and extrapolate
+    sample = assignments[: min(len(assignments), 2000)]
+    start = time.perf_counter()
+    legacy = [legacy_match(activities, {"posted_by": name}) for name, _ in sample]
+    legacy_time = (time.perf_counter() - start) * len(assignments) / len(sample)
+
+    def accuracy(results, expected):
+        return sum(r == e for r, (_, e) in zip(results, expected)) / len(results)
+
+    print(f"{args.activities} activities, {args.assignments} assignments")
+    print(f"index build:     {build * 1000:8.1f} ms")
+    print(f"cold lookup:     {cold * 1e6:8.1f} us/name")
+    print(f"batched:         {batched * 1e6 / len(assignments):8.2f} us/assignment")
+    print(f"linear:          {legacy_time * 1e6 / len(assignments):8.2f} us/assignment")
+    print(f"indexed correct: {accuracy(indexed, assignments):8.1%}")
+    print(f"linear correct:  {accuracy(legacy, sample):8.1%}")
+
+
+if __name__ == "__main__":
+    main()
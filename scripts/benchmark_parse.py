@@ -0,0 +1,109 @@
+"""
+Benchmark the process-pool parse stage against in-process parsing across
+worker counts and batch sizes, on generated Classroom notification emails.
+
+For each batch size the in-process time is the baseline; every worker count
+is checked to produce exactly the same assignments and tasks in the same
+order. Worker startup is excluded (the pool is warmed up first), as it is
+paid once per process rather than per sync.
+
+    python -m scripts.benchmark_parse --messages 20000 --workers 1,2,4,8
+    python -m scripts.benchmark_parse --batches 100,500,2000 --workers 2,4
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import time
+
+from services.mime import LazyPayload
+from services.parallel_parse import ParallelParser
+from services.records import ClassroomMessage
+from scripts.fake_servers import GeneratedMailbox, make_courses
+
+
+def make_messages(count, seed):
+    """Messages as the pipeline loads them from the state store."""
+    courses = make_courses(40, seed)
+    mailbox = GeneratedMailbox(
+        count, courses, seed=seed, assignment_ratio=1.0, announcement_ratio=0.0
+    )
+    messages = []
+    for index in range(count):
+        raw = mailbox.render(index)
+        messages.append(
+            ClassroomMessage(raw["id"], payload=LazyPayload(raw["payload"]).to_dict())
+        )
+    return messages
+
+
+def comparable(result):
+    extracted_data, tasks = result
+    return (
+        [extracted.to_dict() for extracted in extracted_data],
+        [task.to_notion() for task in tasks],
+    )
+
+
+def time_parse(parse, messages, batch, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for start in range(0, len(messages), batch):
+            parse(messages[start : start + batch])
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument(
+        "--batches",
+        default="500,20000",
+        help="Messages handed to the stage per call, e.g. one backfill page",
+    )
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--chunk-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.setdefault("NOTION_DATABASE_ID", "tasks-db")
+    messages = make_messages(args.messages, args.seed)
+    print(f"{len(messages)} messages, {os.cpu_count()} CPUs")
+
+    in_process = ParallelParser(workers=1).parse
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = comparable(in_process(messages))
+
+    for batch in (int(value) for value in args.batches.split(",")):
+        with contextlib.redirect_stdout(io.StringIO()):
+            baseline = time_parse(in_process, messages, batch, args.repeat)
+        print(
+            f"\nbatch {batch}: in-process {baseline:.3f}s "
+            f"({len(messages) / baseline:.0f} messages/s)"
+        )
+        for workers in (int(value) for value in args.workers.split(",")):
+            pool = ParallelParser(workers, chunk_size=args.chunk_size, min_parallel=0)
+            try:
+                # Start the workers and load their imports before timing
+                if workers > 1:
+                    pool.parse(messages[: workers * args.chunk_size])
+                result = comparable(pool.parse(messages))
+                assert result == expected, f"{workers} workers changed the output"
+                with contextlib.redirect_stdout(io.StringIO()):
+                    seconds = time_parse(pool.parse, messages, batch, args.repeat)
+            finally:
+                pool.close()
+            print(
+                f"  {workers:>2} workers: {seconds:.3f}s "
+                f"({len(messages) / seconds:.0f} messages/s), "
+                f"speedup {baseline / seconds:.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
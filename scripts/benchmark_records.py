@@ -0,0 +1,129 @@
+"""
+Benchmark the memory held by the pipeline's records against the dicts they
+replace, for messages, extracted assignments and Notion pages.
+
+Field values (IDs, names, notes, payloads) are created before measuring and
+shared by both representations, so the numbers are the cost of the
+containers alone: what a batch, a backfill page or the parse queue holds per
+record on top of its strings.
+
+    python -m scripts.benchmark_records --records 100000
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from services.records import ClassroomMessage, ExtractedAssignment, NotionTask
+
+
+def make_fields(count):
+    payload = {"headers": {"from": "no-reply@classroom.google.com"}, "parts": []}
+    rows = []
+    for index in range(count):
+        link = f"https://classroom.google.com/c/{index:012d}/a/{index * 7:012d}/details"
+        rows.append(
+            {
+                "id": f"{index:016x}",
+                "thread_id": f"{index:016x}",
+                "label_ids": ["INBOX", "CATEGORY_UPDATES"],
+                "snippet": f"New assignment {index}",
+                "payload": payload,
+                "assignment_name": f"Assignment {index}: Problem set",
+                "assignment_link": link,
+                "class_link": f"https://classroom.google.com/c/{index:012d}",
+                "assignment_description": f"Read section {index}",
+                "class_name": "AP Biology",
+                "due_date": "Sep 12",
+                "posted_date": "Sep 1",
+                "posted_by": "Jane Smith",
+                "due_start": "2025-09-12T00:00:00-07:00",
+                "note": f"Assignment Link: {link}\nDescription: Read section {index}",
+                "activity_id": f"activity-{index % 40}",
+            }
+        )
+    return rows
+
+
+def message_dict(row):
+    return {
+        "id": row["id"],
+        "threadId": row["thread_id"],
+        "labelIds": row["label_ids"],
+        "snippet": row["snippet"],
+        "payload": row["payload"],
+    }
+
+
+def message_record(row):
+    return ClassroomMessage(
+        row["id"], row["thread_id"], row["label_ids"], row["snippet"], row["payload"]
+    )
+
+
+def assignment_dict(row):
+    data = {field: row[field] for field in ExtractedAssignment.FIELDS}
+    data["message_id"] = row["id"]
+    return data
+
+
+def assignment_record(row):
+    return ExtractedAssignment(
+        *(row[field] for field in ExtractedAssignment.FIELDS), message_id=row["id"]
+    )
+
+
+def task_record(row):
+    return NotionTask(
+        "tasks-db",
+        row["assignment_name"],
+        row["assignment_link"],
+        row["due_start"],
+        row["note"],
+        row["activity_id"],
+    )
+
+
+def page_dict(row):
+    # The page JSON parse_assignments used to return, built from the same values
+    return task_record(row).to_notion()
+
+
+def measure(build, rows):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    items = [build(row) for row in rows]
+    seconds = time.perf_counter() - started
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del items
+    return size, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=100000)
+    args = parser.parse_args()
+
+    rows = make_fields(args.records)
+    print(f"{args.records} records")
+    for name, as_dict, as_record in (
+        ("messages", message_dict, message_record),
+        ("assignments", assignment_dict, assignment_record),
+        ("notion pages", page_dict, task_record),
+    ):
+        dict_size, dict_seconds = measure(as_dict, rows)
+        record_size, record_seconds = measure(as_record, rows)
+        print(
+            f"  {name:<12} dicts {dict_size / 2**20:7.1f} MiB "
+            f"({dict_size / args.records:5.0f} B each, {dict_seconds:.2f}s), "
+            f"records {record_size / 2**20:7.1f} MiB "
+            f"({record_size / args.records:5.0f} B each, {record_seconds:.2f}s), "
+            f"{dict_size / record_size:.1f}x smaller"
+        )
+
+
+if __name__ == "__main__":
+    main()
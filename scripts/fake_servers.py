@@ -0,0 +1,735 @@
+"""
+In-process fake Gmail and Notion API servers for offline benchmarks.
+
+FakeGmailServer serves users.getProfile, messages.list (with from:/subject:
+search), messages.get, users.history.list and the batch endpoint, over a
+mailbox of generated Classroom notification emails. FakeNotionServer serves
+database queries (status and last_edited_time filters, cursors), database
+retrieval and page create/update. Both can add latency and answer a share of
+requests with 429s or 500s, and count every call.
+
+    gmail = FakeGmailServer(GeneratedMailbox(1000)).start()
+    service = gmail.build_service()
+    notion = FakeNotionServer().start()
+    client = AsyncNotionClient("token", base_url=notion.url + "/v1")
+"""
+
+import base64
+import json
+import random
+import shlex
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit, unquote
+
+FIRST_NAMES = ["Jane", "John", "Priya", "Wei", "Maria", "Ahmed", "Olga", "Kwame"]
+SURNAMES = ["Smith", "Alvarez", "Natarajan", "O'Brien", "Chen", "Kowalski"]
+SURNAMES += ["Okafor", "Haddad", "Lindqvist", "Moreau", "Tanaka", "Fischer"]
+SUBJECTS = ["Biology", "Calculus", "World History", "English", "Chemistry"]
+SUBJECTS += ["Physics", "Spanish", "Economics", "Computer Science", "Art"]
+MONTHS = ["Sep", "Oct", "Nov", "Dec"]
+CLASSROOM_SENDER = "Google Classroom <no-reply@classroom.google.com>"
+
+
+def make_courses(count: int, seed: int = 0) -> List[Dict[str, str]]:
+    """Courses with a teacher each, as they would appear in the activities DB."""
+    rng = random.Random(seed)
+    courses = []
+    for index in range(count):
+        teacher = f"{rng.choice(FIRST_NAMES)} {rng.choice(SURNAMES)}"
+        if index >= len(FIRST_NAMES) * len(SURNAMES) // 2:
+            # Keep surnames distinct enough for matching in big catalogs
+            teacher += f"-{index}"
+        courses.append(
+            {
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "course_id": str(rng.randrange(10**11, 10**12)),
+                "title": f"{rng.choice(SUBJECTS)} {index + 1}",
+                "teacher": teacher,
+            }
+        )
+    return courses
+
+
+def make_assignment_html(index: int, course: Dict[str, str], rng) -> str:
+    """HTML shaped like a Classroom "New assignment" notification."""
+    chooser = "https://accounts.google.com/AccountChooser?continue="
+    class_url = f"https://classroom.google.com/c/{course['course_id']}"
+    work = rng.randrange(10**11, 10**12)
+    items = "".join(f"<li>Step {n}: read section {n}.{index}</li>" for n in range(3))
+    filler = '<tr><td style="padding:0 24px">&nbsp;</td></tr>' * rng.randint(20, 60)
+    return (
+        "<html><head><style>td{font-family:Roboto,Arial}</style></head><body>"
+        f"<table role=presentation width=100%>{filler}"
+        f"<tr><td><a href={chooser}{class_url}&amp;authuser=0>"
+        "<table><tr><td><img src=https://www.gstatic.com/classroom/logo.png></td>"
+        f"<td>{course['title']}</td></tr></table></a></td></tr>"
+        f"<tr><td><div>Assignment {index}: Problem set</div></td></tr>"
+        f"<tr><td>Due {rng.choice(MONTHS)} {rng.randint(1, 28)}</td></tr>"
+        f"<tr><td><ul>\n{items}\n</ul></td></tr>"
+        f"<tr><td><a href={chooser}{class_url}/a/{work}/details&amp;authuser=0>Open</a>"
+        "</td></tr>"
+        f"<tr><td>Posted on {rng.choice(MONTHS)} {rng.randint(1, 28)} by "
+        f"{course['teacher']}</td></tr>{filler}</table>"
+        "<p>Google LLC 1600 Amphitheatre Parkway, Mountain View, CA 94043 USA</p>"
+        "</body></html>"
+    )
+
+
+def _b64(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii")
+
+
+class GeneratedMailbox:
+    """
+    A mailbox of `size` messages rendered on demand, so 100k messages cost
+    almost no memory. `assignment_ratio` of them are Classroom "New
+    assignment" emails, `announcement_ratio` other Classroom notices and the
+    rest unrelated mail. Messages are numbered oldest first; message i was
+    added at history ID i + 1, so the mailbox's history ID is its size.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        courses: List[Dict[str, str]] = None,
+        seed: int = 0,
+        assignment_ratio: float = 0.7,
+        announcement_ratio: float = 0.1,
+    ):
+        self.seed = seed
+        self.courses = courses or make_courses(20, seed)
+        self.assignment_ratio = assignment_ratio
+        self.announcement_ratio = announcement_ratio
+        self.email_address = "student@example.com"
+        self.start_time = datetime(2025, 9, 1, tzinfo=timezone.utc)
+        self._lock = threading.Lock()
+        self.size = 0
+        self.add(size)
+
+    def add(self, count: int) -> List[str]:
+        """Deliver `count` new messages, returning their IDs."""
+        with self._lock:
+            first = self.size
+            self.size += count
+        return [self.message_id(index) for index in range(first, first + count)]
+
+    @property
+    def history_id(self) -> int:
+        return self.size
+
+    @staticmethod
+    def message_id(index: int) -> str:
+        return f"{index:016x}"
+
+    @staticmethod
+    def index_of(message_id: str) -> Optional[int]:
+        try:
+            return int(message_id, 16)
+        except ValueError:
+            return None
+
+    def kind(self, index: int) -> str:
+        roll = random.Random(self.seed * 1_000_003 + index).random()
+        if roll < self.assignment_ratio:
+            return "assignment"
+        if roll < self.assignment_ratio + self.announcement_ratio:
+            return "announcement"
+        return "other"
+
+    def headers(self, index: int) -> Tuple[str, str]:
+        kind = self.kind(index)
+        if kind == "assignment":
+            return CLASSROOM_SENDER, f"New assignment: Assignment {index}"
+        if kind == "announcement":
+            return CLASSROOM_SENDER, f"New announcement in class {index % 7}"
+        return "Newsletter <news@example.org>", f"Weekly digest #{index}"
+
+    def render(self, index: int) -> Dict[str, Any]:
+        rng = random.Random(-(self.seed * 1_000_003 + index) - 1)
+        sender, subject = self.headers(index)
+        if self.kind(index) == "assignment":
+            html = make_assignment_html(index, rng.choice(self.courses), rng)
+        else:
+            html = (
+                f"<html><body><p>{subject}</p>{'<p>Lorem ipsum</p>' * 40}</body></html>"
+            )
+        sent = self.start_time + timedelta(minutes=index)
+        message_id = self.message_id(index)
+        return {
+            "id": message_id,
+            "threadId": message_id,
+            "labelIds": ["INBOX", "UNREAD", "CATEGORY_UPDATES"],
+            "snippet": subject[:100],
+            "historyId": str(index + 1),
+            "internalDate": str(int(sent.timestamp() * 1000)),
+            "sizeEstimate": len(html) * 2,
+            "payload": {
+                "partId": "",
+                "mimeType": "multipart/alternative",
+                "filename": "",
+                "headers": [
+                    {"name": "From", "value": sender},
+                    {"name": "To", "value": self.email_address},
+                    {"name": "Subject", "value": subject},
+                    {
+                        "name": "Date",
+                        "value": sent.strftime("%a, %d %b %Y %H:%M:%S %z"),
+                    },
+                ],
+                "body": {"size": 0},
+                "parts": [
+                    {
+                        "partId": "0",
+                        "mimeType": "text/plain",
+                        "filename": "",
+                        "headers": [{"name": "Content-Type", "value": "text/plain"}],
+                        "body": {"size": len(subject), "data": _b64(subject)},
+                    },
+                    {
+                        "partId": "1",
+                        "mimeType": "text/html",
+                        "filename": "",
+                        "headers": [{"name": "Content-Type", "value": "text/html"}],
+                        "body": {"size": len(html), "data": _b64(html)},
+                    },
+                ],
+            },
+        }
+
+    @staticmethod
+    def parse_query(query: Optional[str]) -> List[Tuple[str, str]]:
+        """The from:/subject: terms of a Gmail search; others are ignored."""
+        terms = []
+        for term in shlex.split(query or ""):
+            key, _, value = term.partition(":")
+            if key in ("from", "subject"):
+                terms.append((key, value.lower()))
+        return terms
+
+    def matches(self, index: int, terms: List[Tuple[str, str]]) -> bool:
+        sender, subject = self.headers(index)
+        fields = {"from": sender.lower(), "subject": subject.lower()}
+        return all(value in fields[key] for key, value in terms)
+
+
+class FaultConfig:
+    """Latency and failure injection for a fake server."""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        error_rate: float = 0.0,
+        retry_after: float = 1.0,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        if not self.latency and not self.jitter:
+            return 0.0
+        with self._lock:
+            return self.latency + self._rng.uniform(0, self.jitter)
+
+    def failure(self) -> Optional[int]:
+        """429, 500 or None for a request that should succeed."""
+        if not self.rate_limit_rate and not self.error_rate:
+            return None
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500
+        return None
+
+
+class ApiStats:
+    """Per-endpoint call counts, statuses and server-side latencies."""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.statuses = Counter()
+        self.latencies = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, status: int, seconds: float) -> None:
+        with self._lock:
+            self.calls[endpoint] += 1
+            self.statuses[status] += 1
+            self.latencies[endpoint].append(seconds)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.statuses.clear()
+            self.latencies.clear()
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": dict(self.calls),
+                "statuses": {str(k): v for k, v in self.statuses.items()},
+                "latency_ms": {
+                    endpoint: percentiles(values)
+                    for endpoint, values in self.latencies.items()
+                },
+            }
+
+
+def percentiles(values: List[float], points=(50, 95, 99)) -> Dict[str, float]:
+    """Nearest-rank percentiles in milliseconds."""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    result = {}
+    for point in points:
+        rank = max(0, min(len(ordered) - 1, int(round(point / 100 * len(ordered))) - 1))
+        result[f"p{point}"] = round(ordered[rank] * 1000, 3)
+    return result
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; with Nagle on, every response
+    # would wait for the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _dispatch(self, method: str) -> None:
+        started = time.perf_counter()
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        fake = self.server.fake
+        endpoint, status, headers, payload = fake.handle(
+            method, self.path, self.headers, body
+        )
+        if isinstance(payload, (dict, list)):
+            payload = json.dumps(payload).encode("utf-8")
+            headers.setdefault("Content-Type", "application/json; charset=UTF-8")
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        fake.stats.record(endpoint, status, time.perf_counter() - started)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+
+class _FakeServer:
+    def __init__(self, faults: FaultConfig = None, host: str = "127.0.0.1"):
+        self.faults = faults or FaultConfig()
+        self.stats = ApiStats()
+        self.host = host
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self._server.server_address[1]}"
+
+    def start(self, port: int = 0):
+        self._server = ThreadingHTTPServer((self.host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name=type(self).__name__, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def handle(self, method, path, headers, body):
+        """Return (endpoint name, status, headers, JSON payload or bytes)."""
+        raise NotImplementedError
+
+
+class FakeGmailServer(_FakeServer):
+    def __init__(
+        self,
+        mailbox: GeneratedMailbox,
+        faults: FaultConfig = None,
+        history_retention: int = None,
+    ):
+        super().__init__(faults)
+        self.mailbox = mailbox
+        # History IDs older than this many messages answer 404, like an
+        # expired startHistoryId
+        self.history_retention = history_retention
+
+    def build_service(self, http=None):
+        """A googleapiclient Gmail service whose calls all go to this server."""
+        import httplib2
+        from googleapiclient import discovery_cache
+        from googleapiclient.discovery import build_from_document
+
+        document = json.loads(discovery_cache.get_static_doc("gmail", "v1"))
+        document["rootUrl"] = self.url + "/"
+        document["baseUrl"] = self.url + "/"
+        return build_from_document(document, http=http or httplib2.Http(timeout=60))
+
+    @staticmethod
+    def _error(status: int, retry_after: float = None):
+        reason = {429: "rateLimitExceeded", 404: "notFound"}.get(status, "backendError")
+        headers = {"Retry-After": str(retry_after)} if retry_after else {}
+        payload = {
+            "error": {
+                "code": status,
+                "message": reason,
+                "errors": [{"reason": reason, "message": reason}],
+            }
+        }
+        return status, headers, payload
+
+    def handle(self, method, path, headers, body):
+        time.sleep(self.faults.delay())
+        url = urlsplit(path)
+        if url.path == "/batch":
+            return ("batch",) + self._batch(headers, body)
+        endpoint, status, out_headers, payload = self._route(
+            method, url.path, parse_qs(url.query)
+        )
+        failure = self.faults.failure()
+        if failure:
+            return (endpoint,) + self._error(failure, self.faults.retry_after)
+        return endpoint, status, out_headers, payload
+
+    def _route(self, method, path, query):
+        parts = [unquote(part) for part in path.strip("/").split("/")]
+        # gmail/v1/users/{userId}/...
+        resource = parts[4:]
+        if resource == ["profile"]:
+            return "getProfile", 200, {}, self._profile()
+        if resource == ["messages"]:
+            return ("messages.list",) + self._list(query)
+        if len(resource) == 2 and resource[0] == "messages":
+            return ("messages.get",) + self._get(resource[1], query)
+        if resource == ["history"]:
+            return ("history.list",) + self._history(query)
+        if resource == ["watch"] and method == "POST":
+            expiration = int((time.time() + 7 * 24 * 3600) * 1000)
+            payload = {
+                "historyId": str(self.mailbox.history_id),
+                "expiration": str(expiration),
+            }
+            return "watch", 200, {}, payload
+        return ("unknown",) + self._error(404)
+
+    def _profile(self):
+        return {
+            "emailAddress": self.mailbox.email_address,
+            "messagesTotal": self.mailbox.size,
+            "threadsTotal": self.mailbox.size,
+            "historyId": str(self.mailbox.history_id),
+        }
+
+    def _list(self, query):
+        max_results = min(int(query.get("maxResults", ["100"])[0]), 500)
+        terms = self.mailbox.parse_query(query.get("q", [None])[0])
+        # Newest first, like Gmail; the page token is the next index to scan
+        start = int(query.get("pageToken", [self.mailbox.size - 1])[0])
+        messages = []
+        index = start
+        while index >= 0 and len(messages) < max_results:
+            if self.mailbox.matches(index, terms):
+                message_id = self.mailbox.message_id(index)
+                messages.append({"id": message_id, "threadId": message_id})
+            index -= 1
+        # Like Gmail's, the estimate is for the whole query, not the page
+        scanned = max(start - index, 1)
+        estimate = round(len(messages) * self.mailbox.size / scanned)
+        payload = {"messages": messages, "resultSizeEstimate": estimate}
+        if index >= 0:
+            payload["nextPageToken"] = str(index)
+        return 200, {}, payload
+
+    def _get(self, message_id, query):
+        index = self.mailbox.index_of(message_id)
+        if index is None or not 0 <= index < self.mailbox.size:
+            return self._error(404)
+        message = self.mailbox.render(index)
+        if query.get("format", ["full"])[0] == "metadata":
+            names = {name.lower() for name in query.get("metadataHeaders", [])}
+            headers = message["payload"]["headers"]
+            message["payload"] = {
+                "mimeType": message["payload"]["mimeType"],
+                "headers": [h for h in headers if h["name"].lower() in names],
+            }
+        return 200, {}, message
+
+    def _history(self, query):
+        start_history_id = int(query["startHistoryId"][0])
+        current = self.mailbox.history_id
+        oldest = 0
+        if self.history_retention is not None:
+            oldest = max(0, current - self.history_retention)
+        if start_history_id < oldest:
+            return self._error(404)
+        page_size = min(int(query.get("maxResults", ["100"])[0]), 500)
+        # Message i was added at history ID i + 1
+        first = int(query.get("pageToken", [start_history_id])[0])
+        last = min(first + page_size, self.mailbox.size)
+        history = []
+        for index in range(first, last):
+            message_id = self.mailbox.message_id(index)
+            message = {"id": message_id, "threadId": message_id}
+            history.append(
+                {"id": str(index + 1), "messagesAdded": [{"message": message}]}
+            )
+        payload = {"history": history, "historyId": str(current)}
+        if last < self.mailbox.size:
+            payload["nextPageToken"] = str(last)
+        return 200, {}, payload
+
+    def _batch(self, headers, body):
+        content_type = headers.get("Content-Type", "")
+        message = BytesParser().parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode("utf-8") + body
+        )
+        boundary = f"batch_{uuid.uuid4().hex}"
+        chunks = []
+        for part in message.get_payload():
+            request_line = part.get_payload().lstrip().split("\n", 1)[0]
+            method, target = request_line.split(" ")[:2]
+            url = urlsplit(target)
+            endpoint, status, _, payload = self._route(
+                method, url.path, parse_qs(url.query)
+            )
+            failure = self.faults.failure()
+            if failure:
+                status, _, payload = self._error(failure)
+            self.stats.record(f"batch:{endpoint}", status, 0.0)
+            reason = {200: "OK", 404: "Not Found", 429: "Too Many Requests"}.get(
+                status, "Error"
+            )
+            content_id = part["Content-ID"].strip().replace("<", "<response-", 1)
+            chunks.append(
+                f"--{boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: {content_id}\r\n\r\n"
+                f"HTTP/1.1 {status} {reason}\r\n"
+                "Content-Type: application/json; charset=UTF-8\r\n\r\n"
+                f"{json.dumps(payload)}\r\n"
+            )
+        chunks.append(f"--{boundary}--\r\n")
+        return (
+            200,
+            {"Content-Type": f"multipart/mixed; boundary={boundary}"},
+            "".join(chunks).encode("utf-8"),
+        )
+
+
+class FakeNotionServer(_FakeServer):
+    """
+    Notion API with in-memory databases. Pages keep the properties they were
+    created with; query filters understand status/select/rich_text/title/url
+    equality, "or"/"and" compounds and last_edited_time on_or_after.
+    """
+
+    def __init__(self, faults: FaultConfig = None):
+        super().__init__(faults)
+        self.databases: Dict[str, Dict[str, Any]] = {}
+        self.pages: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def add_database(self, database_id: str, title: str = "Database") -> None:
+        self.databases[database_id] = {"title": title, "page_ids": []}
+
+    def add_page(self, database_id: str, properties: Dict[str, Any]) -> Dict[str, Any]:
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:00.000Z")
+        page = {
+            "object": "page",
+            "id": str(uuid.uuid4()),
+            "created_time": now,
+            "last_edited_time": now,
+            "archived": False,
+            "parent": {"type": "database_id", "database_id": database_id},
+            "properties": properties,
+        }
+        with self._lock:
+            self.pages[page["id"]] = page
+            self.databases[database_id]["page_ids"].append(page["id"])
+        return page
+
+    def add_activities(
+        self, database_id: str, courses: List[Dict[str, str]], status="In Progress"
+    ) -> None:
+        """Fill an activities database with one page per course."""
+        for course in courses:
+            page = self.add_page(
+                database_id,
+                {
+                    "Name": {
+                        "type": "title",
+                        "title": [{"plain_text": course["title"]}],
+                    },
+                    "Status": {"type": "status", "status": {"name": status}},
+                },
+            )
+            course["id"] = page["id"]
+
+    @staticmethod
+    def _error(status: int, code: str, retry_after: float = None):
+        headers = {"Retry-After": str(retry_after)} if retry_after else {}
+        return (
+            status,
+            headers,
+            {"object": "error", "status": status, "code": code, "message": code},
+        )
+
+    def handle(self, method, path, headers, body):
+        time.sleep(self.faults.delay())
+        parts = urlsplit(path).path.strip("/").split("/")[1:]
+        request = json.loads(body) if body else {}
+        endpoint = f"{method} {parts[0] if parts else ''}"
+        if len(parts) == 3 and parts[0] == "databases" and parts[2] == "query":
+            endpoint = "databases.query"
+        elif len(parts) == 2 and parts[0] == "databases":
+            endpoint = "databases.retrieve"
+        elif parts == ["pages"] and method == "POST":
+            endpoint = "pages.create"
+        elif len(parts) == 2 and parts[0] == "pages":
+            endpoint = "pages.update" if method == "PATCH" else "pages.retrieve"
+
+        failure = self.faults.failure()
+        if failure == 429:
+            return (endpoint,) + self._error(
+                429, "rate_limited", self.faults.retry_after
+            )
+        if failure:
+            return (endpoint,) + self._error(500, "internal_server_error")
+
+        if endpoint == "databases.query":
+            return (endpoint,) + self._query(parts[1], request)
+        if endpoint == "databases.retrieve":
+            return (endpoint,) + self._retrieve_database(parts[1])
+        if endpoint == "pages.create":
+            database_id = request.get("parent", {}).get("database_id")
+            if database_id not in self.databases:
+                return (endpoint,) + self._error(404, "object_not_found")
+            return endpoint, 200, {}, self.add_page(database_id, request["properties"])
+        if endpoint in ("pages.update", "pages.retrieve"):
+            return (endpoint,) + self._page(parts[1], request, method)
+        return (endpoint,) + self._error(400, "invalid_request_url")
+
+    def _retrieve_database(self, database_id):
+        if database_id not in self.databases:
+            return self._error(404, "object_not_found")
+        return (
+            200,
+            {},
+            {
+                "object": "database",
+                "id": database_id,
+                "title": [{"plain_text": self.databases[database_id]["title"]}],
+                "properties": {
+                    "Name": {"type": "title", "title": {}},
+                    "Status": {"type": "status", "status": {}},
+                },
+            },
+        )
+
+    def _page(self, page_id, request, method):
+        page = self.pages.get(page_id)
+        if page is None:
+            return self._error(404, "object_not_found")
+        if method == "PATCH":
+            with self._lock:
+                page["properties"].update(request.get("properties", {}))
+                page["archived"] = request.get("archived", page["archived"])
+                page["last_edited_time"] = datetime.now(timezone.utc).strftime(
+                    "%Y-%m-%dT%H:%M:00.000Z"
+                )
+        return 200, {}, page
+
+    def _query(self, database_id, request):
+        if database_id not in self.databases:
+            return self._error(404, "object_not_found")
+        page_ids = self.databases[database_id]["page_ids"]
+        page_size = min(int(request.get("page_size", 100)), 100)
+        start = int(request.get("start_cursor") or 0)
+        condition = request.get("filter")
+        results = []
+        index = start
+        while index < len(page_ids) and len(results) < page_size:
+            page = self.pages[page_ids[index]]
+            if not page["archived"] and self._matches(page, condition):
+                results.append(page)
+            index += 1
+        has_more = index < len(page_ids)
+        return (
+            200,
+            {},
+            {
+                "object": "list",
+                "results": results,
+                "has_more": has_more,
+                "next_cursor": str(index) if has_more else None,
+            },
+        )
+
+    @classmethod
+    def _matches(cls, page, condition) -> bool:
+        if not condition:
+            return True
+        if "or" in condition:
+            return any(cls._matches(page, item) for item in condition["or"])
+        if "and" in condition:
+            return all(cls._matches(page, item) for item in condition["and"])
+        if condition.get("timestamp") == "last_edited_time":
+            after = condition["last_edited_time"].get("on_or_after")
+            return after is None or page["last_edited_time"] >= after
+        value = cls._property_value(page["properties"].get(condition.get("property")))
+        for kind in ("status", "select", "rich_text", "title", "url"):
+            if kind in condition:
+                test = condition[kind]
+                if "equals" in test:
+                    return value == test["equals"]
+                if "contains" in test:
+                    return test["contains"] in (value or "")
+        return True
+
+    @staticmethod
+    def _property_value(prop) -> Optional[str]:
+        if not prop:
+            return None
+        for kind in ("status", "select"):
+            if prop.get(kind) is not None:
+                return prop[kind].get("name")
+        for kind in ("title", "rich_text"):
+            if kind in prop:
+                return "".join(
+                    item.get("plain_text") or item.get("text", {}).get("content", "")
+                    for item in prop[kind]
+                )
+        return prop.get("url")
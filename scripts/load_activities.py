@@ -5,31 +5,32 @@ from typing import List, Dict, Any
 from services.notion import NotionDatabaseManager
 
 
-def load_activities() -> List[Dict[str, Any]]:
+def load_activities(database_id: str = None, token: str = None) -> List[Dict[str, Any]]:
     load_dotenv()
     ndm = NotionDatabaseManager(
-        database_id=os.getenv("ACTIVITIES_DATABASE_ID"), token=os.getenv("NOTION_TOKEN")
+        database_id=database_id or os.getenv("ACTIVITIES_DATABASE_ID"),
+        token=token or os.getenv("NOTION_TOKEN"),
     )
 
-    response = ndm.get_tasks_by_status(["In Progress"])
+    # Stream rows so databases with more than one page (100 rows) are
+    # read in full, building activities as each page arrives
+    rows = []
+    activities = []
+    for item in ndm.iter_tasks_by_status(["In Progress"]):
+        rows.append(item)
+        activity = {
+            "id": item.get("id", ""),
+            "title": item.get("properties", {})
+            .get("Name", {})
+            .get("title", [{}])[0]
+            .get("plain_text", ""),
+            "teacher": "",  # Initialize teacher as empty string
+        }
+        activities.append(activity)
 
     # Save the full response for debugging
     with open("outputs/notion_results.json", "w") as file:
-        json.dump(response, file, indent=2)
-
-    # Extract the actual activity data from the 'results' key
-    activities = []
-    if isinstance(response, dict) and "results" in response:
-        for item in response["results"]:
-            activity = {
-                "id": item.get("id", ""),
-                "title": item.get("properties", {})
-                .get("Name", {})
-                .get("title", [{}])[0]
-                .get("plain_text", ""),
-                "teacher": "",  # Initialize teacher as empty string
-            }
-            activities.append(activity)
+        json.dump({"object": "list", "results": rows}, file, indent=2)
 
     # Save the extracted activities for verification
     with open("outputs/extracted_activities.json", "w") as file:
@@ -0,0 +1,78 @@
+"""
+Stand-in for Pub/Sub: post Gmail push notifications to a running server.
+
+    python -m scripts.replay_push --history-id 123456 --repeat 3
+    python -m scripts.replay_push --file outputs/push_envelopes.json
+
+Without --history-id the mailbox's current history ID is read from Gmail, so
+the notification looks exactly like the one Gmail would send for new mail.
+--file replays saved envelopes (a JSON list) in order, e.g. ones captured
+from a real subscription.
+"""
+
+import argparse
+import json
+import time
+import urllib.error
+import urllib.request
+
+from services.gmail_push import encode_notification
+
+
+def post_envelope(url, envelope):
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(envelope).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, json.loads(response.read() or b"null")
+    except urllib.error.HTTPError as error:
+        return error.code, error.read().decode("utf-8", "replace")
+
+
+def current_mailbox():
+    from dotenv import load_dotenv
+    from services.classroom import ClassroomDataManager
+
+    load_dotenv()
+    cdm = ClassroomDataManager("credentials.json", "token.json")
+    profile = cdm.connect().users().getProfile(userId="me").execute()
+    return profile["emailAddress"], int(profile["historyId"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8888/gmail/push")
+    parser.add_argument("--token", help="PUSH_VERIFICATION_TOKEN of the server")
+    parser.add_argument("--email", default=None)
+    parser.add_argument("--history-id", type=int, default=None)
+    parser.add_argument("--file", help="JSON list of envelopes to replay")
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="Deliver each envelope this often"
+    )
+    parser.add_argument("--delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    url = f"{args.url}?token={args.token}" if args.token else args.url
+    if args.file:
+        with open(args.file) as f:
+            envelopes = json.load(f)
+    else:
+        email, history_id = args.email, args.history_id
+        if history_id is None:
+            email, history_id = current_mailbox()
+        envelopes = [encode_notification(email or "me@example.com", history_id)]
+
+    for envelope in envelopes:
+        # Repeats reuse the Pub/Sub message ID, like a redelivery
+        for _ in range(args.repeat):
+            status, body = post_envelope(url, envelope)
+            print(f"{status}: {body}")
+            time.sleep(args.delay)
+
+
+if __name__ == "__main__":
+    main()
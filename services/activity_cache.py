@@ -0,0 +1,107 @@
+import time
+import logging
+from typing import List, Dict, Any, Tuple
+from services.notion import NotionDatabaseManager
+from services.state_store import StateStore
+
+
+def activity_from_page(item: Dict[str, Any]) -> Dict[str, Any]:
+    properties = item.get("properties", {})
+    title = properties.get("Name", {}).get("title", [{}])
+    status = (properties.get("Status", {}).get("status") or {}).get("name", "")
+    return {
+        "id": item.get("id", ""),
+        "title": title[0].get("plain_text", "") if title else "",
+        "status": status,
+        "last_edited_time": item.get("last_edited_time"),
+        "teacher": "",
+    }
+
+
+class ActivityCache:
+    """
+    Activities from the Notion activities database, kept in the StateStore.
+
+    Within `ttl` seconds of the last refresh no Notion call is made at all.
+    After that only pages edited since the newest last_edited_time seen are
+    queried; pages that left the wanted statuses are dropped. A full reload
+    runs every `full_refresh_interval` seconds to catch deleted pages, which
+    an edited-since query cannot see.
+    """
+
+    def __init__(
+        self,
+        ndm: NotionDatabaseManager,
+        store: StateStore,
+        statuses: List[str] = None,
+        ttl: float = 15 * 60,
+        full_refresh_interval: float = 24 * 60 * 60,
+    ):
+        self.ndm = ndm
+        self.store = store
+        self.statuses = statuses or ["In Progress"]
+        self.ttl = ttl
+        self.full_refresh_interval = full_refresh_interval
+
+    def _get_time(self, key: str) -> float:
+        return float(self.store.get_value(key, 0))
+
+    def is_fresh(self) -> bool:
+        return time.time() - self._get_time("activities_fetched_at") < self.ttl
+
+    def get(self) -> List[Dict[str, Any]]:
+        if not self.is_fresh():
+            self.refresh()
+        return self.store.get_activities()
+
+    def refresh(self, full: bool = False) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Bring the cache up to date.
+
+        :return: (activities added or changed, IDs of activities removed)
+        """
+        now = time.time()
+        watermark = self.store.get_value("activities_last_edited")
+        full = (
+            full
+            or not watermark
+            or now - self._get_time("activities_full_refresh_at")
+            >= self.full_refresh_interval
+        )
+
+        if full:
+            old_ids = {activity["id"] for activity in self.store.get_activities()}
+            activities = [
+                activity_from_page(item)
+                for item in self.ndm.iter_tasks_by_status(self.statuses)
+            ]
+            self.store.replace_activities(activities)
+            self.store.set_value("activities_full_refresh_at", now)
+            seen = changed = activities
+            removed = list(old_ids - {activity["id"] for activity in activities})
+        else:
+            # Notion rounds last_edited_time to the minute, so on_or_after
+            # re-reads the boundary minute rather than risk missing an edit
+            query = {
+                "filter": {
+                    "timestamp": "last_edited_time",
+                    "last_edited_time": {"on_or_after": watermark},
+                }
+            }
+            seen = [activity_from_page(item) for item in self.ndm.iter_query(query)]
+            changed = [a for a in seen if a["status"] in self.statuses]
+            removed = [a["id"] for a in seen if a["status"] not in self.statuses]
+            self.store.upsert_activities(changed)
+            self.store.delete_activities(removed)
+
+        edit_times = [a["last_edited_time"] for a in seen if a["last_edited_time"]]
+        if edit_times:
+            self.store.set_value(
+                "activities_last_edited", max(edit_times + [watermark or ""])
+            )
+        self.store.set_value("activities_fetched_at", now)
+        logging.info(
+            f"Refreshed activities ({'full' if full else 'incremental'}): "
+            f"{len(changed)} changed, {len(removed)} removed"
+        )
+        return changed, removed
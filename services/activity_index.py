@@ -0,0 +1,70 @@
+from typing import List, Dict, Any, Optional
+from services.fuzzy_matcher import MatchCandidate, TrigramIndex, normalize_teacher
+
+
+class ActivityIndex:
+    """
+    Precomputed lookup from a "posted by" name to an activity ID. An exact
+    match on the normalized teacher name (lowercase, no punctuation or
+    honorifics) wins; otherwise the best fuzzy match from a trigram index is
+    used if it scores at least `threshold`. Ties go to the activity that was
+    added first, and activities without a teacher never match.
+    """
+
+    def __init__(self, activities: List[Dict[str, Any]] = None, threshold: float = 0.5):
+        self.threshold = threshold
+        self.exact: Dict[str, List[str]] = {}
+        self.teachers: Dict[str, str] = {}
+        self.fuzzy = TrigramIndex()
+        self.memo: Dict[str, str] = {}
+        for activity in activities or []:
+            self.add(activity)
+
+    def add(self, activity: Dict[str, Any]) -> None:
+        activity_id = activity.get("id")
+        self.remove(activity_id)
+        self.memo.clear()
+
+        teacher = normalize_teacher(activity.get("teacher") or "")
+        if not teacher:
+            return
+        self.teachers[activity_id] = teacher
+        self.exact.setdefault(teacher, []).append(activity_id)
+        self.fuzzy.add(activity_id, teacher)
+
+    def remove(self, activity_id: str) -> None:
+        teacher = self.teachers.pop(activity_id, None)
+        if teacher is None:
+            return
+        self.memo.clear()
+        self.exact[teacher].remove(activity_id)
+        if not self.exact[teacher]:
+            del self.exact[teacher]
+        self.fuzzy.remove(activity_id)
+
+    def update(self, activities: List[Dict[str, Any]]) -> None:
+        for activity in activities:
+            self.add(activity)
+
+    def candidates(self, posted_by: str, limit: int = 5) -> List[MatchCandidate]:
+        """Ranked fuzzy candidates with scores, for inspection or review."""
+        return self.fuzzy.candidates(posted_by, limit)
+
+    def match(self, posted_by: str) -> str:
+        return self.match_many([posted_by])[0]
+
+    def match_many(self, names: List[str]) -> List[str]:
+        """Match a batch of names, resolving each distinct name only once."""
+        pending = {normalize_teacher(name) for name in names} - self.memo.keys()
+        for name in pending:
+            self.memo[name] = self._match(name)
+        return [self.memo[normalize_teacher(name)] for name in names]
+
+    def _match(self, name: str) -> str:
+        if not name:
+            return ""
+        exact = self.exact.get(name)
+        if exact:
+            return exact[0]
+        best: Optional[MatchCandidate] = self.fuzzy.best(name, self.threshold)
+        return best.key if best else ""
@@ -0,0 +1,149 @@
+from collections import deque
+from datetime import datetime, time as dt_time
+from typing import List, Dict, Any, Optional, Tuple
+
+
+def parse_quiet_hours(value: Optional[str]) -> List[Tuple[dt_time, dt_time]]:
+    """
+    Parse windows like "22:00-06:30,12:00-13:00". A window whose end is
+    before its start wraps past midnight.
+    """
+    windows = []
+    for window in (value or "").split(","):
+        window = window.strip()
+        if not window:
+            continue
+        start, end = window.split("-")
+        windows.append(
+            (
+                datetime.strptime(start.strip(), "%H:%M").time(),
+                datetime.strptime(end.strip(), "%H:%M").time(),
+            )
+        )
+    return windows
+
+
+def classify_result(result: Optional[Dict[str, Any]]) -> str:
+    """One of "quota", "error", "new" or "idle" for a sync result."""
+    if not result:
+        return "error"
+    if result.get("quota_exceeded"):
+        return "quota"
+    if result.get("error") or result.get("status") == "error":
+        return "error"
+    # Other new mail is filtered out and says nothing about Classroom activity
+    if result.get("new_assignments") or result.get("updated_assignments"):
+        return "new"
+    return "idle"
+
+
+class AdaptiveScheduler:
+    """
+    Picks the delay before the next poll from the outcome of the last one.
+
+    - new or changed assignments: poll every `burst_interval` seconds for
+      `burst_polls` polls, since Classroom posts often come in batches
+    - nothing new: grow the interval by `idle_factor` up to `max_interval`
+    - errors: back off exponentially from `base_interval` up to
+      `max_error_interval`; quota errors start one step further back
+    - quiet hours: never poll more often than `quiet_interval`
+
+    Every decision is kept in `history` for inspection.
+    """
+
+    def __init__(
+        self,
+        base_interval: float = 180,
+        min_interval: float = 30,
+        max_interval: float = 1800,
+        idle_factor: float = 1.5,
+        burst_interval: float = 30,
+        burst_polls: int = 3,
+        error_factor: float = 2,
+        max_error_interval: float = 3600,
+        quiet_hours: List[Tuple[dt_time, dt_time]] = None,
+        quiet_interval: float = 3600,
+        history_size: int = 200,
+    ):
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.idle_factor = idle_factor
+        self.burst_interval = burst_interval
+        self.burst_polls = burst_polls
+        self.error_factor = error_factor
+        self.max_error_interval = max_error_interval
+        self.quiet_hours = quiet_hours or []
+        self.quiet_interval = quiet_interval
+
+        self.interval = base_interval
+        self.burst_remaining = 0
+        self.consecutive_errors = 0
+        self.history = deque(maxlen=history_size)
+
+    def in_quiet_hours(self, now: datetime) -> bool:
+        current = now.time()
+        for start, end in self.quiet_hours:
+            if start <= end:
+                if start <= current < end:
+                    return True
+            elif current >= start or current < end:
+                return True
+        return False
+
+    def next_interval(
+        self, result: Optional[Dict[str, Any]], now: datetime = None
+    ) -> float:
+        now = now or datetime.now()
+        outcome = classify_result(result)
+
+        if outcome in ("error", "quota"):
+            self.consecutive_errors += 1
+            steps = self.consecutive_errors + (1 if outcome == "quota" else 0)
+            interval = min(
+                self.max_error_interval,
+                self.base_interval * self.error_factor ** (steps - 1),
+            )
+            reason = f"{outcome} #{self.consecutive_errors}, backing off"
+        elif outcome == "new":
+            self.consecutive_errors = 0
+            self.burst_remaining = self.burst_polls
+            self.interval = self.base_interval
+            interval = self.burst_interval
+            reason = "new assignments, burst polling"
+        else:
+            self.consecutive_errors = 0
+            if self.burst_remaining > 0:
+                self.burst_remaining -= 1
+                interval = self.burst_interval
+                reason = f"burst, {self.burst_remaining} polls left"
+            else:
+                self.interval = min(self.max_interval, self.interval * self.idle_factor)
+                interval = self.interval
+                reason = "idle, slowing down"
+
+        if self.in_quiet_hours(now) and interval < self.quiet_interval:
+            interval = self.quiet_interval
+            reason += " (quiet hours)"
+        interval = max(self.min_interval, interval)
+
+        self.history.append(
+            {
+                "at": now.isoformat(timespec="seconds"),
+                "outcome": outcome,
+                "interval": interval,
+                "reason": reason,
+            }
+        )
+        return interval
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "idle_interval": self.interval,
+            "burst_remaining": self.burst_remaining,
+            "consecutive_errors": self.consecutive_errors,
+            "quiet_hours": [
+                f"{start:%H:%M}-{end:%H:%M}" for start, end in self.quiet_hours
+            ],
+            "history": list(self.history),
+        }
@@ -0,0 +1,100 @@
+import re
+from typing import Dict, Any, Optional
+
+NOT_FOUND = "Not found"
+
+# Precompiled once at import. Each pattern is a plain search with a literal
+# prefix, which the regex engine scans for far faster than it can evaluate
+# one combined alternation at every offset of the body. The description and
+# class name are located with str.find instead (see below)
+_NAME_RE = re.compile(r"<div>(.*?)</div>")
+_ACCOUNT_CHOOSER = "https://accounts.google.com/AccountChooser?continue="
+_LINK_RE = re.compile(
+    r"href=" + re.escape(_ACCOUNT_CHOOSER) + r"(https://classroom\.google\.com/c/[^&]+)"
+)
+_LIST_ITEM_RE = re.compile(r"<li>(.*?)</li>")
+_DUE_DATE_RE = re.compile(r"Due ([^<]+)")
+_POSTED_RE = re.compile(r"Posted on ([^<]+) by ([^<]+)")
+_ASSIGNMENT_PATH_RE = re.compile(r"https://classroom\.google\.com/c/[^&]+/a/[^&]+")
+
+# The class name is the text just before the end of the header link table
+_CLASS_NAME_SUFFIX = "</td></tr></table></a></td>"
+
+
+def find_html_part(payload: Dict[str, Any]) -> Optional[str]:
+    """
+    Return the decoded body of the first text/html part of a processed
+    payload, searching nested multipart containers depth first.
+    """
+    if payload.get("mimeType", "").lower() == "text/html":
+        return payload.get("body", "")
+    for part in payload.get("parts", []):
+        html = find_html_part(part)
+        if html is not None:
+            return html
+    return None
+
+
+def _first_group(pattern: re.Pattern, html_content: str) -> str:
+    match = pattern.search(html_content)
+    return match.group(1) if match else NOT_FOUND
+
+
+def _description(html_content: str) -> str:
+    # Same as re.search(r"<ul>(.*?)</ul>", html_content, re.DOTALL)
+    start = html_content.find("<ul>")
+    if start == -1:
+        return NOT_FOUND
+    end = html_content.find("</ul>", start + 4)
+    if end == -1:
+        return NOT_FOUND
+    return "\n".join(_LIST_ITEM_RE.findall(html_content, start + 4, end))
+
+
+def _class_name(html_content: str) -> str:
+    # Same as re.search(r">([^<]+)</td></tr></table></a></td>", html_content)
+    # without trying the pattern at every ">" in the body
+    end = html_content.find(_CLASS_NAME_SUFFIX)
+    while end != -1:
+        tag_start = html_content.rfind("<", 0, end)
+        start = html_content.find(">", tag_start + 1, end)
+        if start != -1 and start + 1 < end:
+            return html_content[start + 1 : end]
+        end = html_content.find(_CLASS_NAME_SUFFIX, end + 1)
+    return NOT_FOUND
+
+
+def extract_assignment(html_content: str) -> Dict[str, str]:
+    """
+    Extract the assignment fields from a Classroom notification email body.
+
+    The class and assignment links come from a single scan over the
+    AccountChooser links: the first one is the class link and the first one
+    pointing at /a/ is the assignment.
+    """
+    class_link = NOT_FOUND
+    assignment_link = NOT_FOUND
+    for match in _LINK_RE.finditer(html_content):
+        link = match.group(1)
+        if class_link is NOT_FOUND:
+            class_link = link.replace(_ACCOUNT_CHOOSER, "")
+        if _ASSIGNMENT_PATH_RE.fullmatch(link):
+            assignment_link = link.replace(_ACCOUNT_CHOOSER, "")
+            break
+
+    posted_match = _POSTED_RE.search(html_content)
+    if posted_match:
+        posted_date, posted_by = posted_match.groups()
+    else:
+        posted_date = posted_by = NOT_FOUND
+
+    return {
+        "assignment_name": _first_group(_NAME_RE, html_content),
+        "assignment_link": assignment_link,
+        "class_link": class_link,
+        "assignment_description": _description(html_content),
+        "class_name": _class_name(html_content),
+        "due_date": _first_group(_DUE_DATE_RE, html_content),
+        "posted_date": posted_date,
+        "posted_by": posted_by,
+    }
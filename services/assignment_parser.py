@@ -2,26 +2,81 @@ import json
 import os
 from datetime import datetime
 import pytz
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from services.activity_index import ActivityIndex
+from services.fuzzy_matcher import MatchCandidate
+from services.records import ExtractedAssignment, NotionTask
+
+DEFAULT_ACTIVITIES_FILE = "constants/activities_with_teachers.json"
 
 
 class AssignmentParser:
-    def __init__(self, activities):
+    def __init__(
+        self,
+        activities=None,
+        match_threshold: float = 0.5,
+        database_id: str = None,
+        activities_file: str = DEFAULT_ACTIVITIES_FILE,
+    ):
         self.activities = []
+        self.match_threshold = match_threshold
+        # The tasks database pages are created in; NOTION_DATABASE_ID if None
+        self.database_id = database_id
+        self.activities_file = activities_file
+        self.index = ActivityIndex(threshold=match_threshold)
         self.load_or_create_activities()
+        # Teacher names are entered once during setup and saved with the
+        # activities; fresh activity rows from Notion get them by ID
+        self.teachers = {
+            activity["id"]: activity.get("teacher", "") for activity in self.activities
+        }
+        if activities:
+            self.set_activities(self.with_teachers(activities))
+
+    def with_teachers(self, activities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [
+            dict(
+                activity,
+                teacher=self.teachers.get(activity.get("id"))
+                or activity.get("teacher", ""),
+            )
+            for activity in activities
+        ]
 
     def set_activities(self, activities: List[Dict[str, Any]]) -> None:
         self.activities = activities
+        self.index = ActivityIndex(activities, threshold=self.match_threshold)
+
+    def add_activities(self, activities: List[Dict[str, Any]]) -> None:
+        """Add or replace activities (by ID) without rebuilding the index."""
+        by_id = {
+            activity.get("id"): activity for activity in self.with_teachers(activities)
+        }
+        self.activities = [
+            activity for activity in self.activities if activity.get("id") not in by_id
+        ] + list(by_id.values())
+        self.index.update(by_id.values())
+
+    def remove_activities(self, activity_ids: List[str]) -> None:
+        removed = set(activity_ids)
+        self.activities = [
+            activity
+            for activity in self.activities
+            if activity.get("id") not in removed
+        ]
+        for activity_id in removed:
+            self.index.remove(activity_id)
 
     def load_or_create_activities(self):
-        activities_file = "constants/activities_with_teachers.json"
+        activities_file = self.activities_file
         if os.path.exists(activities_file):
             with open(activities_file, "r") as file:
-                self.activities = json.load(file)
+                self.set_activities(json.load(file))
             print(f"Loaded existing activities with teachers from {activities_file}")
         else:
             self.activities = self.extract_activities()
             self.assign_teachers()
+            self.set_activities(self.activities)
             self.save_activities(activities_file)
 
     def extract_activities(self) -> List[Dict[str, Any]]:
@@ -41,101 +96,73 @@ class AssignmentParser:
             json.dump(self.activities, file, indent=2)
         print(f"Activities with teachers saved to {filename}")
 
-    def match_assignment_to_activity(self, assignment: Dict) -> str:
-        posted_by = assignment.get("posted_by", "").lower()
-
-        # First, try to find an exact match
-        for activity in self.activities:
-            if activity["teacher"].lower() == posted_by:
-                return activity["id"]
-
-        # If no exact match, try partial match
-        for activity in self.activities:
-            if (
-                activity["teacher"].lower() in posted_by
-                or posted_by in activity["teacher"].lower()
-            ):
-                return activity["id"]
-
-        # If still no match, try matching any word in the teacher's name
-        teacher_words = posted_by.split()
-        for activity in self.activities:
-            activity_teacher_words = activity["teacher"].lower().split()
-            if any(word in activity_teacher_words for word in teacher_words):
-                return activity["id"]
-
-        # If no match found, return an empty string
-        return ""
-
-    def parse_assignments(self, data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        pages = []
-
-        # Parse the due date
-        for assignment_data in data:
-            due_date = None
-            if assignment_data["due_date"] != "Not found":
-                try:
-                    due_date_obj = datetime.strptime(
-                        f"{assignment_data['due_date']} 2025", "%b %d %Y"
-                    )
-
-                    # Convert to PST timezone
-                    pacific_tz = pytz.timezone("America/Los_Angeles")
-                    due_date_obj = pacific_tz.localize(due_date_obj)
-
-                    due_date = {"start": due_date_obj.isoformat(), "end": None}
-                except ValueError:
-                    print(f"Unable to parse due date: {assignment_data['due_date']}")
-
-            # Match the assignment to an activity
-            activity_id = self.match_assignment_to_activity(assignment_data)
-
-            # Create the Notion page structure
-            notion_page = {
-                "parent": {"database_id": os.environ.get("NOTION_DATABASE_ID")},
-                "properties": {
-                    "Status": {"status": {"name": "Not started"}},
-                    "Type": {"select": None},
-                    "Estimated Time": {"rich_text": []},
-                    "Priority": {"select": None},
-                    "Due Date": {"date": due_date},
-                    "Note": {
-                        "rich_text": [
-                            {
-                                "text": {
-                                    "content": f"Assignment Link: {assignment_data['assignment_link']}\n"
-                                    f"Class Link: {assignment_data['class_link']}\n"
-                                    f"Class Name: {assignment_data['class_name']}\n"
-                                    f"Posted Date: {assignment_data['posted_date']}\n"
-                                    f"Posted By: {assignment_data['posted_by']}\n"
-                                    f"Description: {assignment_data['assignment_description']}"
-                                }
-                            }
-                        ]
-                    },
-                    "Name": {
-                        "title": [
-                            {
-                                "text": {
-                                    "content": assignment_data["assignment_name"],
-                                    "link": {"url": assignment_data["assignment_link"]},
-                                }
-                            }
-                        ]
-                    },
-                },
-            }
-
+    def match_assignment_to_activity(self, assignment: ExtractedAssignment) -> str:
+        # Exact name, then the best fuzzy match above the threshold; "" if none
+        return self.index.match(assignment.posted_by)
+
+    def rank_activities(
+        self, assignment: ExtractedAssignment, limit: int = 5
+    ) -> List[MatchCandidate]:
+        return self.index.candidates(assignment.posted_by, limit)
+
+    def parse_assignments(self, data: List[ExtractedAssignment]) -> List[NotionTask]:
+        tasks = [
+            build_task(item, parse_due_date(item.due_date), self.database_id)
+            for item in data
+        ]
+        return self.attach_activities(data, tasks)
+
+    def attach_activities(
+        self, data: List[ExtractedAssignment], tasks: List[NotionTask]
+    ) -> List[NotionTask]:
+        """Set the matched activity on tasks built by build_task."""
+        activity_ids = self.index.match_many(
+            [assignment_data.posted_by for assignment_data in data]
+        )
+        for assignment_data, task, activity_id in zip(data, tasks, activity_ids):
             # Add the Activity relation if a match was found
             if activity_id:
-                notion_page["properties"]["Activity"] = {
-                    "relation": [{"id": activity_id}]
-                }
+                task.activity_id = activity_id
             else:
                 print(
-                    f"No matching activity found for assignment: {assignment_data['assignment_name']}"
+                    f"No matching activity found for assignment: {assignment_data.assignment_name}"
                 )
-
-            pages.append(notion_page)
-
-        return pages
+        return tasks
+
+
+def parse_due_date(due_date: str) -> Optional[str]:
+    """The ISO 8601 start of a Classroom due date such as "Sep 12"."""
+    if due_date == "Not found":
+        return None
+    try:
+        due_date_obj = datetime.strptime(f"{due_date} 2025", "%b %d %Y")
+    except ValueError:
+        print(f"Unable to parse due date: {due_date}")
+        return None
+    # Convert to PST timezone
+    pacific_tz = pytz.timezone("America/Los_Angeles")
+    return pacific_tz.localize(due_date_obj).isoformat()
+
+
+def build_task(
+    assignment_data: ExtractedAssignment,
+    due_date: Optional[str],
+    database_id: str = None,
+) -> NotionTask:
+    """
+    The task for an extracted assignment and its parsed due date, without the
+    activity (see AssignmentParser.attach_activities). database_id defaults
+    to NOTION_DATABASE_ID.
+    """
+    return NotionTask(
+        database_id=database_id or os.environ.get("NOTION_DATABASE_ID"),
+        name=assignment_data.assignment_name,
+        link=assignment_data.assignment_link,
+        due_date=due_date,
+        note=f"Assignment Link: {assignment_data.assignment_link}\n"
+        f"Class Link: {assignment_data.class_link}\n"
+        f"Class Name: {assignment_data.class_name}\n"
+        f"Posted Date: {assignment_data.posted_date}\n"
+        f"Posted By: {assignment_data.posted_by}\n"
+        f"Description: {assignment_data.assignment_description}",
+    )
@@ -0,0 +1,234 @@
+import json
+import time
+import logging
+from typing import Dict, Any, Callable, Optional
+from services.sync_engine import SyncEngine, is_quota_error
+from services.metrics import metrics
+
+CHECKPOINT_KEY = "backfill_checkpoint"
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "unknown"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+class Backfill:
+    """
+    Syncs the whole Gmail history matching a query, one messages.list page
+    at a time, through the regular pipeline.
+
+    After every page the next page token and running totals are saved in the
+    engine's StateStore. Fetched messages and the processed-message ledger
+    are stored before that, so a run stopped by a crash, Ctrl-C or quota
+    exhaustion resumes at the page it was on without fetching or writing
+    anything again. Pages with messages that could not be fetched are
+    retried and never skipped.
+    """
+
+    def __init__(
+        self,
+        engine: SyncEngine,
+        query: str = None,
+        page_size: int = 500,
+        max_page_attempts: int = 3,
+        quota_wait: float = 0,
+        max_quota_waits: int = 10,
+        on_progress: Callable[[Dict[str, Any]], None] = None,
+    ):
+        self.engine = engine
+        self.query = query
+        self.page_size = page_size
+        self.max_page_attempts = max_page_attempts
+        # Seconds to wait out a quota error before retrying the page; with 0
+        # the run stops and can be resumed later
+        self.quota_wait = quota_wait
+        self.max_quota_waits = max_quota_waits
+        self.on_progress = on_progress or self._log_progress
+
+    def load_checkpoint(self) -> Optional[Dict[str, Any]]:
+        value = self.engine.store.get_value(CHECKPOINT_KEY)
+        return json.loads(value) if value else None
+
+    def save_checkpoint(self, checkpoint: Dict[str, Any]) -> None:
+        self.engine.store.set_value(CHECKPOINT_KEY, json.dumps(checkpoint))
+
+    def reset(self) -> None:
+        self.engine.store.set_value(CHECKPOINT_KEY, "")
+
+    def _start(self) -> Dict[str, Any]:
+        checkpoint = self.load_checkpoint()
+        if checkpoint is not None and checkpoint["query"] == self.query:
+            if not checkpoint["complete"]:
+                logging.info(
+                    f"Resuming backfill at page {checkpoint['pages'] + 1} "
+                    f"({checkpoint['listed']} messages done)"
+                )
+            return checkpoint
+        if checkpoint is not None:
+            logging.warning(
+                f"Discarding backfill checkpoint for query {checkpoint['query']!r}"
+            )
+        # Messages that arrive while the backfill runs are left to the
+        # regular incremental sync
+        self.engine.ensure_history_id()
+        checkpoint = {
+            "query": self.query,
+            "page_token": None,
+            "pages": 0,
+            "listed": 0,
+            "created": 0,
+            "updated": 0,
+            "estimate": None,
+            "elapsed": 0.0,
+            "started_at": time.time(),
+            "complete": False,
+        }
+        self.save_checkpoint(checkpoint)
+        return checkpoint
+
+    def run(self, max_pages: int = None) -> Dict[str, Any]:
+        """
+        Backfill until the listing is exhausted, max_pages pages have been
+        synced in this run or an error stops it.
+
+        :return: The checkpoint plus "status" ("complete", "paused",
+            "quota_exceeded" or "error") and the last progress report
+        """
+        checkpoint = self._start()
+        run_started = time.monotonic()
+        run_listed = 0
+        pages = 0
+        attempts = 0
+        quota_waits = 0
+        progress = self.progress(checkpoint, run_listed, run_started)
+
+        while not checkpoint["complete"]:
+            if max_pages is not None and pages >= max_pages:
+                return self._stop(checkpoint, progress, "paused")
+            page_started = time.monotonic()
+            try:
+                result = self.engine.sync_page(
+                    self.query, checkpoint["page_token"], self.page_size
+                )
+            except Exception as e:
+                quota_error = is_quota_error(e)
+                logging.error(f"Backfill page failed: {e}", exc_info=not quota_error)
+                if not quota_error:
+                    return self._stop(checkpoint, progress, "error", str(e))
+                if not self._wait_for_quota(quota_waits):
+                    return self._stop(checkpoint, progress, "quota_exceeded", str(e))
+                quota_waits += 1
+                continue
+
+            if result["missing"]:
+                attempts += 1
+                message = (
+                    f"{result['missing']} messages on the page could not be fetched"
+                )
+                logging.warning(f"{message} (attempt {attempts})")
+                if attempts >= self.max_page_attempts:
+                    return self._stop(checkpoint, progress, "error", message)
+                continue
+            attempts = 0
+
+            pages += 1
+            run_listed += result["listed"]
+            checkpoint["pages"] += 1
+            checkpoint["listed"] += result["listed"]
+            checkpoint["created"] += result.get("new_assignments", 0)
+            checkpoint["updated"] += result.get("updated_assignments", 0)
+            if result["result_size_estimate"] is not None:
+                checkpoint["estimate"] = result["result_size_estimate"]
+            checkpoint["elapsed"] += time.monotonic() - page_started
+            checkpoint["page_token"] = result["next_page_token"]
+            checkpoint["complete"] = result["next_page_token"] is None
+            self.save_checkpoint(checkpoint)
+            metrics.inc("backfill_pages_total")
+            metrics.inc("backfill_messages_total", result["listed"])
+
+            progress = self.progress(checkpoint, run_listed, run_started)
+            self.on_progress(progress)
+
+            # Pages Notion rejected with 429 stay pending in the ledger and
+            # are retried with the next page
+            if result.get("quota_exceeded") and not checkpoint["complete"]:
+                if not self._wait_for_quota(quota_waits):
+                    return self._stop(
+                        checkpoint, progress, "quota_exceeded", result["message"]
+                    )
+                quota_waits += 1
+
+        return self._stop(checkpoint, progress, "complete")
+
+    def _wait_for_quota(self, waits: int) -> bool:
+        if not self.quota_wait or waits >= self.max_quota_waits:
+            return False
+        logging.warning(f"Quota exceeded, waiting {self.quota_wait}s")
+        print(f"Quota exceeded, waiting {format_duration(self.quota_wait)}...")
+        time.sleep(self.quota_wait)
+        return True
+
+    @staticmethod
+    def progress(
+        checkpoint: Dict[str, Any], run_listed: int, run_started: float
+    ) -> Dict[str, Any]:
+        """
+        Totals so far plus this run's throughput and the time left at that
+        rate. The total comes from Gmail's result size estimate, so the
+        percentage and ETA are approximate until the last page.
+        """
+        run_seconds = time.monotonic() - run_started
+        rate = run_listed / run_seconds if run_listed and run_seconds > 0 else None
+        total = checkpoint["listed"]
+        if not checkpoint["complete"]:
+            total = max(checkpoint["estimate"] or 0, total)
+        remaining = total - checkpoint["listed"]
+        eta = remaining / rate if rate and total else None
+        return {
+            "pages": checkpoint["pages"],
+            "listed": checkpoint["listed"],
+            "total": total or None,
+            "percent": round(100 * checkpoint["listed"] / total, 1) if total else None,
+            "messages_per_second": round(rate, 1) if rate else None,
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "created": checkpoint["created"],
+            "updated": checkpoint["updated"],
+            "complete": checkpoint["complete"],
+        }
+
+    @staticmethod
+    def describe(progress: Dict[str, Any]) -> str:
+        total = f"~{progress['total']}" if progress["total"] else "?"
+        percent = (
+            f" ({progress['percent']}%)" if progress["percent"] is not None else ""
+        )
+        rate = progress["messages_per_second"]
+        return (
+            f"page {progress['pages']}: {progress['listed']}/{total} messages"
+            f"{percent}, {rate or '?'} messages/s, "
+            f"ETA {format_duration(progress['eta_seconds'])}, "
+            f"{progress['created']} created, {progress['updated']} updated"
+        )
+
+    def _log_progress(self, progress: Dict[str, Any]) -> None:
+        logging.info(f"Backfill {self.describe(progress)}")
+
+    def _stop(
+        self,
+        checkpoint: Dict[str, Any],
+        progress: Dict[str, Any],
+        status: str,
+        error: str = None,
+    ) -> Dict[str, Any]:
+        logging.info(f"Backfill stopped: {status} after {checkpoint['pages']} pages")
+        result = dict(checkpoint, status=status, progress=progress)
+        if error:
+            result["error"] = error
+        return result
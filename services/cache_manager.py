@@ -1,55 +1,69 @@
-import json
-import os
+import re
 import logging
+from typing import List, Dict, Any, Optional
+from services.state_store import StateStore
+from services.assignment_extractor import NOT_FOUND
+from services.records import NotionTask
+
+_CLASSROOM_WORK = re.compile(
+    r"classroom\.google\.com/(?:u/\d+/)?c/([^/?#&]+)/a/([^/?#&]+)"
+)
+
+
+def assignment_identity(item: NotionTask) -> str:
+    """
+    Stable identity of an assignment page: the Classroom course and
+    coursework IDs from its link, or the activity and title if it has none.
+    """
+    link = item.link
+    if link and link != NOT_FOUND:
+        match = _CLASSROOM_WORK.search(link)
+        if match:
+            return f"classroom:{match.group(1)}/{match.group(2)}"
+        return f"link:{link}"
+    return f"title:{item.activity_id or ''}:{item.name}"
 
 
 class NotionCache:
-    def __init__(self, cache_file="cache/notion_cache.json"):
-        self.cache_file = cache_file
-        self.cache = self.load_cache()
-
-    def load_cache(self):
-        if os.path.exists(self.cache_file):
-            try:
-                with open(self.cache_file, "r") as f:
-                    content = f.read().strip()
-                    if content:
-                        return json.loads(content)
-                    else:
-                        logging.warning(
-                            f"Cache file {self.cache_file} is empty. Initializing with an empty dictionary."
-                        )
-                        return {}
-            except json.JSONDecodeError:
-                logging.error(
-                    f"Error decoding JSON from {self.cache_file}. Initializing with an empty dictionary."
-                )
-                return {}
-        else:
-            logging.info(
-                f"Cache file {self.cache_file} does not exist. Initializing with an empty dictionary."
+    """
+    Tracks which assignments already have a Notion page. Backed by the SQLite
+    StateStore; the old cache/notion_cache.json is imported by SyncEngine
+    (see StateStore.import_json_files), not here.
+    """
+
+    def __init__(self, store: StateStore = None):
+        self.store = store or StateStore()
+
+    @staticmethod
+    def title(item: NotionTask) -> str:
+        return item.name
+
+    @staticmethod
+    def cache_key(item: NotionTask) -> str:
+        # Pages cached before identities existed are keyed by title
+        return assignment_identity(item)
+
+    @staticmethod
+    def assignment_link(item: NotionTask) -> Optional[str]:
+        return item.link
+
+    def add_to_cache(self, data, responses: List[Dict[str, Any]] = None):
+        """
+        Record pages as synced. When the Notion responses are given, failed
+        creations are skipped so they are retried on the next run.
+        """
+        responses = responses or [{}] * len(data)
+        pages = []
+        for item, response in zip(data, responses):
+            if response.get("object") == "error":
+                continue
+            pages.append(
+                {
+                    "key": self.cache_key(item),
+                    "page_id": response.get("id"),
+                    "assignment_link": self.assignment_link(item),
+                    "data": item.to_notion(),
+                }
             )
-            return {}
-
-    def save_cache(self):
-        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
-        with open(self.cache_file, "w") as f:
-            json.dump(self.cache, f, indent=2)
-
-    def add_to_cache(self, data):
-        for item in data:
-            key = item["properties"]["Name"]["title"][0]["text"]["content"]
-            self.cache[key] = item
-        self.save_cache()
-
-    def filter_with_cache(self, data):
-        new_data = []
-        for item in data:
-            key = item["properties"]["Name"]["title"][0]["text"]["content"]
-            if key not in self.cache:
-                new_data.append(item)
-
-        if new_data:
-            self.add_to_cache(new_data)
-
-        return new_data if new_data else None
+        self.store.add_notion_pages(pages)
+        logging.info(f"Cached {len(pages)} Notion pages")
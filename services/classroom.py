@@ -1,21 +1,80 @@
-import re
+import os
+import logging
 import json
 import time
-import base64
+from datetime import date, datetime
+import httplib2
+from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import DEFAULT_HTTP_TIMEOUT_SEC
 from services.google_auth import Authenticator
+from services.assignment_extractor import extract_assignment, find_html_part
+from services.mime import LazyPayload, decode_body
+from services.metrics import metrics, span
+from services.records import ClassroomMessage, ExtractedAssignment
+
+
+class MeteredHttp(httplib2.Http):
+    """
+    httplib2.Http that counts the bytes sent to and received from Gmail.
+    Set up like googleapiclient's build_http: a socket timeout, so a hung
+    connection cannot block a sync forever, and 308 not followed as a
+    redirect.
+    """
+
+    def __init__(self, *args, timeout=DEFAULT_HTTP_TIMEOUT_SEC, **kwargs):
+        super().__init__(*args, timeout=timeout, **kwargs)
+        self.redirect_codes = self.redirect_codes - {308}
+
+    def request(self, uri, method="GET", body=None, headers=None, *args, **kwargs):
+        response, content = super().request(uri, method, body, headers, *args, **kwargs)
+        metrics.inc("gmail_bytes_sent_total", len(body or b""))
+        metrics.inc("gmail_bytes_received_total", len(content or b""))
+        return response, content
 
 
 class ClassroomDataManager:
     SCOPES = ["https://mail.google.com/#search/new+assignment"]
-
-    def __init__(self, credentials_file="credentials.json", token_file="token.json"):
+    # The batch endpoint accepts up to 100 calls, but Gmail starts rate limiting
+    # batches larger than 50, so that is the default chunk size.
+    MAX_BATCH_SIZE = 100
+    BATCH_SIZE = 50
+    MAX_PAGE_SIZE = 500
+    # Gmail quota units per call (https://developers.google.com/gmail/api/reference/quota)
+    QUOTA_UNITS = {
+        "getProfile": 1,
+        "history.list": 2,
+        "messages.list": 5,
+        "messages.get": 5,
+        "watch": 100,
+    }
+
+    def __init__(
+        self,
+        credentials_file="credentials.json",
+        token_file="token.json",
+        state_file="cache/gmail_state.json",
+        store=None,
+        rate_limiters=None,
+    ):
         self.credentials_file = credentials_file
         self.token_file = token_file
+        self.state_file = state_file
+        self.store = store
+        # Token buckets metering quota units, e.g. one per user and one for
+        # the whole Google project
+        self.rate_limiters = rate_limiters or []
         self.creds = None
         self.service = None
 
+    def _throttle(self, method, calls=1):
+        """Wait for rate limit tokens before making `calls` calls to `method`."""
+        metrics.inc("gmail_api_calls_total", calls, method=method)
+        for limiter in self.rate_limiters:
+            limiter.acquire(self.QUOTA_UNITS[method] * calls)
+
     def save_to_json(self, data, filename):
         # if the data type is a list, we need to convert it to a dictionary
         print(f"Saving data to {filename}...")
@@ -23,37 +82,290 @@ class ClassroomDataManager:
             json.dump(data, f, indent=2)
         print(f"Data saved to {filename}")
 
+    def load_history_id(self):
+        if self.store is not None:
+            return self.store.get_value("gmail_history_id")
+        if not os.path.exists(self.state_file):
+            return None
+        try:
+            with open(self.state_file, "r") as f:
+                return json.load(f).get("history_id")
+        except (json.JSONDecodeError, OSError) as error:
+            print(f"Could not read Gmail sync state from {self.state_file}: {error}")
+            return None
+
+    def save_history_id(self, history_id):
+        if self.store is not None:
+            self.store.set_value("gmail_history_id", history_id)
+            return
+        os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+        with open(self.state_file, "w") as f:
+            json.dump({"history_id": str(history_id)}, f)
+
+    def get_current_history_id(self):
+        self._throttle("getProfile")
+        profile = self.service.users().getProfile(userId="me").execute()
+        return profile.get("historyId")
+
+    def get_history_message_ids(self, start_history_id):
+        """
+        List messages added to the mailbox since start_history_id.
+
+        :param start_history_id: The last history ID that was fully synced
+        :return: A tuple of (message IDs oldest first, latest history ID), or
+            None if the history ID has expired and a full resync is needed
+        """
+        message_ids = []
+        latest_history_id = start_history_id
+        page_token = None
+        try:
+            while True:
+                request_args = {
+                    "userId": "me",
+                    "startHistoryId": start_history_id,
+                    "historyTypes": ["messageAdded"],
+                }
+                if page_token:
+                    request_args["pageToken"] = page_token
+                self._throttle("history.list")
+                results = self.service.users().history().list(**request_args).execute()
+                for record in results.get("history", []):
+                    for added in record.get("messagesAdded", []):
+                        message_ids.append(added["message"]["id"])
+                latest_history_id = results.get("historyId", latest_history_id)
+                page_token = results.get("nextPageToken")
+                if not page_token:
+                    break
+        except HttpError as error:
+            if getattr(error.resp, "status", None) == 404:
+                print(f"History ID {start_history_id} has expired.")
+                return None
+            raise
+
+        return list(dict.fromkeys(message_ids)), latest_history_id
+
+    def watch(self, topic_name, label_ids=None):
+        """
+        Ask Gmail to publish mailbox changes to a Pub/Sub topic. A watch
+        lasts 7 days and has to be renewed before it expires.
+
+        :return: The watch response with "historyId" and "expiration" (ms)
+        """
+        body = {"topicName": topic_name, "labelFilterBehavior": "include"}
+        if label_ids:
+            body["labelIds"] = label_ids
+        self._throttle("watch")
+        return self.service.users().watch(userId="me", body=body).execute()
+
+    def sync_messages(self, max_results=100, filter_criteria=None, full=False):
+        """
+        Fetch only the messages that arrived since the last sync.
+
+        Falls back to a full listing when full is set, there is no stored
+        history ID or the stored one has expired.
+        """
+        return [
+            message
+            for batch in self.stream_messages(max_results, filter_criteria, full)
+            for message in batch
+        ]
+
+    def stream_messages(
+        self, max_results=100, filter_criteria=None, full=False, batch_size=None
+    ):
+        """
+        Generator version of sync_messages: yields the new messages in
+        batches of up to batch_size as they are downloaded, so the first ones
+        can be processed while the rest are still being fetched. The history
+        ID is only saved once the last batch has been consumed, and only if
+        every listed message was fetched: otherwise the next sync lists the
+        same history again and fetches what is still missing (stored messages
+        are skipped).
+        """
+        start_history_id = None if full else self.load_history_id()
+        missing = []
+        history = None
+        if start_history_id:
+            history = self.get_history_message_ids(start_history_id)
+        if history is not None:
+            message_ids, latest_history_id = history
+            # History lists all new mail; only download what the query would
+            with span("gmail_filter"):
+                matching = self.filter_message_ids(
+                    message_ids, filter_criteria, missing
+                )
+            print(
+                f"{len(message_ids)} new messages since history ID {start_history_id}, "
+                f"{len(matching)} matching the filter"
+            )
+            id_pages = [matching]
+        else:
+            print("Running full resync...")
+            # Read the history ID before listing so nothing that arrives during
+            # the listing is missed on the next incremental sync
+            latest_history_id = self.get_current_history_id()
+            id_pages = self.iter_message_ids(
+                max_results, self.build_query(filter_criteria)
+            )
+
+        for message_ids in id_pages:
+            yield from self.fetch_messages(message_ids, batch_size, missing)
+        if missing:
+            logging.warning(
+                f"{len(missing)} messages could not be fetched; not saving history "
+                f"ID {latest_history_id} so they are retried on the next sync"
+            )
+            print(
+                f"Not saving history ID: {len(missing)} messages could not be fetched"
+            )
+        elif latest_history_id:
+            self.save_history_id(latest_history_id)
+
+    def iter_message_ids(self, max_results=100, query=None):
+        """The IDs of up to max_results listed messages, a page at a time."""
+        listed = 0
+        page_token = None
+        while listed < max_results:
+            page, page_token, _ = self.list_message_page(
+                query, page_token, max_results - listed
+            )
+            listed += len(page)
+            yield [message["id"] for message in page]
+            if not page_token:
+                break
+
+    def fetch_messages(self, message_ids, batch_size=None, missing=None):
+        """
+        Yield the details of message_ids in batches of up to batch_size.
+        See process_message_ids for `missing`.
+        """
+        batch_size = batch_size or self.MAX_PAGE_SIZE
+        for start in range(0, len(message_ids), batch_size):
+            messages = self.process_message_ids(
+                message_ids[start : start + batch_size], missing=missing
+            )
+            if messages:
+                yield messages
+
     def authenticate(self):
-        auth = Authenticator(self.credentials_file)
+        auth = Authenticator(self.credentials_file, self.token_file)
         self.creds = auth.get_credentials()
         if not self.creds:
             print("No valid credentials found.")
             self.creds = auth.create_token()
         return self.creds
 
-    def get_messages(self, max_results=100):
+    def connect(self):
+        """Authenticate and build the Gmail service once; later calls reuse it."""
+        if self.service is None:
+            self.authenticate()
+            http = AuthorizedHttp(self.creds, http=MeteredHttp())
+            self.service = build("gmail", "v1", http=http)
+        return self.service
+
+    def seconds_until_expiry(self):
+        if self.creds is None or self.creds.expiry is None:
+            return None
+        return (self.creds.expiry - datetime.utcnow()).total_seconds()
+
+    def refresh_credentials(self, margin=300):
+        """
+        Refresh the access token if it expires within margin seconds, saving
+        the new token so other processes pick it up.
+
+        :return: True if the token was refreshed
+        """
+        if self.creds is None or not self.creds.refresh_token:
+            return False
+        remaining = self.seconds_until_expiry()
+        if remaining is not None and remaining > margin:
+            return False
+        self.creds.refresh(Request())
+        with open(self.token_file, "w") as token:
+            token.write(self.creds.to_json())
+        print("Refreshed Gmail credentials.")
+        return True
+
+    @staticmethod
+    def build_query(filter_criteria=None):
+        """
+        Compile filter criteria into a Gmail search query.
+
+        Supported keys are "from", "subject", "label" and "after". "after" takes
+        a date, datetime, epoch seconds or a "YYYY/MM/DD" string.
+
+        :param filter_criteria: A dictionary of criteria to filter by
+        :return: A Gmail search query string, or None when there are no criteria
+        """
+        if not filter_criteria:
+            return None
+
+        terms = []
+        for key, value in filter_criteria.items():
+            if value is None or value == "":
+                continue
+            if key == "after":
+                if isinstance(value, datetime):
+                    value = int(value.timestamp())
+                elif isinstance(value, date):
+                    value = value.strftime("%Y/%m/%d")
+                terms.append(f"after:{value}")
+            elif key in ("from", "subject", "label"):
+                value = str(value)
+                if " " in value:
+                    value = f'"{value}"'
+                terms.append(f"{key}:{value}")
+            # Anything else is left to filter_message on the client side
+        return " ".join(terms) or None
+
+    def list_message_page(self, query=None, page_token=None, page_size=None):
+        """
+        Fetch one page of a message listing, newest first.
+
+        :return: A tuple of (message stubs, next page token or None, Gmail's
+            estimate of the total number of results)
+        """
+        request_args = {
+            "userId": "me",
+            "maxResults": min(page_size or self.MAX_PAGE_SIZE, self.MAX_PAGE_SIZE),
+        }
+        if query:
+            request_args["q"] = query
+        if page_token:
+            request_args["pageToken"] = page_token
+        self._throttle("messages.list")
+        results = self.service.users().messages().list(**request_args).execute()
+        return (
+            results.get("messages", []),
+            results.get("nextPageToken"),
+            results.get("resultSizeEstimate"),
+        )
+
+    def get_messages(self, max_results=100, query=None):
         print(f"Fetching up to {max_results} messages...")
+        if query:
+            print(f"Using query: {query}")
+        messages = []
+        page_token = None
         try:
-            results = (
-                self.service.users()
-                .messages()
-                .list(userId="me", maxResults=max_results)
-                .execute()
-            )
-            messages = results.get("messages", [])
+            while len(messages) < max_results:
+                page, page_token, _ = self.list_message_page(
+                    query, page_token, max_results - len(messages)
+                )
+                messages.extend(page)
+                if not page_token:
+                    break
             print(f"Fetched {len(messages)} messages.")
-
-            # Save fetched messages
-
-            return messages
+            return messages[:max_results]
         except HttpError as error:
             print(f"An error occurred while fetching messages: {error}")
-            return []
+            return messages
 
     def get_message_details(self, message_id, max_retries=3, retry_delay=5):
         print(f"Fetching details for message ID: {message_id}")
         for attempt in range(max_retries):
             try:
+                self._throttle("messages.get")
                 message = (
                     self.service.users()
                     .messages()
@@ -77,24 +389,113 @@ class ClassroomDataManager:
                 print(f"An error occurred while fetching message details: {error}")
                 return None
 
+    def get_message_details_batch(
+        self,
+        message_ids,
+        batch_size=None,
+        max_retries=3,
+        retry_delay=1,
+        failed=None,
+        **get_args,
+    ):
+        """
+        Fetch full message details using the Gmail batch HTTP endpoint.
+
+        :param message_ids: The message IDs to fetch
+        :param batch_size: Number of requests per batch, capped at MAX_BATCH_SIZE
+        :param max_retries: Attempts per message for retryable failures
+        :param retry_delay: Base delay in seconds, doubled on each retry round
+        :param failed: If given, the IDs that still failed with a retryable
+            error after max_retries are appended to it
+        :param get_args: Extra messages.get arguments, e.g. format="metadata"
+        :return: A list of message details (or None) in the order of message_ids
+        """
+        batch_size = min(batch_size or self.BATCH_SIZE, self.MAX_BATCH_SIZE)
+        results = {}
+        pending = list(dict.fromkeys(message_ids))
+
+        for attempt in range(max_retries):
+            if not pending:
+                break
+            if attempt > 0:
+                delay = retry_delay * (2 ** (attempt - 1))
+                print(
+                    f"Retrying {len(pending)} messages in {delay} seconds "
+                    f"(attempt {attempt + 1}/{max_retries})..."
+                )
+                time.sleep(delay)
+
+            retry = []
+            for start in range(0, len(pending), batch_size):
+                chunk = pending[start : start + batch_size]
+                print(f"Fetching details for {len(chunk)} messages in one batch")
+                retry.extend(self._execute_details_batch(chunk, results, **get_args))
+            pending = retry
+            if retry and attempt < max_retries - 1:
+                metrics.inc("gmail_retries_total", len(retry))
+
+        for message_id in pending:
+            print(
+                f"Failed to fetch details for message ID: {message_id} after {max_retries} attempts."
+            )
+        if failed is not None:
+            failed.extend(pending)
+
+        return [results.get(message_id) for message_id in message_ids]
+
+    def _execute_details_batch(self, message_ids, results, **get_args):
+        """Run one batch request, storing successes and returning IDs to retry."""
+        retry = []
+
+        def callback(request_id, response, exception):
+            if exception is None:
+                results[request_id] = response
+            elif self._is_retryable(exception):
+                retry.append(request_id)
+            else:
+                print(
+                    f"An error occurred while fetching message {request_id}: {exception}"
+                )
+                results[request_id] = None
+
+        batch = self.service.new_batch_http_request(callback=callback)
+        for message_id in message_ids:
+            batch.add(
+                self.service.users()
+                .messages()
+                .get(userId="me", id=message_id, **get_args),
+                request_id=message_id,
+            )
+        self._throttle("messages.get", len(message_ids))
+        try:
+            batch.execute()
+        except (HttpError, TimeoutError, OSError) as error:
+            print(f"Batch request failed: {error}")
+            return [mid for mid in message_ids if mid not in results]
+        return retry
+
+    @staticmethod
+    def _is_retryable(exception):
+        if isinstance(exception, TimeoutError):
+            return True
+        if isinstance(exception, HttpError):
+            status = getattr(exception.resp, "status", None)
+            if status in (429, 500, 502, 503, 504):
+                return True
+            # Gmail reports per-user rate limiting as 403 rateLimitExceeded
+            return status == 403 and "rateLimitExceeded" in str(exception)
+        return False
+
     def decode_body(self, body):
-        return base64.urlsafe_b64decode(body).decode("utf-8")
+        return decode_body(body)
 
     def process_payload(self, payload):
-        headers = {
-            header["name"].lower(): header["value"]
-            for header in payload.get("headers", [])
-        }
-        body = self.decode_body(payload.get("body", {}).get("data", ""))
-
-        processed_payload = {
-            "headers": headers,
-            "body": body,
-            "mimeType": payload.get("mimeType", ""),
-            "filename": payload.get("filename", ""),
-            "parts": [self.process_payload(part) for part in payload.get("parts", [])],
-        }
-        return processed_payload
+        """
+        Wrap a raw Gmail payload. Headers are parsed on first access and part
+        bodies are only base64 decoded when read, so attachments and the
+        text/plain alternative are never decoded by the pipeline.
+        """
+        return LazyPayload(payload)
 
     def filter_messages(self, messages):
         """
@@ -106,7 +507,7 @@ class ClassroomDataManager:
         filtered_messages = []
 
         for message in messages:
-            headers = message["payload"]["headers"]
+            headers = message.headers
             from_header = headers.get("from", "").lower()
             subject_header = headers.get("subject", "").lower()
             if (
@@ -117,27 +518,29 @@ class ClassroomDataManager:
 
         return filtered_messages
 
-    def process_messages(self, max_results=100, filter_criteria=None):
-        messages = self.get_messages(max_results)
-        print(f"Total messages fetched: {len(messages)}")
-
-        processed_messages = []
-        for message in messages:
-            details = self.get_message_details(message["id"])
-            if details:
-                message = {
-                    "id": details["id"],
-                    "threadId": details["threadId"],
-                    "labelIds": details.get("labelIds", []),
-                    "snippet": details.get("snippet", ""),
-                    "payload": self.process_payload(details.get("payload", {})),
-                }
-            else:
-                print(f"Could not fetch details for message ID: {message['id']}")
-
-        print(f"Total processed messages: {len(processed_messages)}")
-
-        return processed_messages
+    def filter_message_ids(self, message_ids, filter_criteria, missing=None):
+        """
+        The message_ids whose headers match filter_criteria, in order. Only
+        the From and Subject headers are fetched, so non-matching mail is
+        never downloaded in full. Already known messages are left out; see
+        process_message_ids for `missing`.
+        """
+        if self.store is not None and message_ids:
+            known = self.store.known_message_ids(message_ids)
+            message_ids = [mid for mid in message_ids if mid not in known]
+        if not filter_criteria or not message_ids:
+            return message_ids
+        metadata_list = self.get_message_details_batch(
+            message_ids,
+            failed=missing,
+            format="metadata",
+            metadataHeaders=["From", "Subject"],
+        )
+        return [
+            message_id
+            for message_id, metadata in zip(message_ids, metadata_list)
+            if metadata and self.filter_message(metadata, filter_criteria)
+        ]
 
     def filter_message(self, message, criteria):
         """
@@ -192,26 +595,50 @@ class ClassroomDataManager:
 
     #     return filtered_messages
 
-    def process_messages(self, max_results=100, filter_criteria=None):
-        messages = self.get_messages(max_results)
+    def process_messages(self, max_results=100, filter_criteria=None, batch=True):
+        messages = self.get_messages(max_results, self.build_query(filter_criteria))
         print(f"Total messages fetched: {len(messages)}")
+        return self.process_message_ids(
+            [message["id"] for message in messages], batch=batch
+        )
+
+    def process_message_ids(self, message_ids, batch=True, missing=None):
+        """
+        :param missing: If given, the IDs of messages that could not be
+            fetched because of transient errors (batch mode only) are appended
+            to it, so the caller can try them again
+        """
+        if self.store is not None and message_ids:
+            # Skip messages that are already stored or were processed earlier
+            known = self.store.known_message_ids(message_ids)
+            if known:
+                print(f"Skipping {len(known)} already known messages")
+                message_ids = [mid for mid in message_ids if mid not in known]
+
+        if batch:
+            details_list = self.get_message_details_batch(message_ids, failed=missing)
+        else:
+            details_list = [self.get_message_details(mid) for mid in message_ids]
 
         processed_messages = []
-        for message in messages:
-            details = self.get_message_details(message["id"])
+        for message_id, details in zip(message_ids, details_list):
             if details:
-                message = {
-                    "id": details["id"],
-                    "threadId": details["threadId"],
-                    "labelIds": details.get("labelIds", []),
-                    "snippet": details.get("snippet", ""),
-                    "payload": self.process_payload(details.get("payload", {})),
-                }
-                processed_messages.append(message)
+                with span("process_payload"):
+                    payload = self.process_payload(details.get("payload", {}))
+                processed_messages.append(
+                    ClassroomMessage(
+                        details["id"],
+                        details["threadId"],
+                        details.get("labelIds", []),
+                        details.get("snippet", ""),
+                        payload,
+                    )
+                )
             else:
-                print(f"Could not fetch details for message ID: {message['id']}")
+                print(f"Could not fetch details for message ID: {message_id}")
 
         print(f"Total processed messages: {len(processed_messages)}")
+        metrics.inc("messages_fetched_total", len(processed_messages))
 
         return processed_messages
 
@@ -223,84 +650,30 @@ class ClassroomDataManager:
     def extract_assignment_info(self, messages):
         extracted_data = []
         for data in messages:
-            # Extract the HTML content
-            html_content = data["payload"]["parts"][1]["body"]
-
-            # Extract assignment name
-            assignment_name_match = re.search(r"<div>(.*?)</div>", html_content)
-            assignment_name = (
-                assignment_name_match.group(1) if assignment_name_match else "Not found"
-            )
-
-            # Extract class link
-
-            link_pattern = "https://accounts\.google\.com/AccountChooser\?continue="
-            link_match = re.search(
-                r"href=(https://accounts\.google\.com/AccountChooser\?continue=https://classroom\.google\.com/c/[^&]+)",
-                html_content,
-            )
-            class_link = link_match.group(1) if link_match else "Not found"
-            class_link = re.sub(link_pattern, "", class_link)
-
-            assignment_match = re.search(
-                r"href=(https://accounts\.google\.com/AccountChooser\?continue=https://classroom\.google\.com/c/[^&]+/a/[^&]+)",
-                html_content,
-            )
-            assignment_link = (
-                assignment_match.group(1) if assignment_match else "Not found"
-            )
-            assignment_link = re.sub(link_pattern, "", assignment_link)
-
-            # Extract assignment description
-            description_match = re.search(r"<ul>(.*?)</ul>", html_content, re.DOTALL)
-            if description_match:
-                description_items = re.findall(
-                    r"<li>(.*?)</li>", description_match.group(1)
-                )
-                assignment_description = "\n".join(description_items)
-            else:
-                assignment_description = "Not found"
-
-            # Extract class name
-            class_match = re.search(
-                r">([^<]+)</td></tr></table></a></td>", html_content
-            )
-            class_name = class_match.group(1) if class_match else "Not found"
-
-            # Extract due date
-            due_date_match = re.search(r"Due ([^<]+)", html_content)
-            due_date = due_date_match.group(1) if due_date_match else "Not found"
-
-            # Extract posted date and author
-            posted_info_match = re.search(r"Posted on ([^<]+) by ([^<]+)", html_content)
-            if posted_info_match:
-                posted_date = posted_info_match.group(1)
-                posted_by = posted_info_match.group(2)
-            else:
-                posted_date = "Not found"
-                posted_by = "Not found"
+            html_content = find_html_part(data.payload)
+            if html_content is None:
+                print(f"No text/html part in message ID: {data.id}")
+                continue
 
             extracted_data.append(
-                {
-                    "assignment_name": assignment_name,
-                    "assignment_link": assignment_link,
-                    "class_link": class_link,
-                    "assignment_description": assignment_description,
-                    "class_name": class_name,
-                    "due_date": due_date,
-                    "posted_date": posted_date,
-                    "posted_by": posted_by,
-                }
+                ExtractedAssignment.from_dict(
+                    extract_assignment(html_content), message_id=data.id
+                )
             )
         return extracted_data
 
     def run(
-        self, max_results=100, output_file="classroom_data.json", filter_criteria=None
+        self,
+        max_results=100,
+        output_file="classroom_data.json",
+        filter_criteria=None,
+        incremental=False,
     ):
         print("Starting ClassroomDataManager...")
-        self.authenticate()
-        self.service = build("gmail", "v1", credentials=self.creds)
-        processed_messages = self.process_messages(max_results, filter_criteria)
+        self.connect()
+        processed_messages = self.sync_messages(
+            max_results, filter_criteria, full=not incremental
+        )
         # print(processed_messages)
         if processed_messages:
             # self.save_to_json(processed_messages, output_file)
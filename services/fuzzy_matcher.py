@@ -0,0 +1,128 @@
+import math
+import re
+from typing import List, Dict, Set, Optional
+
+HONORIFICS = {"mr", "mrs", "ms", "miss", "mx", "dr", "prof", "professor", "sr", "sra"}
+
+_NON_WORD_RE = re.compile(r"[^\w\s]")
+
+
+def normalize_teacher(name: str) -> str:
+    """Lowercase, drop punctuation and honorifics, collapse whitespace."""
+    words = _NON_WORD_RE.sub(" ", (name or "").lower()).split()
+    return " ".join(word for word in words if word not in HONORIFICS)
+
+
+def trigrams(name: str) -> Set[str]:
+    """Character trigrams of each word, padded like PostgreSQL's pg_trgm."""
+    grams = set()
+    for word in name.split():
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class MatchCandidate:
+    __slots__ = ("key", "name", "score")
+
+    def __init__(self, key: str, name: str, score: float):
+        self.key = key
+        self.name = name
+        self.score = score
+
+    def __repr__(self) -> str:
+        return f"MatchCandidate({self.key!r}, {self.name!r}, {self.score:.3f})"
+
+
+def _dice(a: Set[str], b: Set[str]) -> float:
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+class TrigramIndex:
+    """
+    Inverted index from surname character trigrams to names.
+
+    A candidate's score (0 to 1) is the mean of the Dice coefficients of the
+    full-name and surname trigram sets. Classroom shows teachers either by
+    full name or as "Mr. Smith", so the surname is the reliable part: a
+    shared first name alone never gets a candidate over a 0.5 threshold, and
+    candidates whose surname scores below the threshold are dropped.
+    """
+
+    def __init__(self):
+        self.names: Dict[str, str] = {}
+        self.grams: Dict[str, Set[str]] = {}
+        self.surname_grams: Dict[str, Set[str]] = {}
+        self.order: Dict[str, int] = {}
+        self.postings: Dict[str, Set[str]] = {}
+        self._next = 0
+
+    def add(self, key: str, name: str) -> None:
+        self.remove(key)
+        name = normalize_teacher(name)
+        if not name:
+            return
+        self.names[key] = name
+        self.grams[key] = trigrams(name)
+        self.surname_grams[key] = trigrams(name.split()[-1])
+        self.order[key] = self._next
+        self._next += 1
+        for gram in self.surname_grams[key]:
+            self.postings.setdefault(gram, set()).add(key)
+
+    def remove(self, key: str) -> None:
+        surname_grams = self.surname_grams.pop(key, None)
+        if surname_grams is None:
+            return
+        del self.names[key]
+        del self.grams[key]
+        del self.order[key]
+        for gram in surname_grams:
+            keys = self.postings[gram]
+            keys.discard(key)
+            if not keys:
+                del self.postings[gram]
+
+    def candidates(
+        self, name: str, limit: int = 5, threshold: float = 0.0
+    ) -> List[MatchCandidate]:
+        """
+        Ranked candidates whose score and surname score are at least threshold.
+
+        With a threshold, only the rarest surname trigrams are probed: a
+        surname with Dice score >= t must share at least t*|S|/(2-t) of the
+        query surname's |S| trigrams, so it contains one of the rarest
+        |S| - ceil(t*|S|/(2-t)) + 1 of them.
+        """
+        name = normalize_teacher(name)
+        if not name:
+            return []
+        grams = trigrams(name)
+        surname_grams = trigrams(name.split()[-1])
+
+        probe = sorted(surname_grams, key=lambda gram: len(self.postings.get(gram, ())))
+        if threshold > 0:
+            required = math.ceil(threshold * len(probe) / (2 - threshold))
+            probe = probe[: len(probe) - max(required, 1) + 1]
+
+        keys: Set[str] = set()
+        for gram in probe:
+            keys.update(self.postings.get(gram, ()))
+
+        scored = []
+        for key in keys:
+            surname_score = _dice(surname_grams, self.surname_grams[key])
+            if surname_score < threshold:
+                continue
+            score = (_dice(grams, self.grams[key]) + surname_score) / 2
+            if score >= threshold:
+                scored.append((score, key))
+        # Highest score first; earlier additions win ties
+        scored.sort(key=lambda item: (-item[0], self.order[item[1]]))
+        return [
+            MatchCandidate(key, self.names[key], score) for score, key in scored[:limit]
+        ]
+
+    def best(self, name: str, threshold: float = 0.5) -> Optional[MatchCandidate]:
+        top = self.candidates(name, limit=1, threshold=threshold)
+        return top[0] if top else None
@@ -0,0 +1,92 @@
+import json
+import base64
+import binascii
+import threading
+from collections import OrderedDict
+from typing import Dict, Any
+
+
+class PushError(ValueError):
+    """A push request that is not a valid Gmail Pub/Sub notification."""
+
+
+def encode_notification(
+    email_address: str, history_id: int, message_id: str = None
+) -> Dict[str, Any]:
+    """Build the Pub/Sub push envelope Gmail sends for a mailbox change."""
+    data = json.dumps({"emailAddress": email_address, "historyId": int(history_id)})
+    message_id = message_id or f"local-{history_id}"
+    return {
+        "message": {
+            "data": base64.b64encode(data.encode("utf-8")).decode("ascii"),
+            "messageId": message_id,
+            "message_id": message_id,
+        },
+        "subscription": "projects/local/subscriptions/gmail-push",
+    }
+
+
+def decode_notification(envelope: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Decode a Pub/Sub push envelope into the Gmail notification it carries.
+
+    :return: {"emailAddress", "historyId" (int), "messageId"}
+    :raises PushError: if the envelope or its data is malformed
+    """
+    message = (envelope or {}).get("message")
+    if not isinstance(message, dict) or not message.get("data"):
+        raise PushError("Push envelope has no message data")
+    try:
+        data = json.loads(base64.b64decode(message["data"]).decode("utf-8"))
+        notification = {
+            "emailAddress": data["emailAddress"],
+            "historyId": int(data["historyId"]),
+        }
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+        raise PushError("Push message data is not a Gmail notification")
+    notification["messageId"] = message.get("messageId") or message.get("message_id")
+    return notification
+
+
+class PushDeduplicator:
+    """
+    Drops notifications that would not add anything to a sync.
+
+    Pub/Sub delivers at least once, so the same message can arrive again, and
+    Gmail often sends several notifications for one change. A notification is
+    accepted only if its Pub/Sub message ID is new and its history ID is
+    beyond the newest one already accepted for that mailbox.
+    """
+
+    def __init__(self, max_message_ids: int = 1000):
+        self.max_message_ids = max_message_ids
+        self._message_ids = OrderedDict()
+        self._history_ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.accepted = 0
+        self.duplicates = 0
+
+    def accept(self, notification: Dict[str, Any]) -> bool:
+        email = notification["emailAddress"]
+        history_id = notification["historyId"]
+        message_id = notification.get("messageId")
+        with self._lock:
+            if message_id in self._message_ids or history_id <= self._history_ids.get(
+                email, 0
+            ):
+                self.duplicates += 1
+                return False
+            if message_id:
+                self._message_ids[message_id] = True
+                if len(self._message_ids) > self.max_message_ids:
+                    self._message_ids.popitem(last=False)
+            self._history_ids[email] = history_id
+            self.accepted += 1
+            return True
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "accepted": self.accepted,
+            "duplicates": self.duplicates,
+            "history_ids": dict(self._history_ids),
+        }
@@ -1,11 +1,13 @@
 import json
 from typing import List, Dict, Any
+from services.activity_index import ActivityIndex
 
 
 class NotionAssignmentMatcher:
     def __init__(self, activities: List[Any], output_path: str):
         self.activities = activities
         self.output_path = output_path
+        self.index = None
 
     def assign_teachers(self) -> None:
         print("Assign teachers to activities:")
@@ -15,6 +17,7 @@ class NotionAssignmentMatcher:
                     f"Enter teacher name for '{activity['title']}' (or press Enter to skip): "
                 )
                 activity["teacher"] = teacher.strip()
+                self.index = None
             elif isinstance(activity, str):
                 print(f"Warning: Activity {i} is a string: '{activity}'. Skipping.")
             else:
@@ -27,12 +30,16 @@ class NotionAssignmentMatcher:
         print(f"Activities with teachers saved to {self.output_path}")
 
     def match_assignment_to_activity(self, assignment: Dict) -> str:
-        posted_by = assignment.get("posted_by", "").lower()
-        for activity in self.activities:
-            if isinstance(activity, dict) and "teacher" in activity:
-                if activity["teacher"].lower() in posted_by:
-                    return activity.get("id", "")
-        return ""
+        # Built on first use, after assign_teachers has filled in the names
+        if self.index is None:
+            self.index = ActivityIndex(
+                [
+                    activity
+                    for activity in self.activities
+                    if isinstance(activity, dict) and "teacher" in activity
+                ]
+            )
+        return self.index.match(assignment.get("posted_by", ""))
 
     def run(self) -> None:
         if not self.activities:
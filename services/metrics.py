@@ -0,0 +1,193 @@
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Dict, Any, Optional, Tuple
+
+# Upper bounds in seconds for stage and sync duration histograms
+DEFAULT_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+HELP = {
+    "sync_stage_seconds": "Time spent in each sync pipeline stage",
+    "sync_duration_seconds": "Duration of whole syncs",
+    "syncs_total": "Syncs run, by result status",
+    "gmail_api_calls_total": "Gmail API calls, by method",
+    "gmail_retries_total": "Gmail calls retried after a retryable failure",
+    "gmail_bytes_received_total": "Bytes received from the Gmail API",
+    "gmail_bytes_sent_total": "Bytes sent to the Gmail API",
+    "notion_api_calls_total": "Notion API calls, by method and status",
+    "notion_retries_total": "Notion calls retried, by status",
+    "notion_bytes_received_total": "Bytes received from the Notion API",
+    "notion_bytes_sent_total": "Bytes sent to the Notion API",
+    "messages_fetched_total": "Gmail messages fetched",
+    "messages_processed_total": "Messages through the pipeline, by outcome",
+    "assignments_extracted_total": "Assignments extracted from messages",
+    "notion_pages_written_total": "Notion pages written, by outcome",
+    "backfill_pages_total": "Message listing pages synced by backfills",
+    "backfill_messages_total": "Messages listed by backfills",
+}
+
+
+def _label_key(labels: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Process-wide counters and histograms, rendered in the Prometheus text
+    format. Metric names are free-form; labels are keyword arguments.
+    """
+
+    def __init__(self, prefix: str = "classroom_to_notion_"):
+        self.prefix = prefix
+        self._counters: Dict[str, Dict[tuple, float]] = {}
+        self._histograms: Dict[str, Dict[tuple, _Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(
+        self, name: str, value: float, buckets=DEFAULT_BUCKETS, **labels
+    ) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = _Histogram(buckets)
+            series[key].observe(value)
+
+    def get(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                full = self.prefix + name
+                lines.append(f"# HELP {full} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {full} counter")
+                for labels, value in sorted(series.items()):
+                    value = int(value) if float(value).is_integer() else value
+                    lines.append(f"{full}{_format_labels(labels)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                full = self.prefix + name
+                lines.append(f"# HELP {full} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {full} histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        le = _format_labels(labels, f'le="{bound:g}"')
+                        lines.append(f"{full}_bucket{le} {cumulative}")
+                    le = _format_labels(labels, 'le="+Inf"')
+                    lines.append(f"{full}_bucket{le} {histogram.count}")
+                    lines.append(
+                        f"{full}_sum{_format_labels(labels)} {histogram.sum:.6f}"
+                    )
+                    lines.append(
+                        f"{full}_count{_format_labels(labels)} {histogram.count}"
+                    )
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+class StageTimings:
+    """Seconds spent per stage during one sync; repeated stages add up."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        # Pipeline stages running in other threads add to the same timings
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def to_dict(self) -> Dict[str, float]:
+        result = {stage: round(seconds, 6) for stage, seconds in self.stages.items()}
+        result["total"] = round(time.perf_counter() - self.started, 6)
+        return result
+
+
+# The timings of the sync running in this thread and the open span names
+_current: ContextVar[Optional[Tuple[StageTimings, List[str]]]] = ContextVar(
+    "sync_timings", default=None
+)
+
+
+@contextmanager
+def track_sync(timings: StageTimings = None):
+    """Collect the spans opened in this thread into one StageTimings."""
+    timings = timings or StageTimings()
+    token = _current.set((timings, []))
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def current_timings() -> Optional[StageTimings]:
+    """The timings of the sync running in this thread, if any."""
+    current = _current.get()
+    return current[0] if current is not None else None
+
+
+@contextmanager
+def span(stage: str):
+    """
+    Time a pipeline stage. The duration goes to the sync_stage_seconds
+    histogram and, inside track_sync, to that sync's timings. Nested spans
+    are named after their parents, e.g. "gmail_fetch/process_payload".
+    """
+    current = _current.get()
+    if current is not None:
+        stack = current[1]
+        stack.append(stage)
+        stage = "/".join(stack)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        if current is not None:
+            current[1].pop()
+            current[0].add(stage, seconds)
+        metrics.observe("sync_stage_seconds", seconds, stage=stage)
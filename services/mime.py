@@ -0,0 +1,90 @@
+import base64
+from collections.abc import Mapping
+from typing import List, Dict, Any, Iterator, Optional
+
+
+def decode_body(data: str) -> str:
+    return base64.urlsafe_b64decode(data).decode("utf-8")
+
+
+class LazyPayload(Mapping):
+    """
+    Read-only view of a Gmail message payload with the same keys as the dict
+    ClassroomDataManager.process_payload used to build ("headers", "body",
+    "mimeType", "filename", "parts"). Part bodies stay base64 encoded until
+    "body" is read, and child parts are only wrapped when "parts" is read.
+    """
+
+    __slots__ = ("_raw", "_headers", "_body", "_parts")
+
+    KEYS = ("headers", "body", "mimeType", "filename", "parts")
+
+    def __init__(self, raw: Dict[str, Any]):
+        self._raw = raw
+        self._headers: Optional[Dict[str, str]] = None
+        self._body: Optional[str] = None
+        self._parts: Optional[List["LazyPayload"]] = None
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "headers":
+            return self.headers
+        if key == "body":
+            return self.body
+        if key == "parts":
+            return self.parts
+        if key == "mimeType":
+            return self._raw.get("mimeType", "")
+        if key == "filename":
+            return self._raw.get("filename", "")
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.KEYS)
+
+    def __len__(self) -> int:
+        return len(self.KEYS)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        if self._headers is None:
+            self._headers = {
+                header["name"].lower(): header["value"]
+                for header in self._raw.get("headers", [])
+            }
+        return self._headers
+
+    @property
+    def body(self) -> str:
+        if self._body is None:
+            self._body = decode_body(self._raw.get("body", {}).get("data", ""))
+        return self._body
+
+    @property
+    def parts(self) -> List["LazyPayload"]:
+        if self._parts is None:
+            self._parts = [LazyPayload(part) for part in self._raw.get("parts", [])]
+        return self._parts
+
+    @property
+    def attachment_id(self) -> Optional[str]:
+        return self._raw.get("body", {}).get("attachmentId")
+
+    @property
+    def is_decoded(self) -> bool:
+        return self._body is not None
+
+    def to_dict(self, keep_mime_types=("text/html",)) -> Dict[str, Any]:
+        """
+        Plain-dict form for storage. Only bodies of the given MIME types (and
+        any part that was already decoded) are kept; everything else,
+        including attachments, is stored without its body.
+        """
+        mime_type = self["mimeType"]
+        keep_body = self.is_decoded or mime_type.lower() in keep_mime_types
+        return {
+            "headers": self.headers,
+            "body": self.body if keep_body else "",
+            "mimeType": mime_type,
+            "filename": self["filename"],
+            "parts": [part.to_dict(keep_mime_types) for part in self.parts],
+        }
@@ -1,42 +1,93 @@
 # notion_manager.py
-import requests
 import os
-from typing import List, Dict, Any
+import logging
+from typing import List, Dict, Any, Iterator, AsyncIterator, Tuple, Union, Callable
+from services.notion_client import AsyncNotionClient, BackgroundLoop, NotionAPIError
+from services.records import NotionTask
+
+
+async def _next_row(rows: AsyncIterator[Dict[str, Any]]) -> Dict[str, Any]:
+    return await rows.__anext__()
 
 
 class NotionDatabaseManager:
-    def __init__(self, database_id: str, token: str = None):
+    def __init__(
+        self, database_id: str, token: str = None, client: AsyncNotionClient = None
+    ):
         self.database_id = database_id
         self.token = token or os.environ.get("NOTION_TOKEN")
-        self.base_url = "https://api.notion.com/v1"
-        self.headers = {
-            "Authorization": f"Bearer {self.token}",
-            "Notion-Version": "2022-06-28",
-            "Content-Type": "application/json",
-        }
-
-    def query_database(self, filter_conditions: List[Dict[str, Any]]) -> Dict[str, Any]:
-        url = f"{self.base_url}/databases/{self.database_id}/query"
+        self.client = client or AsyncNotionClient(self.token)
+        self.loop = BackgroundLoop.get()
+
+    def _run(self, coro):
+        return self.loop.run(coro)
+
+    def close(self) -> None:
+        self._run(self.client.close())
+
+    def iter_query(
+        self, query: Dict[str, Any] = None, max_pages: int = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream every row matching the query, fetching the next page only when
+        the caller has consumed the current one.
+        """
+        rows = self.client.iter_query(self.database_id, query, max_pages=max_pages)
+        try:
+            while True:
+                try:
+                    yield self._run(_next_row(rows))
+                except StopAsyncIteration:
+                    return
+        finally:
+            self._run(rows.aclose())
+
+    def query_database(
+        self, filter_conditions: List[Dict[str, Any]], max_pages: int = None
+    ) -> Dict[str, Any]:
         data = {"filter": {"or": filter_conditions}}
-        response = requests.post(url, json=data, headers=self.headers)
-        return response.json()
+        try:
+            results = list(self.iter_query(data, max_pages=max_pages))
+        except NotionAPIError as error:
+            return error.to_dict()
+        return {"object": "list", "results": results, "has_more": False}
 
-    def get_tasks_by_status(self, statuses: List[str]) -> Dict[str, Any]:
-        filter_conditions = [
+    @staticmethod
+    def _status_conditions(statuses: List[str]) -> List[Dict[str, Any]]:
+        return [
             {"property": "Status", "status": {"equals": status}} for status in statuses
         ]
-        return self.query_database(filter_conditions)
+
+    def get_tasks_by_status(self, statuses: List[str]) -> Dict[str, Any]:
+        return self.query_database(self._status_conditions(statuses))
+
+    def iter_tasks_by_status(
+        self, statuses: List[str], max_pages: int = None
+    ) -> Iterator[Dict[str, Any]]:
+        query = {"filter": {"or": self._status_conditions(statuses)}}
+        return self.iter_query(query, max_pages=max_pages)
+
+    def find_pages_by_title(self, titles: List[str]) -> List[Dict[str, Any]]:
+        """Rows whose Name is one of titles (errors are raised)."""
+        rows = []
+        titles = list(dict.fromkeys(titles))
+        # Notion allows at most 100 conditions in a compound filter
+        for start in range(0, len(titles), 100):
+            conditions = [
+                {"property": "Name", "title": {"equals": title}}
+                for title in titles[start : start + 100]
+            ]
+            rows.extend(self.iter_query({"filter": {"or": conditions}}))
+        return rows
 
     def get_database_properties(self) -> Dict[str, Any]:
-        url = f"{self.base_url}/databases/{self.database_id}"
-        response = requests.get(url, headers=self.headers)
-        return response.json()
+        try:
+            return self.get_database_schema()
+        except NotionAPIError as error:
+            return error.to_dict()
 
     def get_database_schema(self) -> Dict[str, Any]:
-        url = f"{self.base_url}/databases/{self.database_id}"
-        response = requests.get(url, headers=self.headers)
-        response.raise_for_status()
-        return response.json()
+        return self._run(self.client.retrieve_database(self.database_id))
 
     def get_rollups(self) -> List[Dict[str, Any]]:
         schema = self.get_database_schema()
@@ -54,10 +105,53 @@ class NotionDatabaseManager:
 
         return rollups
 
-    def post_data(self, data: Dict[str, Any]):
-        url = "https://api.notion.com/v1/pages/"
+    def post_data(
+        self,
+        data: List[Union[NotionTask, Dict[str, Any]]],
+        on_result: Callable[[Any], None] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Create pages concurrently over the pooled connection.
+
+        :param data: NotionTasks or page JSON
+        :param on_result: Called on the Notion event loop with each response
+            (or exception) as it arrives
+        :return: One entry per input item, in input order. Failed items are
+            returned as Notion-style error objects ({"object": "error", ...})
+        """
+        results = self._run(self.client.create_pages(data, on_result))
+        return self._responses(results, "create")
+
+    def update_pages(
+        self,
+        updates: List[Tuple[str, Dict[str, Any]]],
+        on_result: Callable[[Any], None] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        PATCH only the given properties of existing pages, concurrently.
+
+        :param updates: (page_id, properties) pairs
+        :param on_result: As for post_data
+        :return: One response or error object per update, in input order
+        """
+        results = self._run(self.client.update_pages(updates, on_result))
+        return self._responses(results, "update")
+
+    def _responses(self, results: List[Any], action: str) -> List[Dict[str, Any]]:
         responses = []
-        for item in data:
-            response = requests.post(url, json=item, headers=self.headers)
-            responses.append(response.json())
+        for index, result in enumerate(results):
+            if isinstance(result, NotionAPIError):
+                logging.error(f"Failed to {action} page {index}: {result}")
+                responses.append(result.to_dict())
+            elif isinstance(result, Exception):
+                logging.error(f"Failed to {action} page {index}: {result}")
+                responses.append(
+                    {"object": "error", "status": None, "message": str(result)}
+                )
+            else:
+                responses.append(result)
+        logging.info(f"Notion rate limiting: {self.client.stats.to_dict()}")
         return responses
+
+    def rate_limit_stats(self) -> Dict[str, Any]:
+        return self.client.stats.to_dict()
@@ -0,0 +1,289 @@
+import asyncio
+import json as _json
+import logging
+import threading
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple, Union, Callable
+
+import aiohttp
+
+from services.metrics import metrics
+from services.records import NotionTask
+from services.rate_limiter import (
+    AsyncTokenBucket,
+    RetryPolicy,
+    get_bucket,
+    parse_retry_after,
+)
+
+NOTION_API_URL = "https://api.notion.com/v1"
+NOTION_VERSION = "2022-06-28"
+
+
+class NotionAPIError(Exception):
+    def __init__(self, status: int, body: Dict[str, Any]):
+        self.status = status
+        self.body = body
+        self.code = body.get("code", "")
+        super().__init__(f"Notion API error {status}: {body.get('message', body)}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        # Same shape as the error objects Notion itself returns
+        return {
+            "object": "error",
+            "status": self.status,
+            "code": self.code,
+            "message": self.body.get("message", str(self)),
+        }
+
+
+class AsyncNotionClient:
+    """
+    asyncio Notion client that keeps one pooled aiohttp session for all calls
+    and runs bulk work with bounded concurrency.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        base_url: str = NOTION_API_URL,
+        max_concurrency: int = 3,
+        timeout: float = 30,
+        rate_limiter: AsyncTokenBucket = None,
+        retry_policy: RetryPolicy = None,
+        session: aiohttp.ClientSession = None,
+    ):
+        self.token = token
+        self.base_url = base_url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.headers = {
+            "Authorization": f"Bearer {self.token}",
+            "Notion-Version": NOTION_VERSION,
+            "Content-Type": "application/json",
+        }
+        # Notion's limit is per integration, so clients sharing a token share
+        # a bucket unless one is passed in explicitly
+        self.rate_limiter = rate_limiter or get_bucket(self.token or "")
+        self.retry_policy = retry_policy or RetryPolicy()
+        # A session passed in is shared with other clients (one connection
+        # pool for many tokens) and is left open by close()
+        self._session: Optional[aiohttp.ClientSession] = session
+        self._owns_session = session is None
+
+    @property
+    def stats(self):
+        return self.rate_limiter.stats
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrency, keepalive_timeout=60
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        json: Dict[str, Any] = None,
+        idempotent: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Send a request, retrying failures the retry policy allows.
+        Non-idempotent requests are not retried once they may have reached
+        Notion (see RetryPolicy.should_retry).
+        """
+        session = await self._get_session()
+        url = f"{self.base_url}/{path}"
+        resource = path.split("/", 1)[0]
+        data = None if json is None else _json.dumps(json).encode("utf-8")
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire()
+            retry_after = None
+            sent = True
+            try:
+                async with session.request(
+                    method, url, data=data, headers=self.headers
+                ) as response:
+                    status = response.status
+                    raw = await response.read()
+                    metrics.inc("notion_bytes_sent_total", len(data or b""))
+                    metrics.inc("notion_bytes_received_total", len(raw))
+                    metrics.inc(
+                        "notion_api_calls_total",
+                        method=method,
+                        resource=resource,
+                        status=status,
+                    )
+                    try:
+                        body = _json.loads(raw) if raw else {}
+                    except ValueError:
+                        body = {"message": f"Non-JSON response with status {status}"}
+                    if status < 400:
+                        return body
+                    error = NotionAPIError(status, body or {})
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as exc:
+                status, error = None, exc
+                sent = not isinstance(exc, aiohttp.ClientConnectorError)
+
+            if not self.retry_policy.should_retry(status, attempt, idempotent, sent):
+                raise error
+
+            delay = self.retry_policy.delay(attempt, retry_after)
+            if status == 429:
+                self.stats.rate_limited += 1
+                self.rate_limiter.pause(delay)
+            self.stats.retries += 1
+            self.stats.throttled_seconds += delay
+            metrics.inc("notion_retries_total", status=status or "connection")
+            logging.warning(
+                f"Notion {method} {path} failed ({status or error}); "
+                f"retrying in {delay:.1f}s (attempt {attempt + 1})"
+            )
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def query_database(
+        self, database_id: str, body: Dict[str, Any] = None
+    ) -> Dict[str, Any]:
+        return await self.request("POST", f"databases/{database_id}/query", body or {})
+
+    async def iter_query(
+        self,
+        database_id: str,
+        body: Dict[str, Any] = None,
+        page_size: int = 100,
+        max_pages: int = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield database rows page by page, following has_more/next_cursor.
+
+        :param max_pages: Stop after this many pages (None for all)
+        """
+        body = dict(body or {}, page_size=page_size)
+        pages = 0
+        while max_pages is None or pages < max_pages:
+            response = await self.query_database(database_id, body)
+            pages += 1
+            for row in response.get("results", []):
+                yield row
+            if not response.get("has_more") or not response.get("next_cursor"):
+                break
+            body["start_cursor"] = response["next_cursor"]
+
+    async def retrieve_database(self, database_id: str) -> Dict[str, Any]:
+        return await self.request("GET", f"databases/{database_id}")
+
+    async def create_page(
+        self, page: Union[NotionTask, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        # Tasks become Notion JSON only once their request is about to be sent
+        if isinstance(page, NotionTask):
+            page = page.to_notion()
+        return await self.request("POST", "pages", page, idempotent=False)
+
+    async def update_page(
+        self, page_id: str, properties: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        return await self.request(
+            "PATCH", f"pages/{page_id}", {"properties": properties}
+        )
+
+    async def gather_bounded(
+        self, coros, on_result: Callable[[Any], None] = None
+    ) -> List[Any]:
+        """
+        Run coroutines at most max_concurrency at a time.
+
+        :param on_result: Called with each result (or exception) as soon as
+            its coroutine finishes
+        :return: Results in input order; failures are returned as the exception
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(coro):
+            async with semaphore:
+                try:
+                    result = await coro
+                except Exception as error:
+                    result = error
+            if on_result is not None:
+                on_result(result)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        return await asyncio.gather(
+            *(run(coro) for coro in coros), return_exceptions=True
+        )
+
+    async def create_pages(
+        self,
+        pages: List[Union[NotionTask, Dict[str, Any]]],
+        on_result: Callable[[Any], None] = None,
+    ) -> List[Any]:
+        return await self.gather_bounded(
+            (self.create_page(page) for page in pages), on_result
+        )
+
+    async def update_pages(
+        self,
+        updates: List[Tuple[str, Dict[str, Any]]],
+        on_result: Callable[[Any], None] = None,
+    ) -> List[Any]:
+        """Apply (page_id, properties) updates concurrently, in input order."""
+        return await self.gather_bounded(
+            (self.update_page(page_id, properties) for page_id, properties in updates),
+            on_result,
+        )
+
+    async def close(self) -> None:
+        if not self._owns_session:
+            return
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+async def create_shared_session(
+    max_connections: int = 20, timeout: float = 30
+) -> aiohttp.ClientSession:
+    """A session for several AsyncNotionClients; must be created on their loop."""
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=max_connections, keepalive_timeout=60),
+        timeout=aiohttp.ClientTimeout(total=timeout),
+    )
+
+
+class BackgroundLoop:
+    """
+    A daemon thread running one event loop, so synchronous callers can share
+    long-lived async clients (and their connection pools) across calls.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name="notion-loop", daemon=True
+        )
+        self.thread.start()
+
+    @classmethod
+    def get(cls) -> "BackgroundLoop":
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def run(self, coro, timeout: float = None):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
@@ -0,0 +1,283 @@
+import json
+import hashlib
+import logging
+from typing import List, Dict, Any, Tuple, Callable
+from services.notion import NotionDatabaseManager
+from services.state_store import StateStore
+from services.cache_manager import NotionCache, assignment_identity
+from services.records import NotionTask
+
+# Properties that come from Classroom. Status, Type, Priority and Estimated
+# Time are only set when a page is created; after that they are the user's.
+SYNCED_PROPERTIES = ("Name", "Due Date", "Note", "Activity")
+
+# Errors sending the same page again cannot fix, such as a validation_error
+# for text over Notion's length limits. Auth errors and a missing database
+# are left retryable: they go away once the integration is set up again.
+PERMANENT_ERROR_STATUSES = (400, 413)
+
+
+def property_hashes(properties: Dict[str, Any]) -> Dict[str, str]:
+    return {
+        name: hashlib.sha1(
+            json.dumps(properties[name], sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        for name in SYNCED_PROPERTIES
+        if name in properties
+    }
+
+
+def fingerprint(hashes: Dict[str, str]) -> str:
+    return hashlib.sha1(json.dumps(hashes, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class UpsertPlan:
+    """What an upsert has to do for a list of parsed pages."""
+
+    def __init__(self):
+        self.creates: List[Tuple[str, NotionTask]] = []
+        # (identity, page_id, changed properties, page)
+        self.updates: List[Tuple[str, str, Dict[str, Any], NotionTask]] = []
+        # Pages already in Notion as they are, including ones whose page ID
+        # is unknown (imported from the old JSON cache) and cannot be updated
+        self.unchanged: List[Tuple[str, NotionTask]] = []
+        # Later pages with the identity of an earlier one in the same list
+        self.duplicates: List[NotionTask] = []
+        self.hashes: Dict[str, Dict[str, str]] = {}
+        self.page_ids: Dict[str, str] = {}
+        # Notion error objects for failed creates and updates, set by apply()
+        self.errors: List[Dict[str, Any]] = []
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "create": len(self.creates),
+            "update": len(self.updates),
+            "unchanged": len(self.unchanged),
+            "duplicate": len(self.duplicates),
+        }
+
+
+class NotionUpserter:
+    """
+    Creates or updates assignment pages by identity (see
+    assignment_identity). Each synced page's Notion ID and per-property
+    content hashes are kept in the StateStore, so an unchanged assignment
+    costs no API call and a changed one a single PATCH of just the changed
+    properties.
+    """
+
+    def __init__(
+        self, ndm: NotionDatabaseManager, store: StateStore, notion_cache: NotionCache
+    ):
+        self.ndm = ndm
+        self.store = store
+        self.notion_cache = notion_cache
+
+    def plan(self, pages: List[NotionTask]) -> UpsertPlan:
+        plan = UpsertPlan()
+        unique = {}
+        for page in pages:
+            identity = assignment_identity(page)
+            if identity in unique:
+                plan.duplicates.append(page)
+            else:
+                unique[identity] = page
+
+        synced = self.store.get_synced_pages(list(unique))
+        synced.update(self._legacy_pages(unique, synced))
+        # Look up pages that may exist in Notion but whose ID is unknown:
+        # earlier creates that failed without a clear answer, and pages
+        # created by old versions that did not record page IDs
+        lookups = self.store.get_unconfirmed_creates(
+            [identity for identity in unique if identity not in synced]
+        )
+        lookups.update(
+            identity
+            for identity, previous in synced.items()
+            if identity in unique and not previous["page_id"]
+        )
+        found = self._find_pages(unique, lookups)
+
+        for identity, page in unique.items():
+            properties = page.properties()
+            hashes = property_hashes(properties)
+            plan.hashes[identity] = hashes
+            previous = synced.get(identity)
+            page_id = (previous or {}).get("page_id") or found.get(identity)
+            if previous is None:
+                if page_id:
+                    # An earlier create went through after all: bring it up
+                    # to date
+                    plan.page_ids[identity] = page_id
+                    changed = {name: properties[name] for name in hashes}
+                    plan.updates.append((identity, page_id, changed, page))
+                else:
+                    plan.creates.append((identity, page))
+                continue
+            if not page_id:
+                # Created by an old version, but not found in Notion: it can
+                # be neither updated nor recorded as synced
+                plan.unchanged.append((identity, page))
+                continue
+            plan.page_ids[identity] = page_id
+            changed = {}
+            if previous.get("fingerprint") != fingerprint(hashes):
+                changed = {
+                    name: properties[name]
+                    for name, value in hashes.items()
+                    if previous["property_hashes"].get(name) != value
+                }
+            if changed:
+                plan.updates.append((identity, page_id, changed, page))
+            else:
+                plan.unchanged.append((identity, page))
+        return plan
+
+    def _find_pages(
+        self, unique: Dict[str, NotionTask], identities: set
+    ) -> Dict[str, str]:
+        """The Notion page IDs of identities, searched by title in Notion."""
+        if not identities:
+            return {}
+        rows = self.ndm.find_pages_by_title(
+            [NotionCache.title(unique[identity]) for identity in identities]
+        )
+        found = {}
+        for row in rows:
+            identity = assignment_identity(NotionTask.from_notion(row))
+            if identity in identities:
+                found.setdefault(identity, row["id"])
+        logging.info(f"Found {len(found)} of {len(identities)} pages in Notion")
+        return found
+
+    def _legacy_pages(
+        self, unique: Dict[str, NotionTask], synced: Dict[str, Dict[str, Any]]
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Pages created before identities were tracked, found by link or, for
+        rows from the JSON cache, by title. A title-keyed row is only used
+        when the link in its page data is the assignment's: titles such as
+        "Homework 3" repeat across courses.
+        """
+        missing = {
+            identity: page
+            for identity, page in unique.items()
+            if identity not in synced
+        }
+        if not missing:
+            return {}
+        links = {
+            NotionCache.assignment_link(page): identity
+            for identity, page in missing.items()
+        }
+        titles = {
+            NotionCache.title(page): identity for identity, page in missing.items()
+        }
+        rows = {}
+        for link, row in self.store.get_notion_pages_by_links(list(links)).items():
+            rows[links[link]] = row
+        for title, row in self.store.get_notion_pages_by_keys(list(titles)).items():
+            # Title-keyed rows come from the JSON cache and have no link column
+            if row["assignment_link"]:
+                continue
+            identity = titles[title]
+            legacy = NotionTask.from_notion(json.loads(row["data"] or "{}"))
+            if legacy.link and legacy.link == missing[identity].link:
+                rows.setdefault(identity, row)
+        return {
+            identity: {
+                "page_id": row["page_id"],
+                "property_hashes": property_hashes(
+                    json.loads(row["data"] or "{}").get("properties", {})
+                ),
+            }
+            for identity, row in rows.items()
+        }
+
+    def apply(
+        self, plan: UpsertPlan, on_result: Callable[[Any], None] = None
+    ) -> Dict[int, str]:
+        """
+        Run the plan against Notion and record what was synced. on_result is
+        passed on to NotionDatabaseManager.post_data and update_pages.
+
+        :return: Outcome per page, keyed by id(page): "created", "updated",
+            "unchanged", "duplicate", "error" (worth retrying) or "failed"
+            (rejected by Notion, see PERMANENT_ERROR_STATUSES)
+        """
+        outcomes = {id(page): "duplicate" for page in plan.duplicates}
+        synced = []
+        for identity, page in plan.unchanged:
+            outcomes[id(page)] = "unchanged"
+            if plan.page_ids.get(identity):
+                synced.append(self._synced_row(plan, identity, plan.page_ids[identity]))
+
+        if plan.creates:
+            pages = [page for _, page in plan.creates]
+            responses = self.ndm.post_data(pages, on_result)
+            self.notion_cache.add_to_cache(pages, responses)
+            unconfirmed = []
+            for (identity, page), response in zip(plan.creates, responses):
+                if response.get("object") == "error":
+                    outcomes[id(page)] = self._error_outcome(page, response)
+                    plan.errors.append(response)
+                    # The page may exist anyway; look for it before retrying
+                    status = response.get("status")
+                    if status is None or status >= 500:
+                        unconfirmed.append(identity)
+                    continue
+                outcomes[id(page)] = "created"
+                synced.append(self._synced_row(plan, identity, response.get("id")))
+            self.store.add_unconfirmed_creates(unconfirmed)
+
+        if plan.updates:
+            responses = self.ndm.update_pages(
+                [(page_id, changed) for _, page_id, changed, _ in plan.updates],
+                on_result,
+            )
+            gone, gone_ids = [], set()
+            for (identity, page_id, _, page), response in zip(plan.updates, responses):
+                if response.get("object") == "error":
+                    outcomes[id(page)] = self._error_outcome(page, response)
+                    plan.errors.append(response)
+                    # Deleted in Notion: forget it so the next run recreates it
+                    if response.get("status") == 404:
+                        gone.append(identity)
+                        gone_ids.add(page_id)
+                    continue
+                outcomes[id(page)] = "updated"
+                synced.append(self._synced_row(plan, identity, page_id))
+            self.store.delete_synced_pages(gone)
+            self.store.delete_notion_pages(
+                [page_id for _, page_id, _, _ in plan.updates if page_id in gone_ids]
+            )
+
+        # A synced row without a page ID could never be updated
+        synced = [row for row in synced if row["page_id"]]
+        self.store.upsert_synced_pages(synced)
+        self.store.delete_unconfirmed_creates([row["identity"] for row in synced])
+        logging.info(f"Notion upsert: {plan.summary()}")
+        return outcomes
+
+    @staticmethod
+    def _error_outcome(page: NotionTask, response: Dict[str, Any]) -> str:
+        if response.get("status") not in PERMANENT_ERROR_STATUSES:
+            return "error"
+        logging.warning(
+            f"Notion rejected '{page.name}' ({response.get('code')}: "
+            f"{response.get('message')}); it will not be retried"
+        )
+        return "failed"
+
+    @staticmethod
+    def _synced_row(plan: UpsertPlan, identity: str, page_id: str) -> Dict[str, Any]:
+        hashes = plan.hashes[identity]
+        return {
+            "identity": identity,
+            "page_id": page_id,
+            "fingerprint": fingerprint(hashes),
+            "property_hashes": hashes,
+        }
+
+    def upsert(self, pages: List[NotionTask]) -> Dict[int, str]:
+        return self.apply(self.plan(pages))
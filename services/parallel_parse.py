@@ -0,0 +1,93 @@
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+from services.assignment_extractor import extract_assignment, find_html_part
+from services.assignment_parser import build_task, parse_due_date
+from services.records import ClassroomMessage, ExtractedAssignment, NotionTask
+
+
+def parse_chunk(
+    messages: List[Tuple[str, Dict[str, Any]]],
+) -> List[Tuple[ExtractedAssignment, Optional[str]]]:
+    """
+    Extract the assignment from each (message ID, payload) pair and parse its
+    due date. Messages without an HTML part are left out.
+    """
+    results = []
+    for message_id, payload in messages:
+        html_content = find_html_part(payload)
+        if html_content is None:
+            print(f"No text/html part in message ID: {message_id}")
+            continue
+        extracted = ExtractedAssignment.from_dict(
+            extract_assignment(html_content), message_id=message_id
+        )
+        results.append((extracted, parse_due_date(extracted.due_date)))
+    return results
+
+
+class ParallelParser:
+    """
+    Runs the CPU-bound part of the pipeline (finding the HTML part, regex
+    extraction and due date parsing) on a pool of worker processes, in
+    chunks of `chunk_size` messages.
+
+    Results come back in message order whatever the number of workers.
+    Batches smaller than `min_parallel` messages, or a single worker, run
+    in-process, where shipping the payloads to another process would cost
+    more than it saves. The Notion tasks are built and matched to activities
+    in the calling process, as the workers need no activity state.
+    """
+
+    def __init__(
+        self, workers: int = None, chunk_size: int = 100, min_parallel: int = 200
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.min_parallel = min_parallel
+        self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Workers are spawned rather than forked: the sync process runs
+            # the Notion event loop and credential refresh in other threads
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            logging.info(f"Started {self.workers} parse worker processes")
+        return self._pool
+
+    def parse(
+        self, messages: List[ClassroomMessage], database_id: str = None
+    ) -> Tuple[List[ExtractedAssignment], List[NotionTask]]:
+        """
+        :param database_id: The tasks database, see build_task; a pool can be
+            shared by engines syncing to different databases
+        :return: The extracted assignments and their Notion tasks (without
+            the activity), in the order of messages
+        """
+        items = [(message.id, message.payload) for message in messages]
+        if self.workers <= 1 or len(items) < self.min_parallel:
+            results = parse_chunk(items)
+        else:
+            chunks = [
+                items[start : start + self.chunk_size]
+                for start in range(0, len(items), self.chunk_size)
+            ]
+            results = []
+            for chunk_results in self._get_pool().map(parse_chunk, chunks):
+                results.extend(chunk_results)
+        extracted_data = [extracted for extracted, _ in results]
+        tasks = [
+            build_task(extracted, due_date, database_id)
+            for extracted, due_date in results
+        ]
+        return extracted_data, tasks
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
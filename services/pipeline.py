@@ -0,0 +1,76 @@
+import queue
+import threading
+from contextlib import nullcontext
+from typing import Iterable, Iterator, List, TypeVar
+from services.metrics import current_timings, track_sync
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _put(items: queue.Queue, item, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            items.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def prefetch(
+    iterable: Iterable[T], maxsize: int = 2, name: str = "pipeline-stage"
+) -> Iterator[T]:
+    """
+    Run a pipeline stage in its own thread, at most `maxsize` items ahead of
+    the consumer. Chaining stages this way overlaps their I/O while keeping
+    memory bounded by the queue sizes.
+
+    Exceptions from the stage are re-raised in the consumer. Closing the
+    returned generator (or abandoning it with an exception) stops the stage
+    and closes its iterable. Spans opened by the stage count towards the
+    consumer's sync timings.
+    """
+    items = queue.Queue(maxsize)
+    stop = threading.Event()
+    timings = current_timings()
+
+    def produce():
+        with track_sync(timings) if timings is not None else nullcontext():
+            try:
+                for item in iterable:
+                    if not _put(items, (item, None), stop):
+                        return
+                _put(items, (_DONE, None), stop)
+            except BaseException as e:
+                _put(items, (_DONE, e), stop)
+            finally:
+                close = getattr(iterable, "close", None)
+                if close is not None:
+                    close()
+
+    thread = threading.Thread(target=produce, name=name, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if error is not None:
+                raise error
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,185 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+
+class RateLimitStats:
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.throttled_seconds = 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+        }
+
+
+class AsyncTokenBucket:
+    """
+    Token bucket for asyncio callers. Tokens refill continuously at `rate` per
+    second up to `capacity`; acquire() waits until one is available.
+    """
+
+    def __init__(self, rate: float = 3.0, capacity: float = 3.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.stats = RateLimitStats()
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    async def acquire(self) -> float:
+        """Take one token, returning the number of seconds spent waiting."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        waited = 0.0
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    delay = self.blocked_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    break
+                else:
+                    delay = (1 - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+        self.stats.requests += 1
+        self.stats.throttled_seconds += waited
+        return waited
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller sharing this bucket, e.g. after a 429."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket for blocking callers, such as the Gmail client.
+    acquire(cost) waits until `cost` tokens are available, so it can meter
+    quota units as well as requests.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.stats = RateLimitStats()
+        self._lock = threading.Lock()
+
+    def acquire(self, cost: float = 1) -> float:
+        """Take `cost` tokens, returning the number of seconds spent waiting."""
+        cost = min(cost, self.capacity)
+        waited = 0.0
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated_at) * self.rate
+                )
+                self.updated_at = now
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    break
+                delay = (cost - self.tokens) / self.rate
+                time.sleep(delay)
+                waited += delay
+        self.stats.requests += 1
+        self.stats.throttled_seconds += waited
+        return waited
+
+
+class RetryPolicy:
+    RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(
+        self,
+        max_retries: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        jitter: float = 0.5,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def should_retry(
+        self,
+        status: Optional[int],
+        attempt: int,
+        idempotent: bool = True,
+        sent: bool = True,
+    ) -> bool:
+        """
+        :param status: The response status, or None for a connection error
+            or timeout
+        :param idempotent: False for requests that must not run twice, such
+            as creating a page. Those are only retried when Notion certainly
+            did not act on them: a 429, or a connection that never opened
+        :param sent: Whether the request may have reached the server
+        """
+        if attempt >= self.max_retries:
+            return False
+        if not idempotent:
+            return status == 429 or (status is None and not sent)
+        return status is None or status in self.RETRYABLE_STATUSES
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Seconds to wait before retry number `attempt` (0-based). A Retry-After
+        value from the server is treated as the minimum wait.
+        """
+        backoff = min(self.max_delay, self.base_delay * (2**attempt))
+        backoff += random.uniform(0, self.jitter * backoff)
+        if retry_after is not None:
+            return max(retry_after, backoff)
+        return backoff
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+_buckets: Dict[str, AsyncTokenBucket] = {}
+_thread_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(key: str, rate: float = 3.0, capacity: float = 3.0) -> AsyncTokenBucket:
+    """Return the bucket shared by every client using the same key (token)."""
+    with _buckets_lock:
+        if key not in _buckets:
+            _buckets[key] = AsyncTokenBucket(rate, capacity)
+        return _buckets[key]
+
+
+def get_thread_bucket(key: str, rate: float, capacity: float = None) -> TokenBucket:
+    """Like get_bucket, for blocking callers."""
+    with _buckets_lock:
+        if key not in _thread_buckets:
+            _thread_buckets[key] = TokenBucket(rate, capacity)
+        return _thread_buckets[key]
@@ -0,0 +1,185 @@
+from typing import List, Dict, Any, Optional
+from services.mime import LazyPayload
+from services.assignment_extractor import NOT_FOUND
+
+
+class ClassroomMessage:
+    """
+    A Gmail message in the pipeline. `payload` is a LazyPayload for freshly
+    fetched messages and the stored plain dict for ones loaded from the
+    StateStore; both have "headers" (lowercased names) and the HTML part.
+    """
+
+    __slots__ = ("id", "thread_id", "label_ids", "snippet", "payload")
+
+    def __init__(
+        self,
+        id: str,
+        thread_id: str = None,
+        label_ids: List[str] = None,
+        snippet: str = "",
+        payload: Any = None,
+    ):
+        self.id = id
+        self.thread_id = thread_id
+        self.label_ids = label_ids or []
+        self.snippet = snippet
+        self.payload = payload if payload is not None else {}
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return self.payload.get("headers", {})
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ClassroomMessage":
+        """From the dict shape ClassroomDataManager used to produce."""
+        return cls(
+            data["id"],
+            data.get("threadId"),
+            data.get("labelIds"),
+            data.get("snippet", ""),
+            data.get("payload"),
+        )
+
+    def payload_dict(self) -> Dict[str, Any]:
+        # Lazy payloads keep only the HTML body; attachments are never stored
+        if isinstance(self.payload, LazyPayload):
+            return self.payload.to_dict()
+        return self.payload
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "threadId": self.thread_id,
+            "labelIds": self.label_ids,
+            "snippet": self.snippet,
+            "payload": self.payload_dict(),
+        }
+
+
+class ExtractedAssignment:
+    """The fields extract_assignment finds in a Classroom notification."""
+
+    FIELDS = (
+        "assignment_name",
+        "assignment_link",
+        "class_link",
+        "assignment_description",
+        "class_name",
+        "due_date",
+        "posted_date",
+        "posted_by",
+    )
+
+    __slots__ = FIELDS + ("message_id",)
+
+    def __init__(
+        self,
+        assignment_name: str = NOT_FOUND,
+        assignment_link: str = NOT_FOUND,
+        class_link: str = NOT_FOUND,
+        assignment_description: str = NOT_FOUND,
+        class_name: str = NOT_FOUND,
+        due_date: str = NOT_FOUND,
+        posted_date: str = NOT_FOUND,
+        posted_by: str = NOT_FOUND,
+        message_id: str = None,
+    ):
+        self.assignment_name = assignment_name
+        self.assignment_link = assignment_link
+        self.class_link = class_link
+        self.assignment_description = assignment_description
+        self.class_name = class_name
+        self.due_date = due_date
+        self.posted_date = posted_date
+        self.posted_by = posted_by
+        self.message_id = message_id
+
+    @classmethod
+    def from_dict(
+        cls, data: Dict[str, Any], message_id: str = None
+    ) -> "ExtractedAssignment":
+        fields = {field: data.get(field, NOT_FOUND) for field in cls.FIELDS}
+        return cls(message_id=message_id or data.get("message_id"), **fields)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {field: getattr(self, field) for field in self.FIELDS}
+        data["message_id"] = self.message_id
+        return data
+
+    def __repr__(self) -> str:
+        return f"ExtractedAssignment({self.assignment_name!r}, {self.message_id!r})"
+
+
+class NotionTask:
+    """
+    An assignment page for the tasks database. The Notion JSON is only built
+    by properties() and to_notion(), when the page is written to Notion or
+    the StateStore; Status, Type, Estimated Time and Priority always start
+    out empty, so they are not stored per task.
+    """
+
+    __slots__ = ("database_id", "name", "link", "due_date", "note", "activity_id")
+
+    def __init__(
+        self,
+        database_id: str,
+        name: str,
+        link: str,
+        due_date: Optional[str] = None,
+        note: str = "",
+        activity_id: str = None,
+    ):
+        self.database_id = database_id
+        self.name = name
+        self.link = link
+        # ISO 8601 start of the due date, or None
+        self.due_date = due_date
+        self.note = note
+        self.activity_id = activity_id
+
+    def properties(self) -> Dict[str, Any]:
+        properties = {
+            "Status": {"status": {"name": "Not started"}},
+            "Type": {"select": None},
+            "Estimated Time": {"rich_text": []},
+            "Priority": {"select": None},
+            "Due Date": {
+                "date": (
+                    {"start": self.due_date, "end": None} if self.due_date else None
+                )
+            },
+            "Note": {"rich_text": [{"text": {"content": self.note}}]},
+            "Name": {
+                "title": [{"text": {"content": self.name, "link": {"url": self.link}}}]
+            },
+        }
+        if self.activity_id:
+            properties["Activity"] = {"relation": [{"id": self.activity_id}]}
+        return properties
+
+    @classmethod
+    def from_notion(cls, page: Dict[str, Any]) -> "NotionTask":
+        """
+        The name, link and activity of a page as Notion returns it (or as
+        to_notion built it), enough for assignment_identity.
+        """
+        properties = page.get("properties", {})
+        title = (properties.get("Name") or {}).get("title") or [{}]
+        text = title[0].get("text") or {}
+        relation = (properties.get("Activity") or {}).get("relation") or [{}]
+        return cls(
+            (page.get("parent") or {}).get("database_id"),
+            text.get("content", title[0].get("plain_text", "")),
+            (text.get("link") or {}).get("url"),
+            activity_id=relation[0].get("id"),
+        )
+
+    def to_notion(self) -> Dict[str, Any]:
+        return {
+            "parent": {"database_id": self.database_id},
+            "properties": self.properties(),
+        }
+
+    def __repr__(self) -> str:
+        return f"NotionTask({self.name!r}, {self.link!r})"
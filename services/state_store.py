@@ -0,0 +1,427 @@
+import json
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Iterable
+from services.records import ClassroomMessage, ExtractedAssignment
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    thread_id TEXT,
+    label_ids TEXT,
+    snippet TEXT,
+    payload TEXT,
+    fetched_at REAL
+);
+CREATE TABLE IF NOT EXISTS assignments (
+    message_id TEXT PRIMARY KEY,
+    assignment_link TEXT,
+    assignment_name TEXT,
+    data TEXT,
+    extracted_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_assignments_link ON assignments (assignment_link);
+CREATE TABLE IF NOT EXISTS notion_pages (
+    key TEXT PRIMARY KEY,
+    page_id TEXT,
+    assignment_link TEXT,
+    data TEXT,
+    created_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_notion_pages_page_id ON notion_pages (page_id);
+CREATE INDEX IF NOT EXISTS idx_notion_pages_link ON notion_pages (assignment_link);
+CREATE TABLE IF NOT EXISTS synced_pages (
+    identity TEXT PRIMARY KEY,
+    page_id TEXT,
+    fingerprint TEXT,
+    property_hashes TEXT,
+    synced_at REAL
+);
+CREATE TABLE IF NOT EXISTS unconfirmed_creates (
+    identity TEXT PRIMARY KEY,
+    attempted_at REAL
+);
+CREATE TABLE IF NOT EXISTS processed_messages (
+    message_id TEXT PRIMARY KEY,
+    status TEXT,
+    processed_at REAL
+);
+CREATE TABLE IF NOT EXISTS activities (
+    id TEXT PRIMARY KEY,
+    last_edited_time TEXT,
+    data TEXT
+);
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class StateStore:
+    """
+    SQLite (WAL mode) store for everything the sync keeps between runs:
+    fetched messages, extracted assignments, created Notion pages and small
+    key/value state such as the Gmail history ID.
+    """
+
+    def __init__(self, path: str = "cache/state.db"):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+    def _write(self, sql: str, rows: Iterable[tuple]) -> None:
+        with self._lock, self.conn:
+            self.conn.executemany(sql, rows)
+
+    def _query(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    # Key/value state
+
+    def get_value(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        rows = self._query("SELECT value FROM kv WHERE key = ?", (key,))
+        return rows[0]["value"] if rows else default
+
+    def set_value(self, key: str, value: Any) -> None:
+        self._write(
+            "INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", [(key, str(value))]
+        )
+
+    # Messages
+
+    def upsert_messages(self, messages: List[ClassroomMessage]) -> None:
+        now = time.time()
+        self._write(
+            "INSERT OR REPLACE INTO messages "
+            "(id, thread_id, label_ids, snippet, payload, fetched_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    message.id,
+                    message.thread_id,
+                    json.dumps(message.label_ids),
+                    message.snippet,
+                    json.dumps(message.payload_dict()),
+                    now,
+                )
+                for message in messages
+            ),
+        )
+
+    def get_messages(self, limit: Optional[int] = None) -> List[ClassroomMessage]:
+        sql = "SELECT * FROM messages ORDER BY fetched_at DESC"
+        params: tuple = ()
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = (limit,)
+        return [self._message_from_row(row) for row in self._query(sql, params)]
+
+    def get_message(self, message_id: str) -> Optional[ClassroomMessage]:
+        rows = self._query("SELECT * FROM messages WHERE id = ?", (message_id,))
+        return self._message_from_row(rows[0]) if rows else None
+
+    def get_messages_by_ids(self, message_ids: List[str]) -> List[ClassroomMessage]:
+        """Stored messages in the order of message_ids; unknown IDs are skipped."""
+        rows = {
+            row["id"]: row for row in self._select_in("messages", "id", message_ids)
+        }
+        return [
+            self._message_from_row(rows[message_id])
+            for message_id in message_ids
+            if message_id in rows
+        ]
+
+    def count_messages(self) -> int:
+        return self._query("SELECT COUNT(*) AS n FROM messages")[0]["n"]
+
+    @staticmethod
+    def _message_from_row(row: sqlite3.Row) -> ClassroomMessage:
+        return ClassroomMessage(
+            row["id"],
+            row["thread_id"],
+            json.loads(row["label_ids"] or "[]"),
+            row["snippet"],
+            json.loads(row["payload"] or "{}"),
+        )
+
+    def _select_in(
+        self, table: str, column: str, values: List[str], columns: str = "*"
+    ) -> List[sqlite3.Row]:
+        rows = []
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(values), 500):
+            chunk = values[start : start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows.extend(
+                self._query(
+                    f"SELECT {columns} FROM {table} WHERE {column} IN ({placeholders})",
+                    tuple(chunk),
+                )
+            )
+        return rows
+
+    def _existing_ids(self, table: str, column: str, ids: List[str]) -> set:
+        return {row[column] for row in self._select_in(table, column, ids, column)}
+
+    # Processed-message ledger
+
+    def known_message_ids(self, message_ids: List[str]) -> set:
+        """IDs that are already stored or have been through the pipeline."""
+        return self._existing_ids(
+            "processed_messages", "message_id", message_ids
+        ) | self._existing_ids("messages", "id", message_ids)
+
+    def mark_messages_processed(self, message_ids: List[str], status: str) -> None:
+        now = time.time()
+        self._write(
+            "INSERT OR REPLACE INTO processed_messages "
+            "(message_id, status, processed_at) VALUES (?, ?, ?)",
+            ((message_id, status, now) for message_id in message_ids),
+        )
+
+    def get_pending_messages(self) -> List[ClassroomMessage]:
+        """Stored messages that have not made it through the pipeline yet."""
+        return self.get_messages_by_ids(self.pending_message_ids())
+
+    def pending_message_ids(self) -> List[str]:
+        rows = self._query(
+            "SELECT m.id FROM messages m "
+            "LEFT JOIN processed_messages p ON p.message_id = m.id "
+            "WHERE p.message_id IS NULL ORDER BY m.fetched_at DESC"
+        )
+        return [row["id"] for row in rows]
+
+    # Extracted assignments
+
+    def upsert_assignments(self, assignments: List[ExtractedAssignment]) -> None:
+        now = time.time()
+        self._write(
+            "INSERT OR REPLACE INTO assignments "
+            "(message_id, assignment_link, assignment_name, data, extracted_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                (
+                    assignment.message_id,
+                    assignment.assignment_link,
+                    assignment.assignment_name,
+                    json.dumps(assignment.to_dict()),
+                    now,
+                )
+                for assignment in assignments
+                if assignment.message_id
+            ),
+        )
+
+    def get_assignment_by_link(
+        self, assignment_link: str
+    ) -> Optional[ExtractedAssignment]:
+        rows = self._query(
+            "SELECT data FROM assignments WHERE assignment_link = ?", (assignment_link,)
+        )
+        if not rows:
+            return None
+        return ExtractedAssignment.from_dict(json.loads(rows[0]["data"]))
+
+    # Notion pages
+
+    def add_notion_pages(self, pages: List[Dict[str, Any]]) -> None:
+        """
+        :param pages: Dicts with "key", "page_id", "assignment_link" and "data"
+        """
+        now = time.time()
+        self._write(
+            "INSERT OR REPLACE INTO notion_pages "
+            "(key, page_id, assignment_link, data, created_at) VALUES (?, ?, ?, ?, ?)",
+            (
+                (
+                    page["key"],
+                    page.get("page_id"),
+                    page.get("assignment_link"),
+                    json.dumps(page.get("data", {})),
+                    now,
+                )
+                for page in pages
+            ),
+        )
+
+    def get_notion_page(self, page_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._query("SELECT * FROM notion_pages WHERE page_id = ?", (page_id,))
+        return dict(rows[0]) if rows else None
+
+    def get_notion_page_by_link(self, assignment_link: str) -> Optional[Dict[str, Any]]:
+        rows = self._query(
+            "SELECT * FROM notion_pages WHERE assignment_link = ?", (assignment_link,)
+        )
+        return dict(rows[0]) if rows else None
+
+    def delete_notion_pages(self, page_ids: List[str]) -> None:
+        self._write(
+            "DELETE FROM notion_pages WHERE page_id = ?",
+            ((page_id,) for page_id in page_ids),
+        )
+
+    def get_notion_pages_by_links(self, links: List[str]) -> Dict[str, Dict[str, Any]]:
+        rows = self._select_in("notion_pages", "assignment_link", links)
+        return {row["assignment_link"]: dict(row) for row in rows}
+
+    def get_notion_pages_by_keys(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        return {
+            row["key"]: dict(row)
+            for row in self._select_in("notion_pages", "key", keys)
+        }
+
+    # Synced page identities and fingerprints
+
+    def get_synced_pages(self, identities: List[str]) -> Dict[str, Dict[str, Any]]:
+        pages = {}
+        for row in self._select_in("synced_pages", "identity", identities):
+            page = dict(row)
+            page["property_hashes"] = json.loads(page["property_hashes"] or "{}")
+            pages[page["identity"]] = page
+        return pages
+
+    def upsert_synced_pages(self, pages: List[Dict[str, Any]]) -> None:
+        """
+        :param pages: Dicts with "identity", "page_id", "fingerprint" and
+            "property_hashes"
+        """
+        now = time.time()
+        self._write(
+            "INSERT OR REPLACE INTO synced_pages "
+            "(identity, page_id, fingerprint, property_hashes, synced_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                (
+                    page["identity"],
+                    page.get("page_id"),
+                    page["fingerprint"],
+                    json.dumps(page["property_hashes"]),
+                    now,
+                )
+                for page in pages
+            ),
+        )
+
+    def delete_synced_pages(self, identities: List[str]) -> None:
+        self._write(
+            "DELETE FROM synced_pages WHERE identity = ?",
+            ((identity,) for identity in identities),
+        )
+
+    # Page creations that failed without a clear answer from Notion
+
+    def add_unconfirmed_creates(self, identities: List[str]) -> None:
+        now = time.time()
+        self._write(
+            "INSERT OR REPLACE INTO unconfirmed_creates (identity, attempted_at) "
+            "VALUES (?, ?)",
+            ((identity, now) for identity in identities),
+        )
+
+    def get_unconfirmed_creates(self, identities: List[str]) -> set:
+        return self._existing_ids("unconfirmed_creates", "identity", identities)
+
+    def delete_unconfirmed_creates(self, identities: List[str]) -> None:
+        self._write(
+            "DELETE FROM unconfirmed_creates WHERE identity = ?",
+            ((identity,) for identity in identities),
+        )
+
+    # Notion activities
+
+    _UPSERT_ACTIVITY = (
+        "INSERT OR REPLACE INTO activities (id, last_edited_time, data) "
+        "VALUES (?, ?, ?)"
+    )
+
+    @staticmethod
+    def _activity_row(activity: Dict[str, Any]) -> tuple:
+        return (activity["id"], activity.get("last_edited_time"), json.dumps(activity))
+
+    def upsert_activities(self, activities: List[Dict[str, Any]]) -> None:
+        self._write(
+            self._UPSERT_ACTIVITY,
+            (self._activity_row(activity) for activity in activities),
+        )
+
+    def delete_activities(self, activity_ids: List[str]) -> None:
+        self._write(
+            "DELETE FROM activities WHERE id = ?",
+            ((activity_id,) for activity_id in activity_ids),
+        )
+
+    def replace_activities(self, activities: List[Dict[str, Any]]) -> None:
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM activities")
+            self.conn.executemany(
+                self._UPSERT_ACTIVITY,
+                (self._activity_row(activity) for activity in activities),
+            )
+
+    def get_activities(self) -> List[Dict[str, Any]]:
+        rows = self._query("SELECT data FROM activities ORDER BY rowid")
+        return [json.loads(row["data"]) for row in rows]
+
+    # One-time import of the old JSON files
+
+    def import_json_files(
+        self,
+        messages_file: str = "outputs/classroom_data.json",
+        notion_cache_file: str = "cache/notion_cache.json",
+        gmail_state_file: str = "cache/gmail_state.json",
+    ) -> None:
+        """
+        Import the JSON files earlier versions wrote. Extracted assignments are
+        not imported since they are re-derived from the imported messages.
+        """
+        if self.get_value("json_imported"):
+            return
+
+        messages = _load_json(messages_file, [])
+        if messages:
+            self.upsert_messages(ClassroomMessage.from_dict(item) for item in messages)
+
+        notion_cache = _load_json(notion_cache_file, {})
+        if notion_cache:
+            self.add_notion_pages(
+                {"key": key, "page_id": None, "assignment_link": None, "data": item}
+                for key, item in notion_cache.items()
+            )
+
+        history_id = _load_json(gmail_state_file, {}).get("history_id")
+        if history_id:
+            self.set_value("gmail_history_id", history_id)
+
+        self.set_value("json_imported", 1)
+        logging.info(
+            f"Imported {len(messages)} messages and {len(notion_cache)} Notion pages "
+            "from JSON files"
+        )
+
+
+def _load_json(path: str, default: Any) -> Any:
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, "r") as f:
+            content = f.read().strip()
+            return json.loads(content) if content else default
+    except json.JSONDecodeError:
+        logging.error(f"Error decoding JSON from {path}. Skipping import.")
+        return default
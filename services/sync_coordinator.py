@@ -0,0 +1,72 @@
+import asyncio
+import logging
+from typing import Callable, Dict, Any, Optional
+
+
+class SyncCoordinator:
+    """
+    Single-flight wrapper around a blocking sync function for asyncio code.
+
+    At most one sync runs at a time (in a worker thread). Triggers that
+    arrive while one is running are coalesced into a single follow-up run,
+    and callers that want the result share the in-flight run instead of
+    starting their own.
+    """
+
+    def __init__(self, sync_func: Callable[[], Dict[str, Any]]):
+        self.sync_func = sync_func
+        self._current: Optional[asyncio.Task] = None
+        self._follow_up = False
+        self.runs = 0
+        self.coalesced = 0
+        self.last_result: Optional[Dict[str, Any]] = None
+
+    @property
+    def running(self) -> bool:
+        return self._current is not None and not self._current.done()
+
+    def trigger(self) -> bool:
+        """
+        Start a sync, or queue a follow-up if one is already running.
+
+        :return: True if a new sync started now
+        """
+        if self.running:
+            self.coalesced += 1
+            self._follow_up = True
+            return False
+        self._start()
+        return True
+
+    async def run(self) -> Dict[str, Any]:
+        """Wait for the in-flight sync (starting one if idle) and return its result."""
+        if not self.running:
+            self._start()
+        # Shield so a disconnecting HTTP client does not cancel the sync
+        return await asyncio.shield(self._current)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "follow_up_queued": self._follow_up,
+            "runs": self.runs,
+            "coalesced": self.coalesced,
+            "last_result": self.last_result,
+        }
+
+    def _start(self) -> None:
+        self._current = asyncio.create_task(self._run())
+
+    async def _run(self) -> Dict[str, Any]:
+        self.runs += 1
+        try:
+            result = await asyncio.to_thread(self.sync_func)
+        except Exception as e:
+            logging.error(f"Error during sync: {e}", exc_info=True)
+            result = {"error": str(e)}
+        self.last_result = result
+
+        if self._follow_up:
+            self._follow_up = False
+            self._start()
+        return result
@@ -0,0 +1,496 @@
+import os
+import time
+import logging
+import threading
+from collections import Counter
+from itertools import chain
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Callable
+from services.classroom import ClassroomDataManager
+from services.notion import NotionDatabaseManager
+from services.assignment_parser import AssignmentParser, DEFAULT_ACTIVITIES_FILE
+from services.cache_manager import NotionCache
+from services.notion_upsert import NotionUpserter
+from services.parallel_parse import ParallelParser
+from services.state_store import StateStore
+from services.activity_cache import ActivityCache
+from services.notion_client import AsyncNotionClient, NotionAPIError
+from services.rate_limiter import TokenBucket
+from services.metrics import metrics, span, track_sync
+from services.pipeline import batched, prefetch
+from services.records import ClassroomMessage, NotionTask
+from googleapiclient.errors import HttpError
+
+
+def is_quota_error(error: Exception) -> bool:
+    """Whether an exception is a Gmail or Notion quota/rate-limit error."""
+    if isinstance(error, NotionAPIError):
+        return error.status == 429
+    if isinstance(error, HttpError):
+        status = getattr(error.resp, "status", None)
+        return status == 429 or (status == 403 and "rateLimitExceeded" in str(error))
+    return False
+
+
+# Processed-message ledger status for each Notion upsert outcome; retryable
+# errors are left pending, pages Notion rejected are not sent again
+LEDGER_STATUSES = {
+    "created": "synced",
+    "updated": "updated",
+    "unchanged": "duplicate",
+    "duplicate": "duplicate",
+    "failed": "failed",
+}
+
+DEFAULT_FILTER_CRITERIA = {
+    "from": "no-reply@classroom.google.com",
+    "subject": "New assignment",
+}
+
+
+class SyncEngine:
+    """
+    Long-lived Classroom to Notion sync. Holds the authenticated Gmail
+    service, the pooled Notion clients, the state store and the activity
+    matcher across runs, and refreshes Gmail credentials in the background
+    before they expire, so each sync() only does the API work itself.
+    """
+
+    def __init__(
+        self,
+        notion_database_id: str,
+        activities_database_id: str,
+        notion_token: str = None,
+        store_path: str = "cache/state.db",
+        credentials_file: str = "credentials.json",
+        token_file: str = "token.json",
+        filter_criteria: Dict[str, str] = None,
+        max_results: int = 20,
+        refresh_margin: float = 300,
+        gmail_rate_limiters: List[TokenBucket] = None,
+        notion_client: AsyncNotionClient = None,
+        import_legacy: bool = True,
+        parallel_parser: ParallelParser = None,
+        batch_size: int = 250,
+        queue_size: int = 2,
+        post_batch_size: int = 20,
+        activities_file: str = DEFAULT_ACTIVITIES_FILE,
+    ):
+        self.notion_database_id = notion_database_id
+        # Activities with the teacher names entered during setup
+        self.activities_file = activities_file
+        self.store = StateStore(store_path)
+        if import_legacy:
+            self.store.import_json_files()
+        self.cdm = ClassroomDataManager(
+            credentials_file=credentials_file,
+            token_file=token_file,
+            store=self.store,
+            rate_limiters=gmail_rate_limiters,
+        )
+        # Both databases belong to the same integration, so one client (and
+        # connection pool) serves them
+        notion_client = notion_client or AsyncNotionClient(notion_token)
+        self.ndm = NotionDatabaseManager(
+            notion_database_id, notion_token, client=notion_client
+        )
+        self.notion_cache = NotionCache(store=self.store)
+        self.upserter = NotionUpserter(self.ndm, self.store, self.notion_cache)
+        self.activity_cache = ActivityCache(
+            NotionDatabaseManager(
+                activities_database_id, notion_token, client=notion_client
+            ),
+            self.store,
+        )
+        self.parser = None
+        # Extraction and page building on a process pool, which may be shared
+        # by several engines and is closed by its owner; in-process if None
+        self.parallel_parser = parallel_parser
+        # Messages per pipeline batch and batches queued between stages
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        # Pages per Notion write, so the first ones go out early
+        self.post_batch_size = post_batch_size
+        self.filter_criteria = filter_criteria or DEFAULT_FILTER_CRITERIA
+        self.max_results = max_results
+        self.refresh_margin = refresh_margin
+
+        # One sync at a time: the Gmail client is not thread-safe
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresh_thread = None
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "SyncEngine":
+        workers = int(os.environ.get("PARSE_WORKERS", 0))
+        if workers and "parallel_parser" not in kwargs:
+            kwargs["parallel_parser"] = ParallelParser(workers)
+        return cls(
+            notion_database_id=os.environ.get("NOTION_DATABASE_ID"),
+            activities_database_id=os.environ.get("ACTIVITIES_DATABASE_ID"),
+            notion_token=os.environ.get("NOTION_TOKEN"),
+            **kwargs,
+        )
+
+    def start(self, background_refresh: bool = True) -> None:
+        """
+        Connect to Gmail and start the background credential refresher.
+        Without background_refresh credentials are refreshed at the start of
+        each sync instead, which saves a thread per engine.
+        """
+        with self._lock:
+            self.cdm.connect()
+        if background_refresh and self._refresh_thread is None:
+            self._refresh_thread = threading.Thread(
+                target=self._refresh_loop, name="gmail-credentials", daemon=True
+            )
+            self._refresh_thread.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        self.ndm.close()
+        self.store.close()
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.is_set():
+            remaining = self.cdm.seconds_until_expiry()
+            # Wake up shortly before the refresh margin; poll hourly otherwise
+            wait = 3600 if remaining is None else remaining - self.refresh_margin
+            if self._stop.wait(min(max(wait, 30), 3600)):
+                return
+            try:
+                with self._lock:
+                    self.cdm.refresh_credentials(self.refresh_margin)
+            except Exception as e:
+                logging.error(f"Failed to refresh Gmail credentials: {e}")
+
+    def synced_history_id(self) -> int:
+        """The Gmail history ID everything up to which has been fetched."""
+        return int(self.store.get_value("gmail_history_id") or 0)
+
+    def ensure_history_id(self) -> int:
+        """
+        Store the current Gmail history ID if there is none yet, so that
+        incremental syncs pick up everything that arrives from now on.
+        """
+        history_id = self.synced_history_id()
+        if history_id:
+            return history_id
+        with self._lock:
+            self.cdm.connect()
+            history_id = self.cdm.get_current_history_id()
+        self.cdm.save_history_id(history_id)
+        return int(history_id)
+
+    def ensure_watch(self, topic_name: str, renew_margin: float = 24 * 60 * 60):
+        """
+        Keep a Gmail push watch on topic_name, renewing it once it is within
+        renew_margin seconds of expiring (watches last 7 days).
+
+        :return: True if the watch was created or renewed
+        """
+        expiration = float(self.store.get_value("gmail_watch_expiration", 0))
+        if expiration - time.time() > renew_margin:
+            return False
+        with self._lock:
+            response = self.cdm.watch(topic_name)
+        self.store.set_value(
+            "gmail_watch_expiration", int(response["expiration"]) / 1000
+        )
+        logging.info(f"Gmail watch on {topic_name} until {response['expiration']}")
+        return True
+
+    def _update_activities(self) -> None:
+        if self.parser is None:
+            self.parser = AssignmentParser(
+                self.activity_cache.get(),
+                database_id=self.notion_database_id,
+                activities_file=self.activities_file,
+            )
+        elif not self.activity_cache.is_fresh():
+            changed, removed = self.activity_cache.refresh()
+            self.parser.add_activities(changed)
+            self.parser.remove_activities(removed)
+
+    def sync(self) -> Dict[str, Any]:
+        """
+        Run one sync. The result always has "message", "status" and "timings"
+        (seconds per pipeline stage); successful runs add "new_messages" and
+        "new_assignments" counts (and, when pages were written, how long the
+        first write took: "first_write_seconds"), failed ones "error" and
+        whether it was a quota/rate limit ("quota_exceeded").
+        """
+        with self._lock, track_sync() as timings:
+            try:
+                if self._refresh_thread is None:
+                    self.cdm.connect()
+                    self.cdm.refresh_credentials(self.refresh_margin)
+                result = self._sync()
+            except Exception as e:
+                logging.error(f"An error occurred: {str(e)}", exc_info=True)
+                print(e)
+                result = {
+                    "message": f"Error: {str(e)}",
+                    "status": "error",
+                    "error": str(e),
+                    "quota_exceeded": is_quota_error(e),
+                }
+            result["timings"] = timings.to_dict()
+        metrics.inc("syncs_total", status=result["status"])
+        metrics.observe("sync_duration_seconds", result["timings"]["total"])
+        return result
+
+    @staticmethod
+    def _result(message: str, new_messages: int = 0, new_assignments: int = 0):
+        return {
+            "message": message,
+            "status": "ok",
+            "new_messages": new_messages,
+            "new_assignments": new_assignments,
+        }
+
+    def _mark(self, message_ids: List[str], status: str) -> None:
+        self.store.mark_messages_processed(message_ids, status)
+        metrics.inc("messages_processed_total", len(message_ids), outcome=status)
+
+    def _sync(self) -> Dict[str, Any]:
+        with span("update_activities"):
+            self._update_activities()
+
+        # With a stored history ID only pull what arrived since the last sync,
+        # even if nothing matching has been stored yet; ClassroomDataManager
+        # falls back to a full listing if the ID has expired, and skips
+        # fetching any message that is already stored or processed
+        incremental = bool(self.cdm.load_history_id())
+        if not incremental:
+            logging.info("No Gmail history ID yet, running a full sync")
+        # Read before anything new is stored: messages left pending by an
+        # earlier run go through the pipeline first
+        pending_ids = self.store.pending_message_ids()
+        self.cdm.connect()
+        fetched = self.cdm.stream_messages(
+            self.max_results,
+            self.filter_criteria,
+            full=not incremental,
+            batch_size=self.batch_size,
+        )
+        return self._run_pipeline(
+            chain(self._load_pending(pending_ids), self._store_stage(fetched))
+        )
+
+    def sync_page(
+        self, query: str = None, page_token: str = None, page_size: int = None
+    ) -> Dict[str, Any]:
+        """
+        Sync one page of a message listing, for backfilling history older
+        than a regular sync looks at. Listed messages that are already
+        stored or processed are not fetched again.
+
+        The result is that of sync() plus "listed" (messages on the page),
+        "missing" (listed messages that could not be fetched),
+        "next_page_token" and "result_size_estimate". Errors are raised.
+        """
+        with self._lock, track_sync() as timings:
+            if self._refresh_thread is None:
+                self.cdm.connect()
+                self.cdm.refresh_credentials(self.refresh_margin)
+            with span("update_activities"):
+                self._update_activities()
+            with span("gmail_list"):
+                stubs, next_page_token, estimate = self.cdm.list_message_page(
+                    query, page_token, page_size
+                )
+            message_ids = [stub["id"] for stub in stubs]
+            pending_ids = self.store.pending_message_ids()
+            fetched = self.cdm.fetch_messages(message_ids, self.batch_size)
+            result = self._run_pipeline(
+                chain(self._load_pending(pending_ids), self._store_stage(fetched))
+            )
+            missing = set(message_ids) - self.store.known_message_ids(message_ids)
+            result.update(
+                listed=len(message_ids),
+                missing=len(missing),
+                next_page_token=next_page_token,
+                result_size_estimate=estimate,
+                timings=timings.to_dict(),
+            )
+        return result
+
+    # Pipeline stages. Each takes and yields batches of at most batch_size
+    # messages; _run_pipeline runs them in their own threads
+
+    def _load_pending(self, message_ids: List[str]) -> Iterator[List[ClassroomMessage]]:
+        for chunk in batched(message_ids, self.batch_size):
+            with span("load_pending"):
+                yield self.store.get_messages_by_ids(chunk)
+
+    def _store_stage(
+        self, batches: Iterator[List[ClassroomMessage]]
+    ) -> Iterator[List[ClassroomMessage]]:
+        """Download batches from Gmail and store them before passing them on."""
+        while True:
+            with span("gmail_fetch"):
+                messages = next(batches, None)
+            if messages is None:
+                return
+            logging.info(f"Retrieved {len(messages)} new messages")
+            with span("store_messages"):
+                self.store.upsert_messages(messages)
+            yield messages
+
+    def _parse_stage(
+        self, batches: Iterator[List[ClassroomMessage]], totals: Counter
+    ) -> Iterator[Tuple[List[NotionTask], Dict[int, str]]]:
+        for messages in batches:
+            totals["messages"] += len(messages)
+            parsed = self._parse_batch(messages, totals)
+            if parsed is not None:
+                yield parsed
+
+    def _parse_batch(
+        self, messages: List[ClassroomMessage], totals: Counter
+    ) -> Optional[Tuple[List[NotionTask], Dict[int, str]]]:
+        """
+        Filter, extract and parse a batch of messages.
+
+        :return: The Notion tasks and the message ID of each task (keyed by
+            id(task)), or None if the batch has no assignments
+        """
+        with span("filter_messages"):
+            filtered_messages = self.cdm.filter_messages(messages)
+        filtered_ids = {msg.id for msg in filtered_messages}
+        self._mark(
+            [msg.id for msg in messages if msg.id not in filtered_ids],
+            "ignored",
+        )
+
+        # Extract assignment info (messages are already filtered)
+        pages = None
+        with span("extract_assignment_info"):
+            if self.parallel_parser is not None:
+                extracted_data, pages = self.parallel_parser.parse(
+                    filtered_messages, self.notion_database_id
+                )
+            else:
+                extracted_data = self.cdm.extract_assignment_info(filtered_messages)
+        metrics.inc("assignments_extracted_total", len(extracted_data))
+        totals["extracted"] += len(extracted_data)
+        extracted_ids = {assignment.message_id for assignment in extracted_data}
+        self._mark(
+            [mid for mid in filtered_ids if mid not in extracted_ids], "unparsed"
+        )
+        if not extracted_data:
+            return None
+        with span("store_assignments"):
+            self.store.upsert_assignments(extracted_data)
+
+        with span("parse_assignments"):
+            if pages is None:
+                parsed_data = self.parser.parse_assignments(extracted_data)
+            else:
+                parsed_data = self.parser.attach_activities(extracted_data, pages)
+        message_ids = {
+            id(page): assignment.message_id
+            for assignment, page in zip(extracted_data, parsed_data)
+        }
+        return parsed_data, message_ids
+
+    def _post_batch(
+        self,
+        parsed_data: List[NotionTask],
+        message_ids: Dict[int, str],
+        totals: Counter,
+        on_result: Callable[[Any], None] = None,
+    ) -> None:
+        with span("plan_upsert"):
+            plan = self.upserter.plan(parsed_data)
+        if not plan.creates and not plan.updates:
+            self.upserter.apply(plan)
+            self._mark(list(message_ids.values()), "duplicate")
+            return
+
+        # Create new pages and PATCH the changed properties of existing ones
+        with span("post_data"):
+            outcomes = self.upserter.apply(plan, on_result)
+        counts = Counter(outcomes.values())
+        logging.info(f"Notion upsert outcomes: {dict(counts)}")
+        for outcome in ("created", "updated", "error", "failed"):
+            metrics.inc("notion_pages_written_total", counts[outcome], outcome=outcome)
+        # Pages with retryable errors stay pending so the next run retries them
+        for outcome, status in LEDGER_STATUSES.items():
+            self._mark(
+                [
+                    message_ids[key]
+                    for key, page_outcome in outcomes.items()
+                    if page_outcome == outcome
+                ],
+                status,
+            )
+        totals["created"] += counts["created"]
+        totals["updated"] += counts["updated"]
+        if any(error.get("status") == 429 for error in plan.errors):
+            totals["quota_exceeded"] += 1
+
+    def _run_pipeline(
+        self, batches: Iterator[List[ClassroomMessage]]
+    ) -> Dict[str, Any]:
+        """
+        Stream message batches through fetch, parse and post. Fetching and
+        parsing each run in their own thread, `queue_size` batches ahead of
+        the next stage, so Gmail downloads, parsing and Notion writes overlap,
+        the first pages are written before the last messages are downloaded,
+        and only a few batches are in memory at any time. Pages are written
+        `post_batch_size` at a time, so even a single batch starts reaching
+        Notion early. Stage timings of
+        overlapping stages can add up to more than the total.
+        """
+        totals = Counter()
+        started = time.perf_counter()
+        first_write = []
+
+        def on_result(response):
+            # Runs on the Notion event loop as each write completes
+            if not first_write and isinstance(response, dict):
+                if response.get("object") != "error":
+                    first_write.append(time.perf_counter() - started)
+
+        fetched = prefetch(batches, self.queue_size, "sync-fetch")
+        parsed = prefetch(
+            self._parse_stage(fetched, totals), self.queue_size, "sync-parse"
+        )
+        try:
+            for parsed_data, message_ids in parsed:
+                for pages in batched(parsed_data, self.post_batch_size):
+                    page_ids = {id(page): message_ids[id(page)] for page in pages}
+                    self._post_batch(pages, page_ids, totals, on_result)
+        finally:
+            parsed.close()
+            fetched.close()
+
+        if not totals["messages"]:
+            logging.info("No new messages since the last sync")
+            print("No new messages since the last sync")
+            return self._result("No new messages")
+        if not totals["extracted"]:
+            logging.warning("No assignments extracted from messages")
+            return self._result(
+                "No assignments extracted from messages", totals["messages"]
+            )
+        if not totals["created"] and not totals["updated"]:
+            logging.info("No new or changed assignments to process")
+            print("No new or changed assignments to process")
+            print("-------------------------------------------------")
+            return self._result("No new assignments to process", totals["messages"])
+
+        print("-------------------------------------------------")
+        result = self._result(
+            f"Processed {totals['created']} new and {totals['updated']} changed "
+            "assignments",
+            totals["messages"],
+            totals["created"],
+        )
+        result["updated_assignments"] = totals["updated"]
+        if first_write:
+            result["first_write_seconds"] = round(first_write[0], 6)
+        if totals["quota_exceeded"]:
+            result["quota_exceeded"] = True
+        return result
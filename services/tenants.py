@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import List, Dict, Any
+from services.sync_engine import SyncEngine
+from services.notion_client import (
+    AsyncNotionClient,
+    BackgroundLoop,
+    create_shared_session,
+)
+from services.rate_limiter import get_thread_bucket
+from services.adaptive_scheduler import AdaptiveScheduler
+from services.parallel_parse import ParallelParser
+
+
+class TenantConfig:
+    """One Google account / Notion workspace pair and where its state lives."""
+
+    def __init__(
+        self,
+        tenant_id: str,
+        notion_token: str,
+        notion_database_id: str,
+        activities_database_id: str,
+        credentials_file: str = "credentials.json",
+        token_file: str = None,
+        state_dir: str = None,
+        filter_criteria: Dict[str, str] = None,
+        max_results: int = 20,
+    ):
+        self.tenant_id = tenant_id
+        self.notion_token = notion_token
+        self.notion_database_id = notion_database_id
+        self.activities_database_id = activities_database_id
+        # The OAuth client (and its Gmail project quota) is usually shared;
+        # the user token and all sync state are per tenant
+        self.credentials_file = credentials_file
+        self.state_dir = state_dir or os.path.join("cache", "tenants", tenant_id)
+        self.token_file = token_file or os.path.join(self.state_dir, "token.json")
+        self.filter_criteria = filter_criteria
+        self.max_results = max_results
+
+    @property
+    def store_path(self) -> str:
+        return os.path.join(self.state_dir, "state.db")
+
+    @property
+    def activities_file(self) -> str:
+        return os.path.join(self.state_dir, "activities_with_teachers.json")
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TenantConfig":
+        data = dict(data)
+        # Secrets can be kept out of the registry file as "env:VARIABLE"
+        for key, value in data.items():
+            if isinstance(value, str) and value.startswith("env:"):
+                data[key] = os.environ.get(value[4:])
+        return cls(**data)
+
+
+def load_tenants(path: str = "tenants.json") -> List[TenantConfig]:
+    with open(path, "r") as f:
+        return [TenantConfig.from_dict(item) for item in json.load(f)]
+
+
+class TenantRegistry:
+    """
+    Runs syncs for many tenants in one process.
+
+    - Syncs run on a fixed pool of `max_workers` threads. Tenants wait in one
+      FIFO queue and can be queued only once, so a busy tenant cannot crowd
+      out the others; a trigger for a running tenant is coalesced into a
+      single follow-up at the back of the queue.
+    - Gmail calls are metered in quota units per user (`gmail_user_rate`) and
+      per OAuth client project (`gmail_project_rate`); Notion calls share a
+      bucket per integration token, as with a single tenant.
+    - At most `max_active` engines are kept open. The least recently used idle
+      engine is closed when another is needed; its state stays in the
+      tenant's SQLite store. All Notion clients share one connection pool.
+    - With `parse_workers`, all tenants share one pool of parse processes.
+
+    Each tenant gets its own AdaptiveScheduler; poll_due() triggers the
+    tenants whose next poll is due.
+    """
+
+    def __init__(
+        self,
+        tenants: List[TenantConfig],
+        max_workers: int = 4,
+        max_active: int = 32,
+        gmail_user_rate: float = 250,
+        gmail_project_rate: float = 20000,
+        max_connections: int = 20,
+        scheduler_factory=AdaptiveScheduler,
+        parse_workers: int = 0,
+    ):
+        self.tenants = {tenant.tenant_id: tenant for tenant in tenants}
+        self.max_workers = max_workers
+        self.max_active = max_active
+        self.gmail_user_rate = gmail_user_rate
+        self.gmail_project_rate = gmail_project_rate
+        self.max_connections = max_connections
+        self.parallel_parser = ParallelParser(parse_workers) if parse_workers else None
+
+        self.schedulers = {tid: scheduler_factory() for tid in self.tenants}
+        self.next_due = {tid: 0.0 for tid in self.tenants}
+        self.last_results: Dict[str, Dict[str, Any]] = {}
+
+        self._engines: "OrderedDict[str, SyncEngine]" = OrderedDict()
+        self._engines_lock = threading.Lock()
+        self._loop = BackgroundLoop.get()
+        self._session = None
+
+        self._queue = deque()
+        self._queued = set()
+        self._running = set()
+        self._follow_up = set()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"tenant-sync-{i}", daemon=True)
+            for i in range(max_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    # Engines
+
+    def _create_engine(self, tenant: TenantConfig) -> SyncEngine:
+        # Without the teacher names no assignment would match an activity
+        if not os.path.exists(tenant.activities_file):
+            raise FileNotFoundError(
+                f"Tenant {tenant.tenant_id} has no {tenant.activities_file}; "
+                f"run `python setup.py --tenant {tenant.tenant_id}` to create it"
+            )
+        if self._session is None:
+            self._session = self._loop.run(create_shared_session(self.max_connections))
+        engine = SyncEngine(
+            notion_database_id=tenant.notion_database_id,
+            activities_database_id=tenant.activities_database_id,
+            notion_token=tenant.notion_token,
+            store_path=tenant.store_path,
+            credentials_file=tenant.credentials_file,
+            token_file=tenant.token_file,
+            filter_criteria=tenant.filter_criteria,
+            max_results=tenant.max_results,
+            gmail_rate_limiters=[
+                get_thread_bucket(
+                    f"gmail-user:{tenant.tenant_id}", self.gmail_user_rate
+                ),
+                get_thread_bucket(
+                    f"gmail-project:{tenant.credentials_file}",
+                    self.gmail_project_rate,
+                ),
+            ],
+            notion_client=AsyncNotionClient(tenant.notion_token, session=self._session),
+            import_legacy=False,
+            parallel_parser=self.parallel_parser,
+            activities_file=tenant.activities_file,
+        )
+        engine.start(background_refresh=False)
+        return engine
+
+    def get_engine(self, tenant_id: str) -> SyncEngine:
+        with self._engines_lock:
+            engine = self._engines.get(tenant_id)
+            if engine is not None:
+                self._engines.move_to_end(tenant_id)
+                return engine
+        engine = self._create_engine(self.tenants[tenant_id])
+        with self._engines_lock:
+            self._engines[tenant_id] = engine
+            self._evict()
+        return engine
+
+    def _evict(self) -> None:
+        with self._cond:
+            busy = set(self._running)
+        for tenant_id in list(self._engines):
+            if len(self._engines) <= self.max_active:
+                return
+            if tenant_id in busy:
+                continue
+            logging.info(f"Closing idle engine for tenant {tenant_id}")
+            self._engines.pop(tenant_id).close()
+
+    # Scheduling
+
+    def trigger(self, tenant_id: str) -> bool:
+        """
+        Queue a sync for one tenant.
+
+        :return: False if it was already queued or is coalesced into a
+            follow-up of the running sync
+        """
+        if tenant_id not in self.tenants:
+            raise KeyError(f"Unknown tenant: {tenant_id}")
+        with self._cond:
+            if tenant_id in self._queued:
+                return False
+            if tenant_id in self._running:
+                self._follow_up.add(tenant_id)
+                return False
+            self._queue.append(tenant_id)
+            self._queued.add(tenant_id)
+            self._cond.notify()
+            return True
+
+    def trigger_all(self) -> int:
+        return sum(self.trigger(tenant_id) for tenant_id in self.tenants)
+
+    def poll_due(self, now: float = None) -> List[str]:
+        """Trigger every tenant whose adaptive poll interval has elapsed."""
+        now = now or time.time()
+        due = [tid for tid, at in self.next_due.items() if at <= now]
+        for tenant_id in due:
+            # Pushed forward until the sync finishes and sets the real time
+            self.next_due[tenant_id] = float("inf")
+            self.trigger(tenant_id)
+        return due
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._queue and not self._running, timeout
+            )
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._stopped)
+                if self._stopped:
+                    return
+                tenant_id = self._queue.popleft()
+                self._queued.discard(tenant_id)
+                self._running.add(tenant_id)
+
+            result = self._sync_tenant(tenant_id)
+
+            with self._cond:
+                self._running.discard(tenant_id)
+                if tenant_id in self._follow_up:
+                    self._follow_up.discard(tenant_id)
+                    self._queue.append(tenant_id)
+                    self._queued.add(tenant_id)
+                self._cond.notify_all()
+            interval = self.schedulers[tenant_id].next_interval(result)
+            self.next_due[tenant_id] = time.time() + interval
+
+    def _sync_tenant(self, tenant_id: str) -> Dict[str, Any]:
+        started = time.monotonic()
+        try:
+            result = self.get_engine(tenant_id).sync()
+        except Exception as e:
+            logging.error(f"Sync failed for tenant {tenant_id}: {e}", exc_info=True)
+            result = {"message": f"Error: {e}", "status": "error", "error": str(e)}
+        result = dict(result, duration=round(time.monotonic() - started, 3))
+        self.last_results[tenant_id] = result
+        return result
+
+    def status(self) -> Dict[str, Any]:
+        with self._cond:
+            queued, running = list(self._queue), sorted(self._running)
+        return {
+            "tenants": len(self.tenants),
+            "active_engines": len(self._engines),
+            "queued": queued,
+            "running": running,
+            "next_due": {
+                tid: (None if at == float("inf") else at)
+                for tid, at in self.next_due.items()
+            },
+            "last_results": dict(self.last_results),
+        }
+
+    def close(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        for worker in self._workers:
+            worker.join()
+        with self._engines_lock:
+            while self._engines:
+                self._engines.popitem()[1].close()
+        if self._session is not None:
+            self._loop.run(self._session.close())
+            self._session = None
+        if self.parallel_parser is not None:
+            self.parallel_parser.close()
@@ -1,5 +1,8 @@
 from services.matcher import NotionAssignmentMatcher
+from services.tenants import load_tenants
 from scripts.load_activities import load_activities
+from dotenv import load_dotenv
+import argparse
 import os
 import json
 
@@ -12,12 +15,31 @@ def create_directory(path):
         print(f"Error creating directory '{path}': {error}")
 
 
+parser = argparse.ArgumentParser(description="Save the teacher of each Notion activity")
+parser.add_argument(
+    "--tenant",
+    help="Set up this tenant from TENANTS_FILE (tenants.json) instead of the "
+    "single-user install",
+)
+args = parser.parse_args()
+
 try:
     create_directory("outputs")
     create_directory("cache")
     create_directory("constants")
 
-    loaded_activities = load_activities()
+    database_id = token = None
+    output_path = "constants/activities_with_teachers.json"
+    if args.tenant:
+        load_dotenv()
+        tenants = load_tenants(os.environ.get("TENANTS_FILE", "tenants.json"))
+        tenant = {tenant.tenant_id: tenant for tenant in tenants}[args.tenant]
+        create_directory(tenant.state_dir)
+        database_id = tenant.activities_database_id
+        token = tenant.notion_token
+        output_path = tenant.activities_file
+
+    loaded_activities = load_activities(database_id, token)
     print(f"Loaded activities type: {type(loaded_activities)}")
     print(f"Number of activities loaded: {len(loaded_activities)}")
     print("First few activities:")
@@ -25,7 +47,7 @@ try:
 
     matcher = NotionAssignmentMatcher(
         activities=loaded_activities,
-        output_path="constants/activities_with_teachers.json",
+        output_path=output_path,
     )
     matcher.run()
 except Exception as e:
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from scripts.fake_servers import FakeNotionServer, FaultConfig
+from services.notion_client import AsyncNotionClient, NotionAPIError
+from services.rate_limiter import AsyncTokenBucket, RetryPolicy
+
+
+class FailFirst(FaultConfig):
+    """Answers the first `count` requests with a 500."""
+
+    def __init__(self, count=1):
+        super().__init__()
+        self.count = count
+        # Counted here rather than from the server's stats, which are only
+        # recorded after the response is sent
+        self.requests = 0
+
+    def failure(self):
+        self.requests += 1
+        if self.count:
+            self.count -= 1
+            return 500
+        return None
+
+
+@pytest.fixture
+def notion():
+    server = FakeNotionServer(FailFirst()).start()
+    server.add_database("tasks-db", "Tasks")
+    yield server
+    server.close()
+
+
+def call(notion, make_request):
+    async def run():
+        client = AsyncNotionClient(
+            "token",
+            base_url=notion.url + "/v1",
+            rate_limiter=AsyncTokenBucket(1000, 1000),
+            retry_policy=RetryPolicy(base_delay=0, jitter=0),
+        )
+        try:
+            return await make_request(client)
+        finally:
+            await client.close()
+
+    return asyncio.run(run())
+
+
+def test_idempotent_request_is_retried_after_a_500(notion):
+    response = call(notion, lambda client: client.query_database("tasks-db"))
+
+    assert response["results"] == []
+    assert notion.faults.requests == 2
+
+
+def test_page_creation_is_not_retried_after_a_500(notion):
+    page = {"parent": {"database_id": "tasks-db"}, "properties": {}}
+
+    with pytest.raises(NotionAPIError) as error:
+        call(notion, lambda client: client.create_page(page))
+
+    assert error.value.status == 500
+    assert notion.faults.requests == 1
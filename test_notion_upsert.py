@@ -0,0 +1,115 @@
+from services.cache_manager import NotionCache
+from services.notion_upsert import NotionUpserter
+from services.records import NotionTask
+from services.state_store import StateStore
+
+LINK_AAA = "https://classroom.google.com/c/AAA/a/111/details"
+LINK_BBB = "https://classroom.google.com/c/BBB/a/222/details"
+
+
+class FakeNotion:
+    """The NotionDatabaseManager calls NotionUpserter makes."""
+
+    def __init__(self, pages=None, errors=None):
+        self.pages = pages or []
+        self.created = []
+        self.updated = []
+        # Error response per page name
+        self.errors = errors or {}
+
+    def post_data(self, data, on_result=None):
+        responses = []
+        for task in data:
+            if task.name in self.errors:
+                responses.append(self.errors[task.name])
+                continue
+            page_id = f"page-{len(self.pages) + 1}"
+            self.pages.append(dict(task.to_notion(), id=page_id))
+            self.created.append(task)
+            responses.append({"object": "page", "id": page_id})
+        return responses
+
+    def update_pages(self, updates, on_result=None):
+        self.updated.extend(updates)
+        return [{"object": "page", "id": page_id} for page_id, _ in updates]
+
+    def find_pages_by_title(self, titles):
+        return [
+            page for page in self.pages if NotionTask.from_notion(page).name in titles
+        ]
+
+
+def make_upserter(notion, legacy_pages):
+    store = StateStore(":memory:")
+    store.set_value("json_imported", 1)
+    store.add_notion_pages(legacy_pages)
+    return NotionUpserter(notion, store, NotionCache(store=store)), store
+
+
+def legacy_row(task):
+    # As imported from the old cache/notion_cache.json: keyed by title, with
+    # neither a page ID nor a link column
+    return {
+        "key": task.name,
+        "page_id": None,
+        "assignment_link": None,
+        "data": task.to_notion(),
+    }
+
+
+def test_legacy_title_row_of_another_course_is_not_adopted():
+    old = NotionTask("tasks-db", "Homework 3", LINK_AAA)
+    new = NotionTask("tasks-db", "Homework 3", LINK_BBB)
+    notion = FakeNotion()
+    upserter, store = make_upserter(notion, [legacy_row(old)])
+
+    upserter.upsert([new])
+
+    assert notion.created == [new]
+    rows = store._query("SELECT page_id FROM synced_pages")
+    assert [row["page_id"] for row in rows] == ["page-1"]
+
+
+def test_legacy_title_row_with_the_same_link_is_adopted():
+    old = NotionTask("tasks-db", "Homework 3", LINK_AAA)
+    notion = FakeNotion([dict(old.to_notion(), id="page-9")])
+    upserter, store = make_upserter(notion, [legacy_row(old)])
+
+    outcomes = upserter.upsert([NotionTask("tasks-db", "Homework 3", LINK_AAA)])
+
+    assert notion.created == []
+    assert list(outcomes.values()) == ["unchanged"]
+    rows = store._query("SELECT page_id FROM synced_pages")
+    assert [row["page_id"] for row in rows] == ["page-9"]
+
+
+def test_synced_rows_always_have_a_page_id():
+    # The legacy page is no longer in Notion, so its ID cannot be found
+    old = NotionTask("tasks-db", "Homework 3", LINK_AAA)
+    notion = FakeNotion()
+    upserter, store = make_upserter(notion, [legacy_row(old)])
+
+    upserter.upsert([NotionTask("tasks-db", "Homework 3", LINK_AAA)])
+
+    assert notion.created == []
+    assert store._query("SELECT * FROM synced_pages") == []
+
+
+def error(status, code):
+    return {"object": "error", "status": status, "code": code, "message": code}
+
+
+def test_rejected_pages_fail_and_other_errors_are_retryable():
+    rejected = NotionTask("tasks-db", "Essay", LINK_AAA, note="x" * 2001)
+    unavailable = NotionTask("tasks-db", "Homework 3", LINK_BBB)
+    notion = FakeNotion(
+        errors={
+            "Essay": error(400, "validation_error"),
+            "Homework 3": error(503, "service_unavailable"),
+        }
+    )
+    upserter, _ = make_upserter(notion, [])
+
+    outcomes = upserter.upsert([rejected, unavailable])
+
+    assert outcomes == {id(rejected): "failed", id(unavailable): "error"}
@@ -0,0 +1,48 @@
+import json
+import os
+
+from services.sync_engine import SyncEngine
+from services.tenants import TenantConfig, TenantRegistry
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+
+def test_fresh_tenant_store_ignores_legacy_json_files(tmp_path, monkeypatch):
+    # What a single-tenant install leaves behind in the working directory
+    monkeypatch.chdir(tmp_path)
+    write_json("outputs/classroom_data.json", [{"id": "m1", "threadId": "m1"}])
+    write_json("cache/gmail_state.json", {"history_id": 999})
+    write_json("cache/notion_cache.json", {"Homework 3": {"properties": {}}})
+    monkeypatch.setattr(SyncEngine, "start", lambda self, background_refresh: None)
+
+    tenant = TenantConfig("a", "token-a", "tasks-a", "activities-a")
+    write_json(tenant.activities_file, [])
+    registry = TenantRegistry([tenant], max_workers=1)
+    try:
+        store = registry.get_engine("a").store
+        assert store.get_value("gmail_history_id") is None
+        assert store.count_messages() == 0
+        assert store.pending_message_ids() == []
+        assert store._query("SELECT * FROM notion_pages") == []
+    finally:
+        registry.close()
+
+
+def test_tenant_without_activities_file_is_not_synced(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(SyncEngine, "start", lambda self, background_refresh: None)
+    registry = TenantRegistry(
+        [TenantConfig("a", "token-a", "tasks-a", "activities-a")], max_workers=1
+    )
+    try:
+        result = registry._sync_tenant("a")
+    finally:
+        registry.close()
+
+    assert result["status"] == "error"
+    assert "python setup.py --tenant a" in result["error"]
+    assert not os.path.exists("cache/tenants/a/activities_with_teachers.json")